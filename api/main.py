@@ -8,6 +8,11 @@ from starlette.middleware.cors import CORSMiddleware
 from bot.config import get_config
 from bot.misc import dp, bot
 from bot.utils import setup_logging
+from bot.utils.stats_sink import stats_sink
+from bot.utils.edit_coalescer import edit_coalescer
+from bot.common.checkin_queue import checkin_queue
+from bot.utils.balance_cache import balance_cache
+from bot.utils.broadcast import broadcaster
 
 config = get_config()
 setup_logging(config)
@@ -18,11 +23,19 @@ logger = logging.getLogger(__name__)
 async def lifespan(application: FastAPI):
     logger.info("🚀 Starting application")
     from bot.main import setup_webhook
+    from bot.tasks.red_packet_expiry import stop_red_packet_expiry
 
     await setup_webhook(bot)
     yield
     await bot.delete_webhook()
     logger.info("⛔ Stopping application, deleting webhook")
+    await stop_red_packet_expiry()
+    await edit_coalescer.close()
+    await checkin_queue.close()
+    await balance_cache.close()
+    await broadcaster.close()
+    # 写入尚未刷新到 Redis 的统计
+    await stats_sink.close()
 
 
 app = FastAPI(title=config.API_NAME, lifespan=lifespan)
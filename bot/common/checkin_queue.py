@@ -0,0 +1,229 @@
+"""
+签到排队写入
+零点大量用户同时签到时，每条签到各占一个数据库连接会挤占开奖和挖矿的连接。
+这里先用 Redis SET NX 按用户按天去重（重复发送的“签到”不访问数据库），
+通过的签到放入队列，由一个后台协程每隔 checkin_batch_interval_ms 毫秒或攒满
+checkin_batch_size 条时用一个连接批量写入，各请求等待所在批次完成后立即回复。
+去重标记先以较短的有效期写入，批次写入成功后再延长到次日；
+进程在写入前退出时标记会自行过期，用户稍后可以重新签到（重复写入由数据库唯一约束拦截）
+"""
+
+import asyncio
+import datetime
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from bot.common.checkin_service import CheckinService, already_signed_result
+from bot.common.uow import UoW
+from bot.config import get_config
+from bot.database.db import SessionFactory
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+
+class CheckinQueue:
+    """签到排队批量写入"""
+
+    KEY_PREFIX = "checkin"
+    # 排队中签到的去重标记有效期（秒），写入成功后延长到次日
+    PENDING_TTL = 60
+    # 停止队列的哨兵
+    _STOP = object()
+
+    def __init__(self, redis=None, batch_size: int = None, batch_interval_ms: int = None):
+        """
+        Args:
+            redis: Redis 客户端，默认使用 bot.database.redis_client 中的共享实例
+            batch_size: 每批最多签到数
+            batch_interval_ms: 收集一批的最长等待时间（毫秒）
+        """
+        self._redis = redis
+        self.batch_size = batch_size or config.checkin_batch_size
+        self.batch_interval = (batch_interval_ms or config.checkin_batch_interval_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # 已从队列取出、尚未写入完成的一批签到
+        self._batch: List[Tuple[datetime.date, Dict, asyncio.Future]] = []
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from bot.database.redis_client import redis_client
+            self._redis = redis_client
+        return self._redis
+
+    def _key(self, today: datetime.date, telegram_id: int) -> str:
+        return f"{self.KEY_PREFIX}:{today.isoformat()}:{telegram_id}"
+
+    async def _admit(self, today: datetime.date, telegram_id: int) -> bool:
+        """当天第一次签到时返回 True；Redis 不可用时放行，由数据库去重"""
+        try:
+            return bool(await self.redis.set(self._key(today, telegram_id), 1, ex=self.PENDING_TTL, nx=True))
+        except Exception as e:
+            logger.error(f"签到去重失败: {e}")
+            return True
+
+    async def _confirm(self, today: datetime.date, telegram_ids: List[int]):
+        """签到已写入，去重标记延长到次日"""
+        tomorrow = datetime.datetime.combine(today + datetime.timedelta(days=1), datetime.time())
+        ttl = max(int((tomorrow - datetime.datetime.now()).total_seconds()) + 3600, self.PENDING_TTL)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for telegram_id in telegram_ids:
+                    pipe.set(self._key(today, telegram_id), 1, ex=ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"延长签到去重标记失败: {e}")
+
+    async def _release(self, today: datetime.date, telegram_ids: List[int]):
+        """签到失败时删除去重标记，允许用户重试"""
+        try:
+            await self.redis.delete(*(self._key(today, telegram_id) for telegram_id in telegram_ids))
+        except Exception as e:
+            logger.error(f"删除签到去重标记失败: {e}")
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="checkin-queue")
+
+    async def submit(self, telegram_id: int, chat_id: int, profile: Dict, today: Optional[datetime.date] = None) -> Dict:
+        """
+        提交签到并等待所在批次写入完成
+
+        Returns:
+            签到结果字典（与 CheckinService.check_in 相同）
+        """
+        today = today or datetime.date.today()
+        if not await self._admit(today, telegram_id):
+            return already_signed_result()
+
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((today, {"telegram_id": telegram_id, "chat_id": chat_id, "profile": profile}, future))
+        return await future
+
+    async def _run(self):
+        try:
+            stopping = False
+            while not stopping:
+                item = await self._queue.get()
+                if item is self._STOP:
+                    break
+                self._batch = [item]
+                deadline = asyncio.get_running_loop().time() + self.batch_interval
+                while len(self._batch) < self.batch_size:
+                    timeout = deadline - asyncio.get_running_loop().time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is self._STOP:
+                        # 写入已收集的这一批后停止
+                        stopping = True
+                        break
+                    self._batch.append(item)
+                try:
+                    await self._apply(self._batch)
+                except Exception as e:
+                    logger.error(f"批量签到异常: {e}")
+                    await self._fail(self._batch)
+                self._batch = []
+            # 停止后才排进队列的签到不再写入
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not self._STOP:
+                    self._batch.append(item)
+            await self._fail(self._batch)
+            self._batch = []
+        except asyncio.CancelledError:
+            # 被强制停止：未写入的签到删除去重标记并回复失败
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not self._STOP:
+                    self._batch.append(item)
+            await self._fail(self._batch)
+            self._batch = []
+            raise
+
+    async def _fail(self, batch: List[Tuple[datetime.date, Dict, asyncio.Future]]):
+        """未完成的签到回复失败，并删除去重标记允许重试（已写入的由数据库去重）"""
+        pending: Dict[datetime.date, List[int]] = defaultdict(list)
+        for today, entry, future in batch:
+            if not future.done():
+                future.set_result({"success": False, "message": "签到失败，请稍后再试"})
+                pending[today].append(entry["telegram_id"])
+        for today, telegram_ids in pending.items():
+            await self._release(today, telegram_ids)
+
+    async def _apply(self, batch: List[Tuple[datetime.date, Dict, asyncio.Future]]):
+        """按日期分组写入一批签到"""
+        by_date: Dict[datetime.date, Dict[int, Dict]] = defaultdict(dict)
+        waiters: Dict[Tuple[datetime.date, int], List[asyncio.Future]] = defaultdict(list)
+        for today, entry, future in batch:
+            # Redis 不可用时同一用户可能在一批中出现多次，只写入一次
+            by_date[today].setdefault(entry["telegram_id"], entry)
+            waiters[(today, entry["telegram_id"])].append(future)
+
+        for today, entries in by_date.items():
+            try:
+                async with SessionFactory() as session:
+                    results = await CheckinService(UoW(session)).check_in_many(list(entries.values()), today)
+            except IntegrityError:
+                # 与其它进程的签到冲突，逐个重试
+                logger.warning(f"批量签到冲突，逐个写入 {len(entries)} 条")
+                results = {}
+                for entry in entries.values():
+                    async with SessionFactory() as session:
+                        results[entry["telegram_id"]] = await CheckinService(UoW(session)).check_in(
+                            entry["telegram_id"], entry["chat_id"], entry["profile"], today
+                        )
+            except Exception as e:
+                logger.error(f"批量签到失败: {e}")
+                results = {telegram_id: {"success": False, "message": "签到失败，请稍后再试"} for telegram_id in entries}
+
+            failed = [
+                telegram_id for telegram_id, result in results.items()
+                if not result["success"] and not result.get("already_signed")
+            ]
+            if failed:
+                await self._release(today, failed)
+            signed = [telegram_id for telegram_id in results if telegram_id not in failed]
+            if signed:
+                await self._confirm(today, signed)
+
+            for telegram_id, result in results.items():
+                futures = waiters[(today, telegram_id)]
+                futures[0].set_result(result)
+                for future in futures[1:]:
+                    future.set_result(already_signed_result(result.get("balance")))
+            logger.info(f"批量签到 {len(entries)} 条")
+
+    async def close(self, timeout: float = 10):
+        """
+        写入队列中剩余的签到后停止
+
+        Args:
+            timeout: 最长等待时间（秒），超时后未写入的签到回复失败并删除去重标记
+        """
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(self._STOP)
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("签到队列停止超时，未写入的签到将回复失败")
+                self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+# 全局签到队列实例
+checkin_queue = CheckinQueue()
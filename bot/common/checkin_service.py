@@ -0,0 +1,229 @@
+"""
+签到服务类
+一次签到只执行几条写语句，不做预读：
+用户和账户按唯一键 upsert，是否已签到和连续天数由用户表上的 last_sign_date / sign_streak
+在一条 UPDATE 中判断和更新，签到记录表的 (telegram_id, sign_date) 唯一键兜底。
+check_in_many 把一批签到合并为固定条数的批量语句（由 checkin_queue 调用）
+"""
+
+import datetime
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from bot.common.uow import UoW
+from bot.crud.account import account as account_crud
+from bot.crud.user import user as user_crud
+from bot.models.sign_in_record import SignInRecord
+
+logger = logging.getLogger(__name__)
+
+# 积分账户类型
+POINT_ACCOUNT_TYPE = 1
+# 现金账户类型
+CASH_ACCOUNT_TYPE = 2
+# 每次签到积分
+CHECKIN_POINTS = 100
+# 签到交易类型
+CHECKIN_TRANSACTION_TYPE = 4
+
+# 连续签到奖励规则
+CONTINUOUS_CHECKIN_RULES = [
+    {"days": 3, "bonus": 200, "description": "连续签到3天"},
+    {"days": 7, "bonus": 500, "description": "连续签到7天"},
+    {"days": 14, "bonus": 1000, "description": "连续签到14天"},
+    {"days": 21, "bonus": 1500, "description": "连续签到21天"},
+    {"days": 30, "bonus": 2000, "description": "连续签到1个月"},
+    {"days": 60, "bonus": 5000, "description": "连续签到2个月"},
+    {"days": 90, "bonus": 8000, "description": "连续签到3个月"},
+    {"days": 180, "bonus": 20000, "description": "连续签到半年"},
+    {"days": 365, "bonus": 50000, "description": "连续签到一年"},
+]
+_RULES_BY_DAYS = {rule["days"]: rule for rule in CONTINUOUS_CHECKIN_RULES}
+
+
+def _special_rule(continuous_days: int) -> Optional[Dict]:
+    """连续签到天数对应的特殊奖励规则"""
+    return _RULES_BY_DAYS.get(continuous_days)
+
+
+def _success_result(record: SignInRecord, balance: int) -> Dict:
+    rule = _special_rule(record.continuous_days)
+    return {
+        "success": True,
+        "message": "签到成功",
+        "already_signed": False,
+        "continuous_days": record.continuous_days,
+        "points": record.points,
+        "streak_bonus": record.bonus_points,
+        "special_bonus": rule["bonus"] if rule else 0,
+        "special_description": rule["description"] if rule else "",
+        "balance": balance
+    }
+
+
+def already_signed_result(balance: Optional[int] = None) -> Dict:
+    """今天已经签到过的结果（balance 为 None 表示未查询余额）"""
+    return {
+        "success": False,
+        "message": "您今天已经签到过了，每天只能签到一次！",
+        "already_signed": True,
+        "balance": balance
+    }
+
+
+class CheckinService:
+    """签到服务类"""
+
+    def __init__(self, uow: UoW):
+        self.uow = uow
+
+    async def check_in(self, telegram_id: int, chat_id: int, profile: Dict, today: Optional[datetime.date] = None) -> Dict:
+        """
+        签到
+
+        Args:
+            telegram_id: 用户Telegram ID
+            chat_id: 群组ID
+            profile: 新建用户时写入的资料（username、first_name 等）
+            today: 签到日期，默认今天
+
+        Returns:
+            签到结果字典；already_signed 为 True 表示今天已经签到过
+        """
+        today = today or datetime.date.today()
+        try:
+            async with self.uow:
+                session = self.uow.session
+                user_id = await user_crud.upsert(
+                    session,
+                    telegram_id=telegram_id,
+                    join_source=2,  # 来自群组
+                    source_group_id=chat_id,
+                    **profile
+                )
+
+                continuous_days = await user_crud.advance_sign_streak(session, user_id, today)
+                if continuous_days is None:
+                    return await self._already_signed(telegram_id)
+
+                record = SignInRecord(
+                    group_id=chat_id,
+                    user_id=user_id,
+                    telegram_id=telegram_id,
+                    points=CHECKIN_POINTS,
+                    continuous_days=continuous_days,
+                    sign_date=today
+                )
+                session.add(record)
+
+                # 特殊奖励
+                rule = _special_rule(continuous_days)
+                special_bonus = rule["bonus"] if rule else 0
+
+                # 入账（基础积分 + 连续签到奖励 + 特殊奖励），积分和现金账户不存在时一并创建
+                transaction = await account_crud.upsert_credit(
+                    session,
+                    telegram_id=telegram_id,
+                    user_id=user_id,
+                    account_type=POINT_ACCOUNT_TYPE,
+                    amount=record.total_points + special_bonus,
+                    transaction_type=CHECKIN_TRANSACTION_TYPE,
+                    create_types=(CASH_ACCOUNT_TYPE,),
+                    group_id=chat_id,
+                    remarks=f"签到奖励 (连续{continuous_days}天)"
+                )
+        except IntegrityError:
+            # 并发签到被唯一键拦下
+            await self.uow.rollback()
+            return await self._already_signed(telegram_id)
+        except Exception as e:
+            logger.error(f"签到失败: {e}")
+            await self.uow.rollback()
+            return {
+                "success": False,
+                "message": "签到失败，请稍后再试"
+            }
+
+        return _success_result(record, transaction.balance)
+
+    async def check_in_many(self, entries: List[Dict], today: datetime.date) -> Dict[int, Dict]:
+        """
+        批量签到（同一天），无论批次大小都只执行固定条数的语句：
+        批量创建用户、锁定并读取签到状态、批量更新连续天数、批量写签到记录、
+        批量创建账户、批量入账和写交易记录
+
+        Args:
+            entries: 签到列表，每项包含 telegram_id、chat_id、profile（telegram_id 不重复）
+            today: 签到日期
+
+        Returns:
+            telegram_id -> 签到结果字典（出错时抛出异常，整批回滚）
+        """
+        async with self.uow:
+            session = self.uow.session
+            await user_crud.upsert_many(session, [
+                {
+                    "telegram_id": entry["telegram_id"],
+                    "join_source": 2,  # 来自群组
+                    "source_group_id": entry["chat_id"],
+                    **entry["profile"]
+                }
+                for entry in entries
+            ])
+            states = await user_crud.get_sign_states_for_update(session, [entry["telegram_id"] for entry in entries])
+
+            yesterday = today - datetime.timedelta(days=1)
+            results: Dict[int, Dict] = {}
+            records: Dict[int, SignInRecord] = {}
+            for entry in entries:
+                state = states[entry["telegram_id"]]
+                if state.last_sign_date == today:
+                    results[state.telegram_id] = already_signed_result()
+                    continue
+                records[state.telegram_id] = SignInRecord(
+                    group_id=entry["chat_id"],
+                    user_id=state.id,
+                    telegram_id=state.telegram_id,
+                    points=CHECKIN_POINTS,
+                    continuous_days=state.sign_streak + 1 if state.last_sign_date == yesterday else 1,
+                    sign_date=today
+                )
+            if not records:
+                return results
+
+            await user_crud.set_sign_streaks(
+                session,
+                {record.user_id: record.continuous_days for record in records.values()},
+                today
+            )
+            session.add_all(records.values())
+
+            await account_crud.ensure_accounts(
+                session,
+                users={telegram_id: record.user_id for telegram_id, record in records.items()},
+                account_types=(POINT_ACCOUNT_TYPE, CASH_ACCOUNT_TYPE)
+            )
+            balances = await account_crud.credit_many(
+                session,
+                account_type=POINT_ACCOUNT_TYPE,
+                transaction_type=CHECKIN_TRANSACTION_TYPE,
+                entries=[
+                    {
+                        "telegram_id": telegram_id,
+                        "amount": record.total_points + (_special_rule(record.continuous_days) or {}).get("bonus", 0),
+                        "group_id": record.group_id,
+                        "remarks": f"签到奖励 (连续{record.continuous_days}天)"
+                    }
+                    for telegram_id, record in records.items()
+                ]
+            )
+
+        for telegram_id, record in records.items():
+            results[telegram_id] = _success_result(record, balances.get(telegram_id, 0))
+        return results
+
+    async def _already_signed(self, telegram_id: int) -> Dict:
+        balances = await account_crud.get_cached_balances(self.uow.session, telegram_id, (POINT_ACCOUNT_TYPE,))
+        return already_signed_result(balances[POINT_ACCOUNT_TYPE] or 0)
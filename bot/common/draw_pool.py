@@ -0,0 +1,170 @@
+"""
+开奖期实时汇总
+每个进行中的期在 Redis 中有一个哈希 lottery:pool:{draw_id}，投注时原子累加，
+开奖时读出后删除，投注路径不再写 lottery_draws 行：
+    total        总投注金额
+    bettors      投注人数
+    bet:{类型}   各投注类型的投注金额
+    pay:{0-9}    开出该数字时需要派发的奖金合计（庄家在每个结果上的赔付）
+    u:{用户ID}   该用户本期的投注笔数（撤销时用于维护投注人数）
+累加时可以给出赔付上限：某笔投注会让任一结果的赔付合计超过上限时不累加该笔，
+检查只读这一个哈希，耗时与投注量无关
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bot.database.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 累加 / 撤销：KEYS = 汇总哈希；ARGV = 用户ID, 方向(1 累加 / -1 撤销), 有效期, 赔付上限(0 为不限),
+# 之后每笔投注 12 个参数：投注类型, 金额, 开出 0-9 时的奖金
+# 返回每笔投注的结果：-1 已累加，否则为超限未累加，值为该笔最多还能投注的金额
+_APPLY_SCRIPT = """
+local sign = tonumber(ARGV[2])
+local limit = tonumber(ARGV[4])
+local count = 0
+local results = {}
+for i = 5, #ARGV, 12 do
+    local amount = tonumber(ARGV[i + 1])
+    local allowed = -1
+    if sign > 0 and limit > 0 then
+        for d = 0, 9 do
+            local payout = tonumber(ARGV[i + 2 + d])
+            if payout > 0 then
+                local room = limit - tonumber(redis.call('HGET', KEYS[1], 'pay:' .. d) or '0')
+                if payout > room then
+                    local max_amount = math.floor(math.max(room, 0) * amount / payout)
+                    if allowed < 0 or max_amount < allowed then
+                        allowed = max_amount
+                    end
+                end
+            end
+        end
+    end
+    if allowed < 0 then
+        redis.call('HINCRBY', KEYS[1], 'total', sign * amount)
+        redis.call('HINCRBY', KEYS[1], 'bet:' .. ARGV[i], sign * amount)
+        for d = 0, 9 do
+            local payout = tonumber(ARGV[i + 2 + d])
+            if payout ~= 0 then
+                redis.call('HINCRBY', KEYS[1], 'pay:' .. d, sign * payout)
+            end
+        end
+        count = count + 1
+    end
+    results[#results + 1] = allowed
+end
+if count == 0 then
+    return results
+end
+local user_field = 'u:' .. ARGV[1]
+local bets = redis.call('HINCRBY', KEYS[1], user_field, sign * count)
+if sign > 0 and bets == count then
+    redis.call('HINCRBY', KEYS[1], 'bettors', 1)
+elseif sign < 0 and bets <= 0 then
+    redis.call('HDEL', KEYS[1], user_field)
+    redis.call('HINCRBY', KEYS[1], 'bettors', -1)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return results
+"""
+
+
+class DrawPool:
+    """开奖期实时汇总"""
+
+    KEY_PREFIX = "lottery:pool"
+    # 兜底过期时间，调度器异常退出时不会一直保留
+    TTL_SECONDS = 24 * 3600
+
+    def __init__(self, redis=redis_client):
+        self.redis = redis
+        self._apply_script = None
+
+    def _key(self, draw_id: int) -> str:
+        return f"{self.KEY_PREFIX}:{draw_id}"
+
+    async def _apply(
+        self,
+        draw_id: int,
+        telegram_id: int,
+        sign: int,
+        bets: Sequence[Tuple[str, int, List[int]]],
+        max_payout: int = 0
+    ) -> List[int]:
+        if self._apply_script is None:
+            self._apply_script = self.redis.register_script(_APPLY_SCRIPT)
+        args = [telegram_id, sign, self.TTL_SECONDS, max_payout]
+        for bet_type, amount, payouts in bets:
+            args.extend((bet_type, amount, *payouts))
+        return [int(allowed) for allowed in await self._apply_script(keys=[self._key(draw_id)], args=args)]
+
+    async def add(
+        self,
+        draw_id: int,
+        telegram_id: int,
+        bets: Sequence[Tuple[str, int, List[int]]],
+        max_payout: int = 0
+    ) -> Optional[List[int]]:
+        """
+        按顺序累加一个用户的一批投注
+
+        Args:
+            bets: [(投注类型, 金额, 开出 0-9 时的奖金)]
+            max_payout: 任一开奖结果的赔付合计上限，0 为不限
+
+        Returns:
+            每笔投注的结果：-1 为已累加，否则为超限未累加，值为该笔最多还能投注的金额；
+            Redis 不可用时返回 None
+        """
+        try:
+            return await self._apply(draw_id, telegram_id, 1, bets, max_payout)
+        except Exception as e:
+            logger.error(f"累加开奖期汇总失败: {e}")
+            return None
+
+    async def revert(self, draw_id: int, telegram_id: int, bets: Sequence[Tuple[str, int, List[int]]]):
+        """撤销 add 累加的投注（投注未能写入数据库时调用）"""
+        try:
+            await self._apply(draw_id, telegram_id, -1, bets)
+        except Exception as e:
+            logger.error(f"撤销开奖期汇总失败: {e}")
+
+    async def get(self, draw_id: int) -> Optional[Dict]:
+        """
+        读取汇总
+
+        Returns:
+            {"total_bets", "bettors", "bet_totals", "payouts", "max_payout"}，
+            没有汇总或 Redis 不可用时返回 None
+        """
+        try:
+            values = await self.redis.hgetall(self._key(draw_id))
+        except Exception as e:
+            logger.error(f"读取开奖期汇总失败: {e}")
+            return None
+        if not values:
+            return None
+        payouts = [int(values.get(f"pay:{d}", 0)) for d in range(10)]
+        return {
+            "total_bets": int(values.get("total", 0)),
+            "bettors": int(values.get("bettors", 0)),
+            "bet_totals": {
+                field[4:]: int(value)
+                for field, value in values.items()
+                if field.startswith("bet:") and int(value)
+            },
+            "payouts": payouts,
+            "max_payout": max(payouts),
+        }
+
+    async def delete(self, draw_id: int):
+        try:
+            await self.redis.delete(self._key(draw_id))
+        except Exception as e:
+            logger.error(f"删除开奖期汇总失败: {e}")
+
+
+draw_pool = DrawPool()
@@ -0,0 +1,87 @@
+"""
+当前开奖期注册表
+按 (group_id, game_type) 记录进行中的开奖期，存放在 Redis 中供所有进程共享，
+投注时优先从这里读取，未命中再查询 lottery_draws
+"""
+
+import json
+import logging
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from bot.database.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CurrentDraw:
+    """进行中的开奖期（只包含投注需要的字段）"""
+    id: int
+    group_id: int
+    game_type: str
+    draw_number: str
+    seal_at: Optional[float] = None  # 封盘时间戳，没有计划开奖时间时为 None
+
+
+class DrawRegistry:
+    """当前开奖期注册表"""
+    
+    KEY_PREFIX = "lottery:current_draw"
+    # 兜底过期时间，调度器异常退出时不会一直指向旧的期
+    TTL_SECONDS = 3600
+    
+    def __init__(self, redis=redis_client):
+        self.redis = redis
+    
+    def _key(self, group_id: int, game_type: str) -> str:
+        return f"{self.KEY_PREFIX}:{group_id}:{game_type}"
+    
+    async def get(self, group_id: int, game_type: str) -> Optional[CurrentDraw]:
+        """获取当前期，未登记或 Redis 不可用时返回 None"""
+        try:
+            value = await self.redis.get(self._key(group_id, game_type))
+        except Exception as e:
+            logger.error(f"读取当前开奖期失败: {e}")
+            return None
+        if not value:
+            return None
+        return CurrentDraw(**json.loads(value))
+    
+    async def set(self, draw, seal_at: Optional[float] = None) -> None:
+        """登记当前期（draw 可以是 LotteryDraw 或 CurrentDraw）"""
+        current = CurrentDraw(
+            id=draw.id,
+            group_id=draw.group_id,
+            game_type=draw.game_type,
+            draw_number=draw.draw_number,
+            seal_at=seal_at
+        )
+        try:
+            await self.redis.set(
+                self._key(current.group_id, current.game_type),
+                json.dumps(asdict(current)),
+                ex=self.TTL_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"登记当前开奖期失败: {e}")
+    
+    async def clear(self, group_id: int, game_type: str, draw_id: int = None) -> None:
+        """
+        注销当前期
+        
+        指定 draw_id 时只有登记的仍是这一期才删除，避免误删已经登记的新一期。
+        """
+        key = self._key(group_id, game_type)
+        try:
+            if draw_id is None:
+                await self.redis.delete(key)
+                return
+            current = await self.get(group_id, game_type)
+            if current and current.id == draw_id:
+                await self.redis.delete(key)
+        except Exception as e:
+            logger.error(f"注销当前开奖期失败: {e}")
+
+
+draw_registry = DrawRegistry()
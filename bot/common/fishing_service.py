@@ -80,101 +80,88 @@ class FishingService:
             钓鱼结果
         """
         try:
-            # 检查是否可以钓鱼
-            can_fish, error_msg = await self.can_fish(telegram_id, rod_type)
-            if not can_fish:
+            # 获取钓鱼竿信息
+            rod_info = FishingConfig.get_rod_info(rod_type)
+            if not rod_info:
                 return {
                     "success": False,
-                    "message": error_msg,
+                    "message": "无效的钓鱼竿类型",
                     "fish": None,
                     "points": 0,
                     "is_legendary": False,
                     "notification": None
                 }
             
-            # 获取钓鱼竿信息
-            rod_info = FishingConfig.get_rod_info(rod_type)
-            
             # 执行钓鱼操作
             async with self.uow:
-                # 获取用户积分账户
-                account = await account_crud.get_by_telegram_id_and_type(
-                    self.uow.session, 
-                    telegram_id, 
-                    self.ACCOUNT_TYPE_POINTS
-                )
-                
-                # 扣除钓鱼费用
-                account.available_amount -= rod_info["cost"]
-                account.total_amount -= rod_info["cost"]
-                await account_crud.update(
-                    session=self.uow.session,
-                    db_obj=account,
-                    obj_in={"available_amount": account.available_amount, "total_amount": account.total_amount}
-                )
-                
-                # 记录扣除交易
-                await transaction_crud.create(
-                    session=self.uow.session,
-                    account_id=account.id,
+                # 扣除钓鱼费用（账户不存在、被冻结或积分不足时不会扣款），同时记录扣除交易
+                cost_transaction = await account_crud.debit(
+                    self.uow.session,
                     telegram_id=telegram_id,
                     account_type=self.ACCOUNT_TYPE_POINTS,
+                    amount=rod_info["cost"],
                     transaction_type=self.TRANSACTION_TYPE_FISHING_COST,
-                    amount=-rod_info["cost"],
-                    balance=account.available_amount,
+                    require_active=True,
                     remarks=f"使用{rod_info['name']}钓鱼"
                 )
                 
-                # 获取钓鱼结果
-                fishing_result = FishingConfig.get_fishing_result(rod_type)
-                
-                if fishing_result["success"]:
-                    # 钓鱼成功，增加积分
-                    earned_points = fishing_result["points"]
-                    account.available_amount += earned_points
-                    account.total_amount += earned_points
-                    await account_crud.update(
-                        session=self.uow.session,
-                        db_obj=account,
-                        obj_in={"available_amount": account.available_amount, "total_amount": account.total_amount}
-                    )
+                if cost_transaction:
+                    # 获取钓鱼结果
+                    fishing_result = FishingConfig.get_fishing_result(rod_type)
                     
-                    # 确定交易类型
-                    transaction_type = (
-                        self.TRANSACTION_TYPE_FISHING_LEGENDARY 
-                        if fishing_result["is_legendary"] 
-                        else self.TRANSACTION_TYPE_FISHING_REWARD
-                    )
-                    
-                    # 记录获得积分交易
-                    await transaction_crud.create(
-                        session=self.uow.session,
-                        account_id=account.id,
-                        telegram_id=telegram_id,
-                        account_type=self.ACCOUNT_TYPE_POINTS,
-                        transaction_type=transaction_type,
-                        amount=earned_points,
-                        balance=account.available_amount,
-                        remarks=f"钓到{fishing_result['fish'].name}"
-                    )
-                    
-                    # 如果是传说鱼，生成通知消息
-                    notification = None
-                    if fishing_result["is_legendary"]:
-                        # 优先使用传入的玩家名称，其次使用账户备注，最后使用用户ID
-                        display_name = player_name or account.remarks or f"用户{telegram_id}"
-                        notification = FishingConfig.format_legendary_notification(
-                            player_name=display_name,
-                            fish_name=fishing_result["fish"].name,
-                            fish_points=earned_points,  # 传入实际积分
-                            subscription_link=subscription_link
+                    if fishing_result["success"]:
+                        # 钓鱼成功，增加积分
+                        earned_points = fishing_result["points"]
+                        
+                        # 确定交易类型
+                        transaction_type = (
+                            self.TRANSACTION_TYPE_FISHING_LEGENDARY 
+                            if fishing_result["is_legendary"] 
+                            else self.TRANSACTION_TYPE_FISHING_REWARD
                         )
+                        
+                        # 增加积分并记录获得积分交易
+                        await account_crud.credit(
+                            self.uow.session,
+                            telegram_id=telegram_id,
+                            account_type=self.ACCOUNT_TYPE_POINTS,
+                            amount=earned_points,
+                            transaction_type=transaction_type,
+                            remarks=f"钓到{fishing_result['fish'].name}"
+                        )
+                        
+                        # 如果是传说鱼，生成通知消息
+                        notification = None
+                        if fishing_result["is_legendary"]:
+                            # 优先使用传入的玩家名称，其次使用账户备注名，最后使用用户ID
+                            display_name = player_name
+                            if not display_name:
+                                account = await account_crud.get_by_telegram_id_and_type(
+                                    self.uow.session, telegram_id, self.ACCOUNT_TYPE_POINTS
+                                )
+                                display_name = (account.remarks if account else None) or f"用户{telegram_id}"
+                            notification = FishingConfig.format_legendary_notification(
+                                player_name=display_name,
+                                fish_name=fishing_result["fish"].name,
+                                fish_points=earned_points,  # 传入实际积分
+                                subscription_link=subscription_link
+                            )
+                        
+                        fishing_result["notification"] = notification
+            
+            if not cost_transaction:
+                # 扣款失败时再读取账户，给出具体原因
+                _, error_msg = await self.can_fish(telegram_id, rod_type)
+                return {
+                    "success": False,
+                    "message": error_msg or "积分不足，无法钓鱼",
+                    "fish": None,
+                    "points": 0,
+                    "is_legendary": False,
+                    "notification": None
+                }
                     
-                    fishing_result["notification"] = notification
-                    
-                await self.uow.commit()
-                
-                return fishing_result
+            return fishing_result
                 
         except Exception as e:
             logger.error(f"钓鱼操作失败: {e}")
@@ -200,13 +187,15 @@ class FishingService:
         """
         try:
             async with self.uow:
-                account = await account_crud.get_by_telegram_id_and_type(
+                # 只读展示，积分余额走余额缓存
+                balances = await account_crud.get_cached_balances(
                     self.uow.session, 
                     telegram_id, 
-                    self.ACCOUNT_TYPE_POINTS
+                    (self.ACCOUNT_TYPE_POINTS,)
                 )
+                user_points = balances[self.ACCOUNT_TYPE_POINTS]
                 
-                if not account:
+                if user_points is None:
                     return {
                         "success": False,
                         "message": "积分账户不存在，请先创建账户",
@@ -218,13 +207,13 @@ class FishingService:
                 
                 # 为每个钓鱼竿添加是否可用的信息
                 for rod_type, info in rods_info.items():
-                    info["can_use"] = account.available_amount >= info["cost"]
-                    info["shortage"] = max(0, info["cost"] - account.available_amount)
+                    info["can_use"] = user_points >= info["cost"]
+                    info["shortage"] = max(0, info["cost"] - user_points)
                 
                 return {
                     "success": True,
                     "message": "",
-                    "user_points": account.available_amount,
+                    "user_points": user_points,
                     "rods_info": rods_info
                 }
                 
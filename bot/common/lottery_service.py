@@ -5,11 +5,13 @@
 
 from typing import Dict, Optional, Tuple, List
 from datetime import datetime, timedelta
+import time
 from bot.config.lottery_config import LotteryConfig
 from bot.crud.lottery import lottery_draw, lottery_bet, lottery_cashback
 from bot.crud.account import account as account_crud
-from bot.crud.account_transaction import account_transaction as account_transaction_crud
 from bot.common.uow import UoW
+from bot.common.draw_registry import draw_registry
+from bot.common.draw_pool import draw_pool
 import logging
 from bot.config.multi_game_config import MultiGameConfig
 
@@ -39,6 +41,11 @@ class LotteryService:
         random_num = f"{random.randint(100, 999)}"  # 3位
         return f"{timestamp}{random_num}"
     
+    def _seal_at(self, draw) -> Optional[float]:
+        """开奖期的封盘时间戳，没有计划开奖时间时返回 None"""
+        seal_time = self.multi_config.get_seal_time(draw.group_id, draw.created_at)
+        return seal_time.timestamp() if seal_time else None
+    
     async def create_new_draw(self, group_id: int, game_type: str) -> Dict:
         """为指定群组和游戏类型创建新的开奖期"""
         try:
@@ -68,7 +75,11 @@ class LotteryService:
                 "remarks": "新开奖期"
             }
             
-            new_draw = await lottery_draw.create(self.uow.session, obj_in=draw_data)
+            async with self.uow:
+                new_draw = await lottery_draw.create_flush(self.uow.session, obj_in=draw_data, refresh=True)
+            
+            # 提交后再登记，投注不会读到尚未提交的期
+            await draw_registry.set(new_draw, seal_at=self._seal_at(new_draw))
             
             return {
                 "success": True,
@@ -83,131 +94,214 @@ class LotteryService:
                 "message": "创建开奖期失败"
             }
     
+    async def get_current_draw(self, group_id: int, game_type: str = "lottery"):
+        """
+        获取进行中的开奖期
+        
+        优先读取当前期注册表，未命中时查询数据库并回填注册表。
+        
+        Returns:
+            CurrentDraw 或 LotteryDraw（都包含 id、group_id、game_type、draw_number），没有时返回 None
+        """
+        current_draw = await draw_registry.get(group_id, game_type)
+        if current_draw:
+            return current_draw
+        
+        current_draw = await lottery_draw.get_current_draw(self.uow.session, group_id, game_type)
+        if current_draw:
+            seal_at = self._seal_at(current_draw)
+            await draw_registry.set(current_draw, seal_at=seal_at)
+            current_draw.seal_at = seal_at
+        return current_draw
+    
+    def _check_bet(self, bet_type: str, bet_amount: int) -> Tuple[Optional[float], Optional[str]]:
+        """
+        校验投注类型和金额
+
+        Returns:
+            (赔率, 错误信息)，校验通过时错误信息为 None
+        """
+        bet_type_info = LotteryConfig.get_bet_type_info(bet_type)
+        if not bet_type_info and not (bet_type.isdigit() and 0 <= int(bet_type) <= 9):
+            return None, "无效的投注类型"
+        
+        if bet_type_info:
+            if bet_amount < bet_type_info.min_bet or bet_amount > bet_type_info.max_bet:
+                return None, f"投注积分必须在 {bet_type_info.min_bet:,} - {bet_type_info.max_bet:,} 积分之间"
+            return bet_type_info.odds, None
+        
+        # 数字投注
+        if bet_amount < LotteryConfig.NUMBER_BET_MIN or bet_amount > LotteryConfig.NUMBER_BET_MAX:
+            return None, f"数字投注积分必须在 {LotteryConfig.NUMBER_BET_MIN:,} - {LotteryConfig.NUMBER_BET_MAX:,} 积分之间"
+        return LotteryConfig.NUMBER_BET_ODDS, None
+    
     async def place_bet(self, group_id: int, telegram_id: int, bet_type: str, bet_amount: int) -> Dict:
         """下注"""
+        result = await self.place_bets(
+            group_id,
+            telegram_id,
+            [{"bet_type": bet_type, "bet_amount": bet_amount}]
+        )
+        if not result.get("results"):
+            return {
+                "success": False,
+                "message": result["message"]
+            }
+        return result["results"][0]
+    
+    async def place_bets(self, group_id: int, telegram_id: int, bets: List[Dict]) -> Dict:
+        """
+        批量下注
+        
+        一条消息里的多笔投注只读一次当前期、一次已有投注和一次账户余额，
+        按顺序逐笔校验并在余额范围内依次接受，然后在同一事务内一次扣除合计积分、
+        批量写入投注记录和扣款交易记录。本期的投注汇总累加在 Redis（draw_pool）中，
+        投注不写 lottery_draws 行，只对该行加共享锁；封盘时间之后的投注直接拒绝。
+        
+        Args:
+            group_id: 群组ID
+            telegram_id: 用户Telegram ID
+            bets: 投注列表，每项包含 bet_type、bet_amount
+            
+        Returns:
+            总体结果，results 中按输入顺序给出每笔投注的结果
+        """
         try:
             # 获取当前期
-            current_draw = await lottery_draw.get_current_draw(self.uow.session, group_id, "lottery")
+            current_draw = await self.get_current_draw(group_id, "lottery")
             if not current_draw:
                 return {
                     "success": False,
                     "message": "当前没有进行中的开奖期"
                 }
+            draw_number = current_draw.draw_number
             
-            # 检查投注类型是否有效
-            bet_type_info = LotteryConfig.get_bet_type_info(bet_type)
-            if not bet_type_info and not (bet_type.isdigit() and 0 <= int(bet_type) <= 9):
+            seal_at = getattr(current_draw, "seal_at", None)
+            if seal_at and time.time() >= seal_at:
                 return {
                     "success": False,
-                    "message": "无效的投注类型"
+                    "message": "本期已封盘，请等待下一期"
                 }
             
-            # 检查投注金额
-            if bet_type_info:
-                if bet_amount < bet_type_info.min_bet or bet_amount > bet_type_info.max_bet:
-                    return {
-                        "success": False,
-                        "message": f"投注积分必须在 {bet_type_info.min_bet:,} - {bet_type_info.max_bet:,} 积分之间"
-                    }
-                odds = bet_type_info.odds
-            else:
-                # 数字投注
-                if bet_amount < LotteryConfig.NUMBER_BET_MIN or bet_amount > LotteryConfig.NUMBER_BET_MAX:
-                    return {
-                        "success": False,
-                        "message": f"数字投注积分必须在 {LotteryConfig.NUMBER_BET_MIN:,} - {LotteryConfig.NUMBER_BET_MAX:,} 积分之间"
-                    }
-                odds = LotteryConfig.NUMBER_BET_ODDS
-            
-            # 检查用户积分
-            account = await account_crud.get_by_telegram_id_and_type(
-                self.uow.session, 
-                telegram_id, 
-                self.ACCOUNT_TYPE_POINTS
+            # 已经下过注的投注类型
+            existing_bets = await lottery_bet.get_by_draw_and_telegram(
+                self.uow.session, group_id, current_draw.game_type, draw_number, telegram_id
             )
+            placed_types = {bet.bet_type for bet in existing_bets}
             
-            if not account or account.available_amount < bet_amount:
-                return {
-                    "success": False,
-                    "message": "积分余额不足"
-                }
-            
-            # 检查是否已经下过相同类型的注
-            existing_bet = await lottery_bet.get_by_user_draw_bet_type(
-                self.uow.session,
-                group_id=group_id,
-                draw_number=current_draw.draw_number,
-                telegram_id=telegram_id,
-                bet_type=bet_type
+            point_account = await account_crud.get_by_telegram_id_and_type(
+                self.uow.session, telegram_id, self.ACCOUNT_TYPE_POINTS
             )
+            remaining = point_account.available_amount if point_account else 0
             
-            if existing_bet:
-                return {
-                    "success": False,
-                    "message": f"您已经对 {bet_type} 下过注了，不能重复投注"
-                }
-            
-            # 执行投注
-            async with self.uow:
-                # 扣除积分
-                account.available_amount -= bet_amount
-                account.total_amount -= bet_amount
-                await account_crud.update(
-                    session=self.uow.session,
-                    db_obj=account,
-                    obj_in={"available_amount": account.available_amount, "total_amount": account.total_amount}
-                )
+            # 逐笔校验，余额按顺序占用
+            results = []
+            accepted = []
+            for bet in bets:
+                bet_type = bet["bet_type"]
+                bet_amount = bet["bet_amount"]
+                odds, error_msg = self._check_bet(bet_type, bet_amount)
+                if not error_msg and bet_type in placed_types:
+                    error_msg = f"您已经对 {bet_type} 下过注了，不能重复投注"
+                if not error_msg and bet_amount > remaining:
+                    error_msg = "积分余额不足"
                 
-                # 记录扣除交易
-                await account_transaction_crud.create(
-                    self.uow.session,
-                    account_id=account.id,
-                    telegram_id=telegram_id,
-                    account_type=self.ACCOUNT_TYPE_POINTS,
-                    transaction_type=self.TRANSACTION_TYPE_LOTTERY_BET,
-                    amount=-bet_amount,
-                    balance=account.available_amount,
-                    remarks=f"开奖投注 {bet_type} {bet_amount}积分"
-                )
-                
-                # 创建投注记录
-                cashback_amount = LotteryConfig.calculate_cashback(bet_amount)
-                cashback_expire_time = datetime.now() + timedelta(hours=24)
-                
-                bet_data = {
-                    "group_id": group_id,
-                    "game_type": "lottery",
-                    "draw_number": current_draw.draw_number,
-                    "telegram_id": telegram_id,
+                result = {
+                    "success": error_msg is None,
                     "bet_type": bet_type,
                     "bet_amount": bet_amount,
-                    "odds": odds,
-                    "is_win": False,
-                    "win_amount": 0,
-                    "cashback_amount": cashback_amount,
-                    "cashback_claimed": False,
-                    "cashback_expire_time": cashback_expire_time,
-                    "status": 1,  # 投注中
-                    "remarks": f"投注 {bet_type}"
+                    "message": error_msg
                 }
+                results.append(result)
+                if error_msg:
+                    continue
                 
-                bet_record = await lottery_bet.create(self.uow.session, obj_in=bet_data)
-                
-                # 更新开奖期总投注金额
-                current_draw.total_bets += bet_amount
-                await lottery_draw.update(
-                    session=self.uow.session,
-                    db_obj=current_draw,
-                    obj_in={"total_bets": current_draw.total_bets}
-                )
+                placed_types.add(bet_type)
+                remaining -= bet_amount
+                accepted.append((result, odds))
+            
+            # 先累加本期汇总并检查赔付上限，超限的投注拒绝；投注未能写入数据库时撤销
+            accepted, pool_bets, pooled = await self._add_to_pool(current_draw, telegram_id, accepted)
+            
+            if accepted:
+                cashback_expire_time = datetime.now() + timedelta(hours=24)
                 
-                await self.uow.commit()
+                draw_open = False
+                balance = None
+                committed = False
+                try:
+                    async with self.uow:
+                        # 对该期加共享锁，已开奖（注册表过期）时整批拒绝
+                        draw_open = await lottery_draw.lock_open_draw(self.uow.session, current_draw.id)
+                        if draw_open:
+                            # 一次扣除合计积分（余额不足时不会扣款），同时逐笔记录扣除交易
+                            balance = await account_crud.debit_many(
+                                self.uow.session,
+                                telegram_id=telegram_id,
+                                account_type=self.ACCOUNT_TYPE_POINTS,
+                                transaction_type=self.TRANSACTION_TYPE_LOTTERY_BET,
+                                entries=[
+                                    {
+                                        "amount": result["bet_amount"],
+                                        "remarks": f"开奖投注 {result['bet_type']} {result['bet_amount']}积分"
+                                    }
+                                    for result, _ in accepted
+                                ]
+                            )
+                            if balance is None:
+                                # 余额不足，结束事务并释放共享锁
+                                await self.uow.session.rollback()
+                        
+                        if balance is not None:
+                            # 批量创建投注记录
+                            bet_records = [
+                                lottery_bet.model(
+                                    group_id=group_id,
+                                    game_type=current_draw.game_type,
+                                    draw_number=draw_number,
+                                    telegram_id=telegram_id,
+                                    bet_type=result["bet_type"],
+                                    bet_amount=result["bet_amount"],
+                                    odds=odds,
+                                    is_win=False,
+                                    win_amount=0,
+                                    cashback_amount=LotteryConfig.calculate_cashback(result["bet_amount"]),
+                                    cashback_claimed=False,
+                                    cashback_expire_time=cashback_expire_time,
+                                    status=1,  # 投注中
+                                    remarks=f"投注 {result['bet_type']}"
+                                )
+                                for result, odds in accepted
+                            ]
+                            self.uow.session.add_all(bet_records)
+                            await self.uow.session.flush()
+                    committed = draw_open and balance is not None
+                finally:
+                    if pooled and not committed:
+                        await draw_pool.revert(current_draw.id, telegram_id, pool_bets)
                 
-                return {
-                    "success": True,
-                    "bet": bet_record,
-                    "message": f"投注成功！期号: {current_draw.draw_number}, 投注: {bet_type}, 积分: {bet_amount}"
-                }
+                if not draw_open:
+                    await draw_registry.clear(group_id, current_draw.game_type, current_draw.id)
+                    for result, _ in accepted:
+                        result["success"] = False
+                        result["message"] = "本期已开奖，请等待下一期"
+                elif balance is None:
+                    # 读取余额之后被其它操作扣减，整批拒绝
+                    for result, _ in accepted:
+                        result["success"] = False
+                        result["message"] = "积分余额不足"
+                else:
+                    for (result, _), bet_record in zip(accepted, bet_records):
+                        result["bet"] = bet_record
+                        result["message"] = f"投注成功！期号: {draw_number}, 投注: {result['bet_type']}, 积分: {result['bet_amount']}"
+            
+            success_count = sum(1 for result in results if result["success"])
+            return {
+                "success": success_count > 0,
+                "message": f"期号: {draw_number}, 成功投注 {success_count}/{len(results)} 笔",
+                "draw_number": draw_number,
+                "results": results
+            }
                 
         except Exception as e:
             logger.error(f"下注失败: {e}")
@@ -216,135 +310,131 @@ class LotteryService:
                 "message": "下注失败，请稍后重试"
             }
     
+    async def _add_to_pool(self, current_draw, telegram_id: int, accepted: List) -> Tuple[List, List, bool]:
+        """
+        把通过校验的投注累加到本期实时汇总，同时做赔付上限检查
+
+        游戏配置了 max_exposure 时，累加后任一开奖结果的赔付合计超过上限的投注被拒绝
+        （在结果中写明还能投注的积分），检查和累加在同一个 Lua 脚本中完成，不读数据库。
+
+        Returns:
+            (仍被接受的投注, 已累加的汇总条目, 是否已累加)
+        """
+        if not accepted:
+            return accepted, [], False
+        
+        game_config = self.multi_config.get_game_config(current_draw.game_type)
+        max_exposure = game_config.max_exposure if game_config else 0
+        pool_bets = [
+            (
+                result["bet_type"],
+                result["bet_amount"],
+                self.multi_config.get_payout_vector(current_draw.game_type, result["bet_type"], result["bet_amount"])
+            )
+            for result, _ in accepted
+        ]
+        limits = await draw_pool.add(current_draw.id, telegram_id, pool_bets, max_payout=max_exposure)
+        
+        if limits is None:
+            if not max_exposure:
+                return accepted, pool_bets, False
+            # 无法核对赔付时，设了上限的游戏暂停接受投注
+            for result, _ in accepted:
+                result["success"] = False
+                result["message"] = "系统繁忙，请稍后再试"
+            return [], [], False
+        
+        kept = []
+        for item, pool_bet, allowed in zip(accepted, pool_bets, limits):
+            if allowed < 0:
+                kept.append((item, pool_bet))
+                continue
+            result = item[0]
+            result["success"] = False
+            if allowed > 0:
+                result["message"] = f"超出本期赔付上限，{result['bet_type']} 最多还可投注 {allowed:,} 积分"
+            else:
+                result["message"] = f"超出本期赔付上限，{result['bet_type']} 暂停投注"
+        return [item for item, _ in kept], [pool_bet for _, pool_bet in kept], bool(kept)
+    
     async def draw_lottery(self, group_id: int) -> Dict:
-        """开奖"""
+        """
+        开奖
+
+        批量结算：根据投注类型表一次算出整期中奖集合，用集合化 UPDATE 结算投注，
+        按用户聚合后一条 UPDATE 派奖并批量写入交易记录，全部在同一事务内完成。
+        """
         try:
             # 确保没有未完成的事务
-            try:
-                await self.uow.session.rollback()
-                logger.info("已回滚任何可能存在的未完成事务")
-            except Exception as e:
-                logger.warning(f"回滚现有事务失败，这可能是正常的: {e}")
-                
-            # 获取当前期
-            try:
+            await self.uow.session.rollback()
+
+            # 获取当前期（注册表命中时按主键读取）
+            current_draw = None
+            registered = await draw_registry.get(group_id, "lottery")
+            if registered:
+                current_draw = await lottery_draw.get(self.uow.session, registered.id)
+                if current_draw and current_draw.status != 1:
+                    current_draw = None
+            if not current_draw:
                 current_draw = await lottery_draw.get_current_draw(self.uow.session, group_id, "lottery")
-                if not current_draw:
-                    return {
-                        "success": False,
-                        "message": "没有进行中的开奖期"
-                    }
-            except Exception as e:
-                logger.error(f"获取当前开奖期失败: {e}")
-                await self.uow.session.rollback()  # 确保回滚
+            if not current_draw:
                 return {
                     "success": False,
-                    "message": f"获取当前开奖期失败: {e}"
+                    "message": "没有进行中的开奖期"
                 }
-            
-            # 生成开奖结果
+
+            game_type = current_draw.game_type
+            draw_number = current_draw.draw_number
+
+            # 先从注册表注销，后续投注回落到数据库并在封盘后被拒绝
+            await draw_registry.clear(group_id, game_type, current_draw.id)
+
+            # 生成开奖结果，并一次性算出本期所有中奖投注类型
             result = self.multi_config.generate_secure_result()
-            logger.info(f"为期号 {current_draw.draw_number} 生成开奖结果: {result}")
-            
-            # 确保会话刷新，避免缓存问题
-            try:
-                await self.uow.session.flush()
-            except Exception as e:
-                logger.error(f"刷新会话失败: {e}")
-                await self.uow.session.rollback()  # 确保回滚
-            
-            # 获取该期所有投注
-            bets = []
-            try:
-                # 注意：确保参数顺序与函数定义一致
-                bets = await lottery_bet.get_by_draw_number(
-                    self.uow.session, 
-                    group_id,
-                    "lottery",
-                    current_draw.draw_number
-                )
-                logger.info(f"期号 {current_draw.draw_number} 共有 {len(bets)} 个投注")
-                
-                # 如果没有找到投注，再尝试一次不加game_type的查询
-                if len(bets) == 0:
-                    logger.warning(f"首次查询未找到投注记录，尝试使用备用查询")
-                    # 刷新会话
-                    await self.uow.session.expire_all()
-                    from sqlalchemy import select
-                    from bot.models.lottery import LotteryBet
-                    
-                    # 直接使用SQL查询
-                    stmt = select(LotteryBet).where(
-                        LotteryBet.draw_number == current_draw.draw_number
-                    )
-                    result_query = await self.uow.session.execute(stmt)
-                    bets = result_query.scalars().all()
-                    logger.info(f"备用查询：期号 {current_draw.draw_number} 共有 {len(bets)} 个投注")
-            except Exception as e:
-                logger.error(f"查询投注记录异常: {e}")
-                await self.uow.session.rollback()  # 确保回滚
-                bets = []
-            
-            total_payout = 0
-            
-            # 使用单独的事务块处理开奖结算
+            winning_odds = self.multi_config.get_winning_odds(result, game_type)
+
             try:
-                # 使用with语句确保事务完成后自动提交或回滚
                 async with self.uow:
-                    # 更新开奖结果
-                    await lottery_draw.update(
-                        session=self.uow.session,
-                        db_obj=current_draw,
-                        obj_in={
-                            "result": result,
-                            "status": 2,  # 已开奖
-                            "draw_time": datetime.now()
+                    # 先封盘：锁住该期并标记为已开奖，之后到达的投注会被拒绝
+                    if not await lottery_draw.close_draw(self.uow.session, current_draw.id, result, datetime.now()):
+                        return {
+                            "success": False,
+                            "message": "本期已开奖"
                         }
+
+                    # 集合化结算所有投注
+                    await lottery_bet.settle_draw(
+                        self.uow.session, group_id, game_type, draw_number, winning_odds
                     )
-                    
-                    # 结算所有投注
-                    for bet in bets:
-                        # 检查是否中奖
-                        is_win = False
-                        win_amount = 0
-                        
-                        # 获取当前游戏类型和配置
-                        current_game_type = current_draw.game_type
-                        game_config = self.multi_config.get_game_config(current_game_type)
-                        if not game_config:
-                            logger.error(f"游戏配置未找到: {current_game_type}")
-                            continue
-                            
-                        logger.info(f"处理投注: ID={bet.id}, 类型={bet.bet_type}, 金额={bet.bet_amount}, 游戏类型={current_game_type}")
-                        
-                        # 使用游戏配置判断中奖
-                        is_win = self.multi_config.check_bet_win(bet.bet_type, result, current_game_type)
-                        logger.info(f"中奖判断: 投注类型={bet.bet_type}, 结果={result}, 是否中奖={is_win}")
-                        
-                        # 打印游戏配置信息
-                        if bet.bet_type in game_config.bet_types:
-                            bet_config = game_config.bet_types[bet.bet_type]
-                            logger.info(f"投注配置: 类型={bet.bet_type}, 对应数字={bet_config['numbers']}, 赔率={bet_config['odds']}")
-                        
-                        if is_win:
-                            # 使用游戏配置计算奖金
-                            win_amount = self.multi_config.calculate_win_amount(bet.bet_type, bet.bet_amount, current_game_type)
-                            logger.info(f"奖金计算: 投注类型={bet.bet_type}, 金额={bet.bet_amount}, 奖金={win_amount}")
-                        
-                        logger.info(f"结算投注: ID={bet.id}, 用户={bet.telegram_id}, 投注={bet.bet_type}, 金额={bet.bet_amount}, 是否中奖={is_win}, 奖金={win_amount}")
-                        
-                        # 更新投注记录
-                        await lottery_bet.update(
-                            session=self.uow.session,
-                            db_obj=bet,
-                            obj_in={
-                                "is_win": is_win,
-                                "win_amount": win_amount,
-                                "status": 3  # 已结算
+
+                    # 聚合派奖并批量写入交易记录
+                    winning_bets = await lottery_bet.get_winning_bets(
+                        self.uow.session, group_id, game_type, draw_number
+                    )
+                    balances = await account_crud.credit_many(
+                        self.uow.session,
+                        account_type=self.ACCOUNT_TYPE_POINTS,
+                        transaction_type=self.TRANSACTION_TYPE_LOTTERY_WIN,
+                        entries=[
+                            {
+                                "telegram_id": bet.telegram_id,
+                                "amount": bet.win_amount,
+                                "group_id": group_id,
+                                "remarks": f"开奖中奖 {bet.bet_type} {bet.win_amount}积分"
                             }
-                        )
-                    
-                    # 这里的其余代码保持不变
+                            for bet in winning_bets
+                        ]
+                    )
+                    total_payout = sum(
+                        bet.win_amount for bet in winning_bets if bet.telegram_id in balances
+                    )
+
+                    # 封盘后投注已全部落库，按投注记录汇总总投注金额，与派奖一起一次写入该期
+                    total_bets = await lottery_bet.get_total_bets_by_draw(
+                        self.uow.session, group_id, game_type, draw_number
+                    )
+                    await lottery_draw.finish_draw(self.uow.session, current_draw.id, total_bets, total_payout)
+                    await self.uow.session.refresh(current_draw)
             except Exception as e:
                 logger.error(f"开奖结算过程中出错: {e}")
                 # uow的__aexit__会自动处理回滚
@@ -352,82 +442,33 @@ class LotteryService:
                     "success": False,
                     "message": f"开奖结算失败: {e}"
                 }
-                
-            # 使用单独的事务处理派发奖金
-            try:
-                async with self.uow:
-                    # 派发奖金，使用单独的事务，避免上面的事务失败影响
-                    for bet in bets:
-                        if bet.is_win and bet.win_amount > 0:
-                            # 获取用户账户
-                            account = await account_crud.get_by_telegram_id_and_type(
-                                self.uow.session, bet.telegram_id, self.ACCOUNT_TYPE_POINTS
-                            )
-                            if account:
-                                # 更新账户余额
-                                new_total = account.total_amount + bet.win_amount
-                                new_available = account.available_amount + bet.win_amount
-                                
-                                await account_crud.update(
-                                    session=self.uow.session,
-                                    db_obj=account,
-                                    obj_in={
-                                        "total_amount": new_total,
-                                        "available_amount": new_available,
-                                    }
-                                )
-                                
-                                # 添加交易记录
-                                await account_transaction_crud.create(
-                                    self.uow.session,
-                                    account_id=account.id,
-                                    telegram_id=bet.telegram_id,
-                                    account_type=self.ACCOUNT_TYPE_POINTS,
-                                    transaction_type=self.TRANSACTION_TYPE_LOTTERY_WIN,
-                                    amount=bet.win_amount,
-                                    balance=new_total,
-                                    remarks=f"开奖中奖 {bet.bet_type} {bet.win_amount}积分"
-                                )
-                                
-                                # 累计总派奖
-                                total_payout += bet.win_amount
-                                logger.info(f"派奖成功: 用户={bet.telegram_id}, 投注={bet.bet_type}, 金额={bet.bet_amount}, 奖金={bet.win_amount}")
-                            else:
-                                logger.error(f"派奖失败: 未找到用户账户, 用户={bet.telegram_id}")
-            except Exception as e:
-                logger.error(f"派发奖金过程中出错: {e}")
-                # uow的__aexit__会自动处理回滚
-                return {
-                    "success": False,
-                    "message": f"派发奖金失败: {e}"
-                }
-                
-            # 使用单独的事务更新开奖统计信息
-            try:
-                async with self.uow:
-                    # 更新开奖记录
-                    await lottery_draw.update(
-                        session=self.uow.session,
-                        db_obj=current_draw,
-                        obj_in={
-                            "total_payout": total_payout,
-                            "profit": current_draw.total_bets - total_payout
-                        }
-                    )
-            except Exception as e:
-                logger.error(f"更新开奖统计信息失败: {e}")
-                # 这个错误不影响主要流程，可以继续
-                
+
+            # 读出并删除本期实时汇总
+            pool = await draw_pool.get(current_draw.id) or {}
+            await draw_pool.delete(current_draw.id)
+            if pool and pool["total_bets"] != total_bets:
+                logger.warning(
+                    f"第 {draw_number} 期实时汇总与投注记录不一致: 汇总={pool['total_bets']}, 投注记录={total_bets}"
+                )
+
+            logger.info(
+                f"第 {draw_number} 期开奖完成: 结果={result}, 中奖注数={len(winning_bets)}, "
+                f"中奖人数={len(balances)}, 投注人数={pool.get('bettors', 0)}, "
+                f"总投注={total_bets}, 总派奖={total_payout}"
+            )
+
             return {
                 "success": True,
                 "draw": current_draw,
                 "result": result,
-                "total_bets": current_draw.total_bets,
+                "total_bets": total_bets,
                 "total_payout": total_payout,
-                "profit": current_draw.total_bets - total_payout,
-                "message": f"第 {current_draw.draw_number} 期开奖完成，结果: {result}"
+                "profit": total_bets - total_payout,
+                "bettors": pool.get("bettors", 0),
+                "bet_totals": pool.get("bet_totals", {}),
+                "message": f"第 {draw_number} 期开奖完成，结果: {result}"
             }
-                
+
         except Exception as e:
             logger.error(f"开奖失败: {e}")
             try:
@@ -458,7 +499,7 @@ class LotteryService:
                 for bet in unclaimed_bets:
                     if not bet.cashback_claimed and bet.cashback_expire_time > datetime.now():
                         # 标记返水已领取
-                        await lottery_bet.update(
+                        await lottery_bet.update_flush(
                             session=self.uow.session,
                             db_obj=bet,
                             obj_in={"cashback_claimed": True}
@@ -466,6 +507,8 @@ class LotteryService:
                         
                         # 创建返水记录
                         cashback_data = {
+                            "group_id": bet.group_id,
+                            "game_type": bet.game_type,
                             "bet_id": bet.id,
                             "telegram_id": telegram_id,
                             "amount": bet.cashback_amount,
@@ -473,46 +516,26 @@ class LotteryService:
                             "remarks": f"投注返水 {bet.bet_type}"
                         }
                         
-                        await lottery_cashback.create(self.uow.session, obj_in=cashback_data)
+                        await lottery_cashback.create_flush(self.uow.session, obj_in=cashback_data)
                         
                         total_cashback += bet.cashback_amount
                 
                 if total_cashback > 0:
-                    # 发放返水到用户账户
-                    account = await account_crud.get_by_telegram_id_and_type(
+                    # 发放返水到用户账户，同时记录返水交易
+                    await account_crud.credit(
                         self.uow.session,
-                        telegram_id,
-                        self.ACCOUNT_TYPE_POINTS
+                        telegram_id=telegram_id,
+                        account_type=self.ACCOUNT_TYPE_POINTS,
+                        amount=total_cashback,
+                        transaction_type=self.TRANSACTION_TYPE_LOTTERY_CASHBACK,
+                        remarks=f"开奖返水 {total_cashback}积分"
                     )
-                    
-                    if account:
-                        account.available_amount += total_cashback
-                        account.total_amount += total_cashback
-                        await account_crud.update(
-                            session=self.uow.session,
-                            db_obj=account,
-                            obj_in={"available_amount": account.available_amount, "total_amount": account.total_amount}
-                        )
-                        
-                        # 记录返水交易
-                        await account_transaction_crud.create(
-                            self.uow.session,
-                            account_id=account.id,
-                            telegram_id=telegram_id,
-                            account_type=self.ACCOUNT_TYPE_POINTS,
-                            transaction_type=self.TRANSACTION_TYPE_LOTTERY_CASHBACK,
-                            amount=total_cashback,
-                            balance=account.available_amount,
-                            remarks=f"开奖返水 {total_cashback}积分"
-                        )
-                
-                await self.uow.commit()
                 
-                return {
-                    "success": True,
-                    "total_cashback": total_cashback,
-                    "message": f"成功领取返水 {total_cashback}积分"
-                }
+            return {
+                "success": True,
+                "total_cashback": total_cashback,
+                "message": f"成功领取返水 {total_cashback}积分"
+            }
                 
         except Exception as e:
             logger.error(f"领取返水失败: {e}")
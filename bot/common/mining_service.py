@@ -9,7 +9,6 @@ from decimal import Decimal
 from bot.config.mining_config import MiningConfig
 from bot.crud.mining import mining_card, mining_reward, mining_statistics
 from bot.crud.account import account as account_crud
-from bot.crud.account_transaction import account_transaction as transaction_crud
 from bot.common.uow import UoW
 import logging
 
@@ -105,34 +104,22 @@ class MiningService:
                 
             # 执行购买操作
             async with self.uow:
-                # 获取用户钱包账户
-                wallet_account = await account_crud.get_by_telegram_id_and_type(
-                    self.uow.session, 
-                    telegram_id, 
-                    MiningConfig.ACCOUNT_TYPE_WALLET
-                )
-                
-                # 扣除USDT
+                # 扣除USDT（条件扣款，并发下不会透支），同时记录扣除交易
                 cost_usdt = card_config.cost_usdt  # 已经是整数格式
-                wallet_account.available_amount -= cost_usdt
-                wallet_account.total_amount -= cost_usdt
-                await account_crud.update(
-                    session=self.uow.session,
-                    db_obj=wallet_account,
-                    obj_in={"available_amount": wallet_account.available_amount, "total_amount": wallet_account.total_amount}
-                )
-                
-                # 记录扣除交易
-                await transaction_crud.create(
-                    session=self.uow.session,
-                    account_id=wallet_account.id,
+                purchase_transaction = await account_crud.debit(
+                    self.uow.session,
                     telegram_id=telegram_id,
                     account_type=MiningConfig.ACCOUNT_TYPE_WALLET,
+                    amount=cost_usdt,
                     transaction_type=MiningConfig.TRANSACTION_TYPE_MINING_PURCHASE,
-                    amount=-cost_usdt,
-                    balance=wallet_account.available_amount,
                     remarks=f"购买{card_config.name}"
                 )
+                if not purchase_transaction:
+                    return {
+                        "success": False,
+                        "message": "钱包余额不足",
+                        "mining_card": None
+                    }
                 
                 # 创建矿工卡记录
                 # 修正：显式使用当前的真实时间，并添加检查
@@ -171,8 +158,6 @@ class MiningService:
                     earned_points=0
                 )
                 
-                await self.uow.commit()
-                
                 return {
                     "success": True,
                     "message": f"成功购买{card_config.name}！",
@@ -207,14 +192,15 @@ class MiningService:
         """
         try:
             async with self.uow:
-                # 获取用户钱包账户
-                wallet_account = await account_crud.get_by_telegram_id_and_type(
+                # 获取用户钱包余额（只读展示，走余额缓存）
+                balances = await account_crud.get_cached_balances(
                     self.uow.session, 
                     telegram_id, 
-                    MiningConfig.ACCOUNT_TYPE_WALLET
+                    (MiningConfig.ACCOUNT_TYPE_WALLET,)
                 )
+                wallet_balance = balances[MiningConfig.ACCOUNT_TYPE_WALLET]
                 
-                if not wallet_account:
+                if wallet_balance is None:
                     return {
                         "success": False,
                         "message": "钱包账户不存在，请先创建账户",
@@ -256,7 +242,7 @@ class MiningService:
                 return {
                     "success": True,
                     "message": "",
-                    "wallet_balance": wallet_account.available_amount / 1000000,  # 转换为USDT显示
+                    "wallet_balance": wallet_balance / 1000000,  # 转换为USDT显示
                     "cards_info": cards_info,
                     "pending_rewards": pending_count,
                     "pending_points": pending_points
@@ -366,45 +352,27 @@ class MiningService:
                         "total_points": 0
                     }
                 
-                # 获取用户积分账户
-                points_account = await account_crud.get_by_telegram_id_and_type(
-                    self.uow.session, 
-                    telegram_id, 
-                    MiningConfig.ACCOUNT_TYPE_POINTS
-                )
-                
-                if not points_account:
-                    return {
-                        "success": False,
-                        "message": "积分账户不存在，请先创建账户",
-                        "claimed_rewards": [],
-                        "total_points": 0
-                    }
-                
                 # 计算总积分
                 total_points = sum(reward.reward_points for reward in pending_rewards)
                 
-                # 增加积分
-                points_account.available_amount += total_points
-                points_account.total_amount += total_points
-                await account_crud.update(
-                    session=self.uow.session,
-                    db_obj=points_account,
-                    obj_in={"available_amount": points_account.available_amount, "total_amount": points_account.total_amount}
-                )
-                
-                # 记录积分奖励交易
-                await transaction_crud.create(
-                    session=self.uow.session,
-                    account_id=points_account.id,
+                # 增加积分并记录积分奖励交易
+                reward_transaction = await account_crud.credit(
+                    self.uow.session,
                     telegram_id=telegram_id,
                     account_type=MiningConfig.ACCOUNT_TYPE_POINTS,
-                    transaction_type=MiningConfig.TRANSACTION_TYPE_MINING_REWARD,
                     amount=total_points,
-                    balance=points_account.available_amount,
+                    transaction_type=MiningConfig.TRANSACTION_TYPE_MINING_REWARD,
                     remarks=f"领取挖矿奖励，共{len(pending_rewards)}笔"
                 )
                 
+                if not reward_transaction:
+                    return {
+                        "success": False,
+                        "message": "积分账户不存在，请先创建账户",
+                        "claimed_rewards": [],
+                        "total_points": 0
+                    }
+                
                 # 标记奖励为已领取
                 reward_ids = [reward.id for reward in pending_rewards]
                 claimed_rewards = await mining_reward.claim_rewards(
@@ -413,8 +381,6 @@ class MiningService:
                     reward_ids=reward_ids
                 )
                 
-                await self.uow.commit()
-                
                 return {
                     "success": True,
                     "message": f"成功领取{len(claimed_rewards)}笔挖矿奖励，共{total_points:,}积分！",
@@ -439,107 +405,51 @@ class MiningService:
                 "total_points": 0
             }
     
-    async def process_daily_mining_rewards(self, reward_date: date = None) -> Dict:
+    async def process_daily_mining_rewards(self, reward_date: date = None, batch_size: int = 500) -> Dict:
         """
         处理每日挖矿奖励
         
+        按主键游标逐批调用 process_daily_mining_rewards_batch，每批一个事务。
+        
         Args:
             reward_date: 奖励日期，默认为当天
+            batch_size: 每批处理的矿工卡数量
             
         Returns:
             处理结果字典
         """
-        try:
-            if not reward_date:
-                reward_date = date.today()
-            elif isinstance(reward_date, datetime):
-                # 如果传入的是datetime对象，转换为date对象
-                reward_date = reward_date.date()
-                
-            logger.info(f"开始处理挖矿奖励，日期：{reward_date}")
+        if not reward_date:
+            reward_date = date.today()
+        elif isinstance(reward_date, datetime):
+            # 如果传入的是datetime对象，转换为date对象
+            reward_date = reward_date.date()
             
-            async with self.uow:
-                # 获取需要发放奖励的矿工卡
-                cards = await mining_card.get_cards_needing_reward(
-                    self.uow.session,
-                    reward_date=reward_date
-                )
-                
-                logger.info(f"找到 {len(cards)} 张需要发放奖励的矿工卡")
-                
-                processed_count = 0
-                for card in cards:
-                    try:
-                        # 计算奖励天数
-                        if card.last_reward_time is None:
-                            # 第一次发放奖励
-                            reward_day = 1
-                        else:
-                            # 计算距离上次奖励的天数
-                            days_diff = (reward_date - card.last_reward_time.date()).days
-                            if days_diff == 0:
-                                continue  # 今天已经发放过了
-                            reward_day = card.total_days - card.remaining_days + 1
-                        
-                        # 记录奖励
-                        reward = await mining_reward.create_reward(
-                            session=self.uow.session,
-                            telegram_id=card.telegram_id,
-                            card_id=card.id,
-                            card_type=card.card_type,
-                            reward_points=card.daily_points,
-                            reward_day=reward_day,
-                            reward_date=reward_date,
-                            remarks=f"{card.card_type}矿工卡第{reward_day}天奖励"
-                        )
-                        
-                        logger.info(f"已记录奖励：用户 {card.telegram_id}, 卡ID {card.id}, 积分 {card.daily_points}, 第 {reward_day} 天")
-                        
-                        # 更新矿工卡状态
-                        new_earned_points = card.earned_points + card.daily_points
-                        new_remaining_days = card.remaining_days - 1
-                        new_status = 2 if new_remaining_days == 0 else 1  # 如果剩余天数为0，标记为已完成
-                        
-                        # 计算新的结束时间，确保与剩余天数同步
-                        # 使用原始的start_time作为基准，而不是当前时间
-                        new_end_time = card.start_time + timedelta(days=new_remaining_days)
-                        
-                        # 安全检查：确保年份不是错误的2025年
-                        if new_end_time.year >= 2025 and datetime.now().year < 2025:
-                            logger.warning(f"检测到日期异常：{new_end_time}，自动修正年份")
-                            new_end_time = new_end_time.replace(year=datetime.now().year)
-                            if new_remaining_days > 0:
-                                new_end_time = card.start_time.replace(year=datetime.now().year) + timedelta(days=new_remaining_days)
-                        
-                        await mining_card.update_card_reward_with_end_time(
-                            session=self.uow.session,
-                            card_id=card.id,
-                            earned_points=new_earned_points,
-                            remaining_days=new_remaining_days,
-                            last_reward_time=datetime.combine(reward_date, datetime.min.time()),
-                            end_time=new_end_time,
-                            status=new_status
-                        )
-                        
-                        processed_count += 1
-                    except Exception as e:
-                        logger.error(f"处理矿工卡 {card.id} 奖励失败: {e}")
-                
-                await self.uow.commit()
-                
+        logger.info(f"开始处理挖矿奖励，日期：{reward_date}")
+        
+        processed_count = 0
+        last_id = 0
+        while True:
+            result = await self.process_daily_mining_rewards_batch(
+                last_id=last_id,
+                limit=batch_size,
+                reward_date=reward_date
+            )
+            if not result["success"]:
                 return {
-                    "success": True,
-                    "message": f"成功处理 {processed_count} 张矿工卡奖励",
+                    "success": False,
+                    "message": result["message"],
                     "processed_count": processed_count
                 }
-        except Exception as e:
-            logger.error(f"处理挖矿奖励失败: {e}")
-            await self.uow.rollback()
-            return {
-                "success": False,
-                "message": f"处理失败: {e}",
-                "processed_count": 0
-            }
+            processed_count += result["processed_cards"]
+            if not result["has_more"]:
+                break
+            last_id = result["last_id"]
+        
+        return {
+            "success": True,
+            "message": f"成功处理 {processed_count} 张矿工卡奖励",
+            "processed_count": processed_count
+        }
     
     async def get_user_mining_cards(self, telegram_id: int, page: int = 1, limit: int = 10, only_active: bool = False):
         """
@@ -624,28 +534,35 @@ class MiningService:
             logger.error(f"获取待处理矿工卡数量失败: {e}")
             return 0
     
-    async def process_daily_mining_rewards_batch(self, offset: int = 0, limit: int = 100):
+    async def process_daily_mining_rewards_batch(self, last_id: int = 0, limit: int = 100, reward_date: date = None, max_id: int = None):
         """
         批量处理每日挖矿奖励发放
         
+        取 id > last_id 的一批待发放矿工卡并加锁，批量写入奖励记录、批量更新矿工卡，
+        在同一个事务内提交。奖励记录按 (矿工卡, 奖励日期) 唯一，批次重跑不会重复发放。
+        
         Args:
-            offset: 偏移量
+            last_id: 上一批最后一张卡的ID，第一批为 0
             limit: 处理数量限制
+            reward_date: 奖励日期，默认为当天
+            max_id: 只处理 ID 不超过该值的卡（按ID区间并行处理时使用）
             
         Returns:
-            处理结果
+            处理结果，last_id 用于获取下一批
         """
-        reward_date = date.today()
-        logger.info(f"开始批量处理挖矿奖励，日期：{reward_date}，偏移量：{offset}，限制：{limit}")
+        reward_date = reward_date or date.today()
+        logger.info(f"开始批量处理挖矿奖励，日期：{reward_date}，起始ID：{last_id}，限制：{limit}")
         
         try:
             async with self.uow:
-                # 获取需要发放奖励的矿工卡
+                # 获取并锁定需要发放奖励的矿工卡
                 cards = await mining_card.get_cards_needing_reward_batch(
-                    self.uow.session, 
+                    self.uow.session,
                     reward_date=reward_date,
-                    offset=offset,
-                    limit=limit
+                    last_id=last_id,
+                    limit=limit,
+                    for_update=True,
+                    max_id=max_id
                 )
                 
                 if not cards:
@@ -653,68 +570,62 @@ class MiningService:
                     return {
                         "success": True,
                         "message": "没有需要发放奖励的矿工卡",
-                        "processed_count": 0,
+                        "processed_cards": 0,
+                        "total_rewards": 0,
+                        "last_id": last_id,
                         "has_more": False
                     }
                 
-                logger.info(f"找到 {len(cards)} 张需要发放奖励的矿工卡")
-                processed_count = 0
+                reward_day_start = datetime.combine(reward_date, datetime.min.time())
+                rewards = []
+                card_updates = []
                 
                 for card in cards:
-                    try:
-                        # 每张卡单独处理
-                        card_result = await self._process_single_card(card)
-                        if not card_result["success"]:
-                            continue
-                        
-                        # 更新矿工卡状态
-                        new_earned_points = card.earned_points + card_result["reward_points"]
-                        new_remaining_days = card.remaining_days - 1
-                        new_status = 2 if new_remaining_days <= 0 else 1  # 如果剩余天数为0，标记为已完成
-                        
-                        # 计算新的结束时间，确保与剩余天数同步
-                        # 使用原始的start_time作为基准，而不是当前时间
-                        new_end_time = card.start_time + timedelta(days=new_remaining_days)
-                        
-                        # 安全检查：确保年份不是错误的2025年
-                        if new_end_time.year >= 2025 and datetime.now().year < 2025:
-                            logger.warning(f"检测到日期异常：{new_end_time}，自动修正年份")
-                            new_end_time = new_end_time.replace(year=datetime.now().year)
-                            if new_remaining_days > 0:
-                                new_end_time = card.start_time.replace(year=datetime.now().year) + timedelta(days=new_remaining_days)
-                        
-                        await mining_card.update_card_reward_with_end_time(
-                            session=self.uow.session,
-                            card_id=card.id,
-                            earned_points=new_earned_points,
-                            remaining_days=new_remaining_days,
-                            last_reward_time=datetime.now(),
-                            end_time=new_end_time,
-                            status=new_status
-                        )
-                        
-                        processed_count += 1
-                    except Exception as e:
-                        logger.error(f"批量处理矿工卡 {card.id} 失败: {e}")
-                
-                # 检查是否还有更多卡片需要处理
-                more_cards = await mining_card.get_cards_needing_reward_batch(
+                    reward_day = card.total_days - card.remaining_days + 1
+                    new_remaining_days = card.remaining_days - 1
+                    
+                    rewards.append({
+                        "mining_card_id": card.id,
+                        "telegram_id": card.telegram_id,
+                        "card_type": card.card_type,
+                        "reward_points": card.daily_points,
+                        "reward_day": reward_day,
+                        "reward_date": reward_day_start,
+                        "status": 1,  # 待领取
+                        "claimed_time": None,
+                        "remarks": f"{card.card_type}矿工卡第{reward_day}天奖励"
+                    })
+                    
+                    # 结束时间以原始的start_time为基准，与剩余天数保持同步
+                    card_updates.append({
+                        "card_id": card.id,
+                        "earned_points": card.earned_points + card.daily_points,
+                        "remaining_days": new_remaining_days,
+                        "end_time": card.start_time + timedelta(days=new_remaining_days),
+                        "status": 2 if new_remaining_days <= 0 else 1,  # 如果剩余天数为0，标记为已完成
+                        # 记为奖励日期当天，补发历史日期或跨零点处理时不会挡住之后日期的奖励
+                        "last_reward_time": reward_day_start
+                    })
+                
+                # 只更新本次新写入奖励记录的矿工卡，已有当天奖励的卡不再累加
+                inserted = await mining_reward.bulk_create_daily_rewards(self.uow.session, rewards)
+                if len(inserted) < len(rewards):
+                    logger.warning(f"{len(rewards) - len(inserted)} 张矿工卡已有 {reward_date} 的奖励记录，跳过")
+                rewards = [reward for reward in rewards if reward["mining_card_id"] in inserted]
+                await mining_card.apply_daily_rewards(
                     self.uow.session,
-                    reward_date=reward_date,
-                    offset=offset + limit,
-                    limit=1
+                    [update for update in card_updates if update["card_id"] in inserted]
                 )
                 
-                has_more = len(more_cards) > 0
-                
-                await self.uow.commit()
-                
-                return {
-                    "success": True,
-                    "message": f"成功处理 {processed_count} 张矿工卡奖励",
-                    "processed_count": processed_count,
-                    "has_more": has_more
-                }
+            total_rewards = sum(reward["reward_points"] for reward in rewards)
+            return {
+                "success": True,
+                "message": f"成功处理 {len(rewards)} 张矿工卡奖励",
+                "processed_cards": len(rewards),
+                "total_rewards": total_rewards,
+                "last_id": cards[-1].id,
+                "has_more": len(cards) == limit
+            }
                 
         except Exception as e:
             logger.error(f"批量处理挖矿奖励失败: {e}")
@@ -722,42 +633,12 @@ class MiningService:
             return {
                 "success": False,
                 "message": f"处理失败: {e}",
-                "processed_count": 0,
+                "processed_cards": 0,
+                "total_rewards": 0,
+                "last_id": last_id,
                 "has_more": False
             }
     
-    async def _process_single_card(self, card):
-        """处理单张矿工卡"""
-        try:
-            # 计算奖励积分
-            reward_points = card.daily_points
-            
-            # 创建奖励记录
-            reward_record = await mining_reward.create_mining_reward(
-                session=self.uow.session,
-                mining_card_id=card.id,
-                telegram_id=card.telegram_id,
-                card_type=card.card_type,
-                reward_points=reward_points,
-                reward_day=card.total_days - card.remaining_days + 1,
-                reward_date=datetime.now(),
-                remarks=f"{card.card_type}矿工卡第{card.total_days - card.remaining_days + 1}天奖励"
-            )
-            
-            return {
-                "success": True,
-                "reward_points": reward_points,
-                "reward_record": reward_record
-            }
-            
-        except Exception as e:
-            logger.error(f"处理单张矿工卡失败: {e}")
-            return {
-                "success": False,
-                "reward_points": 0,
-                "error": str(e)
-            }
-    
     async def get_mining_history(self, telegram_id: int, page: int = 1, limit: int = 10) -> Dict:
         """
         获取挖矿历史记录（分页）
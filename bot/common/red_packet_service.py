@@ -1,26 +1,126 @@
 """
 红包服务类
 处理钓鱼成功后的红包发放和抢红包逻辑
+
+红包状态保存在 Redis 中，多个进程共享，重启后仍然有效：
+    red_packet:{id}               哈希，红包基本信息和剩余个数/金额
+    red_packet:{id}:amounts       列表，创建时预先拆分好的每份金额（见 red_packet_split）
+    red_packet:{id}:grabbers      集合，已抢过的用户
+    red_packet:{id}:participants  列表，抢红包记录（JSON）
+    red_packet:expiry             有序集合，各红包的到期时间
+抢红包由一个 Lua 脚本完成：弹出一份金额并记录抢红包用户，整个过程是原子的。
+红包数据在过期退款提交前不设有效期，退款提交后再保留 RED_PACKET_KEY_TTL 用于展示
 """
 
 from typing import Dict, List, Optional, Tuple
-import random
+import json
+import secrets
 import logging
 import time
-import asyncio
+from sqlalchemy.exc import IntegrityError
 from bot.crud.account import account as account_crud
 from bot.crud.account_transaction import account_transaction as transaction_crud
+from bot.common.red_packet_split import split_red_packet
 from bot.common.uow import UoW
-from bot.database.db import SessionFactory
 
 logger = logging.getLogger(__name__)
 
+# 抢红包：KEYS = 红包哈希, 金额列表, 已抢用户集合, 抢红包记录列表
+# ARGV = 用户ID, 用户名(JSON 字符串), 时间
+# 返回 {状态, 金额, 剩余个数, 抢红包记录}，状态: 1 成功, -1 不存在或已过期, -2 已抢光, -3 已抢过, -4 自己发的
+_GRAB_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 or redis.call('HEXISTS', KEYS[1], 'expired') == 1 then
+    return {-1, 0, 0, ''}
+end
+if redis.call('HGET', KEYS[1], 'sender_id') == ARGV[1] then
+    return {-4, 0, 0, ''}
+end
+if redis.call('SISMEMBER', KEYS[3], ARGV[1]) == 1 then
+    return {-3, 0, 0, ''}
+end
+local amount = redis.call('LPOP', KEYS[2])
+if not amount then
+    return {-2, 0, 0, ''}
+end
+local ttl = redis.call('TTL', KEYS[1])
+redis.call('SADD', KEYS[3], ARGV[1])
+local remaining = redis.call('HINCRBY', KEYS[1], 'remaining_num', -1)
+redis.call('HINCRBY', KEYS[1], 'remaining_amount', -tonumber(amount))
+local participant = '{"telegram_id": ' .. ARGV[1] .. ', "name": ' .. ARGV[2] ..
+    ', "amount": ' .. amount .. ', "time": ' .. ARGV[3] .. '}'
+redis.call('RPUSH', KEYS[4], participant)
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[3], ttl)
+    redis.call('EXPIRE', KEYS[4], ttl)
+end
+return {1, tonumber(amount), remaining, participant}
+"""
+
+# 入账失败时归还份额：KEYS 同上，ARGV = 用户ID, 金额, 抢红包记录
+# 返回 {状态, 发送者ID}，状态: 1 已放回金额列表；2 红包已过期，份额不计入剩余金额
+# （过期退款可能已经读取剩余金额并提交），由调用方直接退给发送者；0 红包已不存在
+_REVERT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {0, 0}
+end
+redis.call('SREM', KEYS[3], ARGV[1])
+redis.call('LREM', KEYS[4], 1, ARGV[3])
+redis.call('HINCRBY', KEYS[1], 'remaining_num', 1)
+if redis.call('HEXISTS', KEYS[1], 'expired') == 1 then
+    return {2, tonumber(redis.call('HGET', KEYS[1], 'sender_id'))}
+end
+redis.call('LPUSH', KEYS[2], ARGV[2])
+redis.call('HINCRBY', KEYS[1], 'remaining_amount', tonumber(ARGV[2]))
+return {1, 0}
+"""
+
+# 认领到期的红包：KEYS = 到期时间有序集合, 退款中有序集合；ARGV = 当前时间, 最多认领个数, key 前缀
+# 逐个标记过期并清空未抢的金额，转入退款中集合（多个进程同时执行也不会重复认领）
+# 返回 {认领到的红包ID, 数据已不存在的红包ID}
+_CLAIM_EXPIRED_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local claimed = {}
+local missing = {}
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    local key = ARGV[3] .. ':' .. id
+    if redis.call('EXISTS', key) == 0 then
+        table.insert(missing, id)
+    elseif redis.call('HSETNX', key, 'expired', 1) == 1 then
+        redis.call('PERSIST', key)
+        redis.call('DEL', key .. ':amounts')
+        redis.call('ZADD', KEYS[2], ARGV[1], id)
+        table.insert(claimed, id)
+    end
+end
+return {claimed, missing}
+"""
+
+# 重新认领退款中断的红包：KEYS = 退款中有序集合；ARGV = 认领时间上限, 当前时间, 最多认领个数
+# 认领到的红包分数更新为当前时间，多个进程同时执行时每个红包只会被一个进程认领
+_CLAIM_STALE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[3]))
+for _, id in ipairs(ids) do
+    redis.call('ZADD', KEYS[1], ARGV[2], id)
+end
+return ids
+"""
+
+_GRAB_ERRORS = {
+    -1: "红包不存在或已过期",
+    -2: "红包已被抢光",
+    -3: "你已经抢过这个红包了",
+    -4: "不能抢自己发的红包",
+}
+
+
 class RedPacketService:
     """红包服务类"""
     
     # 红包相关交易类型常量
     TRANSACTION_TYPE_RED_PACKET_SEND = 50  # 发送红包
     TRANSACTION_TYPE_RED_PACKET_RECEIVE = 51  # 抢到红包
+    TRANSACTION_TYPE_RED_PACKET_REFUND = 52  # 红包过期退回
     
     # 账户类型常量
     ACCOUNT_TYPE_POINTS = 1  # 积分账户
@@ -28,12 +128,105 @@ class RedPacketService:
     # 红包过期时间（秒）
     RED_PACKET_EXPIRE_TIME = 300  # 5分钟
     
-    # 全局红包缓存
-    # 格式: {red_packet_id: {amount, total_num, remaining_num, remaining_amount, participants, created_at, message_id, chat_id}}
-    _red_packets = {}
+    # 过期退款提交后 Redis key 的保留时间（秒），用于展示红包详情
+    RED_PACKET_KEY_TTL = 3600
+    
+    KEY_PREFIX = "red_packet"
+    # 到期时间有序集合（成员为红包ID，分数为到期时间戳），由 bot.tasks.red_packet_expiry 统一处理
+    EXPIRY_KEY = "red_packet:expiry"
+    # 已过期、正在退款的红包（分数为认领时间），退款提交后移除
+    REFUNDING_KEY = "red_packet:refunding"
     
-    def __init__(self, uow: UoW):
+    def __init__(self, uow: UoW, redis=None):
         self.uow = uow
+        self._redis = redis
+        self._grab_script = None
+        self._revert_script = None
+        self._claim_expired_script = None
+        self._claim_stale_script = None
+    
+    @property
+    def redis(self):
+        if self._redis is None:
+            from bot.database.redis_client import redis_client
+            self._redis = redis_client
+        return self._redis
+    
+    def _keys(self, red_packet_id: str) -> List[str]:
+        """红包哈希, 金额列表, 已抢用户集合, 抢红包记录列表"""
+        key = f"{self.KEY_PREFIX}:{red_packet_id}"
+        return [key, f"{key}:amounts", f"{key}:grabbers", f"{key}:participants"]
+    
+    def _script(self, name: str):
+        """注册 Lua 脚本（执行时使用 EVALSHA）"""
+        attr = f"_{name}_script"
+        script = getattr(self, attr)
+        if script is None:
+            source = {
+                "grab": _GRAB_SCRIPT,
+                "revert": _REVERT_SCRIPT,
+                "claim_expired": _CLAIM_EXPIRED_SCRIPT,
+                "claim_stale": _CLAIM_STALE_SCRIPT,
+            }[name]
+            script = self.redis.register_script(source)
+            setattr(self, attr, script)
+        return script
+    
+    @staticmethod
+    def _new_red_packet_id(owner) -> str:
+        """生成红包ID（同一秒内创建多个红包也不会重复）"""
+        return f"rp_{owner}_{int(time.time())}_{secrets.token_hex(3)}"
+    
+    async def _store_red_packet(
+        self,
+        red_packet_id: str,
+        amount: int,
+        total_num: int,
+        chat_id: int,
+        sender_id: int,
+        sender_name: str,
+        message_id: int = 0
+    ):
+        """把红包写入 Redis"""
+        keys = self._keys(red_packet_id)
+        created_at = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(keys[0], mapping={
+                "amount": amount,
+                "total_num": total_num,
+                "remaining_num": total_num,
+                "remaining_amount": amount,
+                "created_at": created_at,
+                "message_id": message_id,
+                "chat_id": chat_id,
+                "sender_id": sender_id,
+                "sender_name": sender_name,
+            })
+            pipe.rpush(keys[1], *split_red_packet(amount, total_num))
+            pipe.zadd(self.EXPIRY_KEY, {red_packet_id: created_at + self.RED_PACKET_EXPIRE_TIME})
+            await pipe.execute()
+    
+    async def create_system_red_packet(self, chat_id: int, amount: int, total_num: int, sender_name: str) -> str:
+        """
+        创建系统红包（不扣除任何账户积分）
+        
+        Returns:
+            红包ID
+        """
+        red_packet_id = self._new_red_packet_id("system")
+        await self._store_red_packet(
+            red_packet_id,
+            amount=amount,
+            total_num=total_num,
+            chat_id=chat_id,
+            sender_id=0,  # 0表示系统
+            sender_name=sender_name
+        )
+        return red_packet_id
+    
+    async def set_message_id(self, red_packet_id: str, message_id: int):
+        """记录红包消息ID（用于过期后更新消息）"""
+        await self.redis.hset(self._keys(red_packet_id)[0], "message_id", message_id)
     
     async def create_red_packet(self, telegram_id: int, amount: int, chat_id: int, message_id: int = 0) -> Dict:
         """
@@ -82,47 +275,35 @@ class RedPacketService:
                 total_num = max(1, min(20, amount // 10000))
                 
                 # 生成红包ID
-                red_packet_id = f"rp_{telegram_id}_{int(time.time())}"
-                
-                # 扣除用户积分
-                account.available_amount -= amount
-                account.total_amount -= amount
-                await account_crud.update(
-                    session=self.uow.session,
-                    db_obj=account,
-                    obj_in={"available_amount": account.available_amount, "total_amount": account.total_amount}
-                )
+                red_packet_id = self._new_red_packet_id(telegram_id)
                 
-                # 记录发红包交易
-                await transaction_crud.create(
-                    session=self.uow.session,
-                    account_id=account.id,
+                # 扣除用户积分（条件扣款，并发下不会透支），同时记录发红包交易
+                send_transaction = await account_crud.debit(
+                    self.uow.session,
                     telegram_id=telegram_id,
                     account_type=self.ACCOUNT_TYPE_POINTS,
+                    amount=amount,
                     transaction_type=self.TRANSACTION_TYPE_RED_PACKET_SEND,
-                    amount=-amount,
-                    balance=account.available_amount,
+                    require_active=True,
                     remarks=f"发放钓鱼红包 {amount} 积分"
                 )
+                if not send_transaction:
+                    return {
+                        "success": False,
+                        "message": f"积分不足，需要{amount}积分",
+                        "red_packet_id": None
+                    }
                 
-                # 创建红包
-                self._red_packets[red_packet_id] = {
-                    "amount": amount,
-                    "total_num": total_num,
-                    "remaining_num": total_num,
-                    "remaining_amount": amount,
-                    "participants": [],
-                    "created_at": time.time(),
-                    "message_id": message_id,
-                    "chat_id": chat_id,
-                    "sender_id": telegram_id,
-                    "sender_name": account.remarks or f"用户{telegram_id}"
-                }
-                
-                await self.uow.commit()
-                
-                # 设置红包过期任务
-                asyncio.create_task(self._expire_red_packet(red_packet_id))
+                # 创建红包（写入 Redis 失败时抛出异常，扣款随之回滚）
+                await self._store_red_packet(
+                    red_packet_id,
+                    amount=amount,
+                    total_num=total_num,
+                    chat_id=chat_id,
+                    sender_id=telegram_id,
+                    sender_name=account.remarks or f"用户{telegram_id}",
+                    message_id=message_id
+                )
                 
                 return {
                     "success": True,
@@ -143,7 +324,7 @@ class RedPacketService:
     
     async def grab_red_packet(self, telegram_id: int, red_packet_id: str, user_name: str = "") -> Dict:
         """
-        抢红包 - 检查用户是否有积分账户并更新用户积分，但不记录交易
+        抢红包 - 原子更新用户积分并记录抢红包交易
         
         Args:
             telegram_id: 抢红包用户的Telegram ID
@@ -154,98 +335,61 @@ class RedPacketService:
             抢红包结果字典
         """
         try:
-            # 检查红包是否存在
-            if red_packet_id not in self._red_packets:
-                return {
-                    "success": False,
-                    "message": "红包不存在或已过期",
-                    "amount": 0
-                }
+            keys = self._keys(red_packet_id)
+            name = user_name or f"用户{telegram_id}"
             
-            red_packet = self._red_packets[red_packet_id]
-            
-            # 检查红包是否已被抢光
-            if red_packet["remaining_num"] <= 0:
-                return {
-                    "success": False,
-                    "message": "红包已被抢光",
-                    "amount": 0
-                }
-            
-            # 检查用户是否已经抢过
-            if telegram_id in [p["telegram_id"] for p in red_packet["participants"]]:
-                return {
-                    "success": False,
-                    "message": "你已经抢过这个红包了",
-                    "amount": 0
-                }
-            
-            # 检查是否是自己发的红包
-            if telegram_id == red_packet["sender_id"] and red_packet["sender_id"] != 0:
+            # 检查红包状态并占用一份金额（Lua 脚本内原子完成，多个进程并发也不会重复分配）
+            status, grabbed_amount, remaining_num, participant = await self._script("grab")(
+                keys=keys,
+                args=[telegram_id, json.dumps(name, ensure_ascii=False), time.time()]
+            )
+            if status != 1:
                 return {
                     "success": False,
-                    "message": "不能抢自己发的红包",
+                    "message": _GRAB_ERRORS[status],
                     "amount": 0
                 }
             
-            # 检查用户是否有积分账户
-            from bot.crud.account import account as account_crud
-            account = await account_crud.get_by_telegram_id_and_type(
-                session=self.uow.session,
-                telegram_id=telegram_id,
-                account_type=self.ACCOUNT_TYPE_POINTS
-            )
+            # 原子入账并记录抢红包交易，由UoW统一提交
+            receive_transaction = None
+            committed = False
+            try:
+                async with self.uow:
+                    receive_transaction = await account_crud.credit(
+                        self.uow.session,
+                        telegram_id=telegram_id,
+                        account_type=self.ACCOUNT_TYPE_POINTS,
+                        amount=grabbed_amount,
+                        transaction_type=self.TRANSACTION_TYPE_RED_PACKET_RECEIVE,
+                        source_id=red_packet_id,
+                        remarks=f"抢到红包 {grabbed_amount} 积分"
+                    )
+                committed = True
+            finally:
+                if not (committed and receive_transaction):
+                    # 没有积分账户或提交失败，归还占用的份额
+                    await self._revert_grab(red_packet_id, telegram_id, grabbed_amount, participant)
             
-            if not account:
+            if not receive_transaction:
                 return {
                     "success": False,
                     "message": "你没有积分账户，无法抢红包",
                     "amount": 0
                 }
             
-            # 计算抢到的金额
-            grabbed_amount = self._calculate_red_packet_amount(
-                remaining_amount=red_packet["remaining_amount"],
-                remaining_num=red_packet["remaining_num"]
-            )
-            
-            # 更新红包信息
-            red_packet["remaining_num"] -= 1
-            red_packet["remaining_amount"] -= grabbed_amount
-            red_packet["participants"].append({
-                "telegram_id": telegram_id,
-                "name": user_name or f"用户{telegram_id}",
-                "amount": grabbed_amount,
-                "time": time.time()
-            })
-            
-            # 更新用户积分账户
-            account.available_amount += grabbed_amount
-            account.total_amount += grabbed_amount
-            
-            await account_crud.update(
-                session=self.uow.session,
-                db_obj=account,
-                obj_in={"available_amount": account.available_amount, "total_amount": account.total_amount}
-            )
-            
             # 日志记录
             logger.info(f"用户 {user_name or telegram_id} 抢到红包 {red_packet_id}，金额: {grabbed_amount} 积分")
             
-            # 提交事务
-            await self.uow.commit()
-            
-            # 获取红包状态
-            is_last = red_packet["remaining_num"] == 0
+            sender_name, total_amount, total_num = await self.redis.hmget(keys[0], "sender_name", "amount", "total_num")
             
             return {
                 "success": True,
                 "message": "抢红包成功",
                 "amount": grabbed_amount,
-                "is_last": is_last,
-                "sender_name": red_packet["sender_name"],
-                "total_amount": red_packet["amount"],
-                "total_num": red_packet["total_num"]
+                "is_last": remaining_num == 0,
+                "sender_name": sender_name,
+                "total_amount": int(total_amount or 0),
+                "total_num": int(total_num or 0)
             }
                 
         except Exception as e:
@@ -256,7 +400,49 @@ class RedPacketService:
                 "amount": 0
             }
     
-    def get_red_packet_info(self, red_packet_id: str) -> Dict:
+    async def _revert_grab(self, red_packet_id: str, telegram_id: int, amount: int, participant: str):
+        """
+        归还抢到但未能入账的份额
+        
+        红包未过期时放回金额列表；已过期时过期退款可能已经提交，份额直接退给发送者，
+        退款记录的来源ID为 红包ID:抢红包用户ID，重复执行不会多退
+        """
+        try:
+            status, sender_id = await self._script("revert")(
+                keys=self._keys(red_packet_id),
+                args=[telegram_id, amount, participant]
+            )
+        except Exception as e:
+            logger.error(f"归还红包份额失败 {red_packet_id} 用户 {telegram_id} 金额 {amount}: {e}")
+            return
+        if status == 0:
+            logger.error(f"红包已不存在，无法归还份额 {red_packet_id} 用户 {telegram_id} 金额 {amount}")
+            return
+        if status != 2 or sender_id == 0:
+            # 系统红包过期后不退款
+            return
+        
+        try:
+            async with self.uow:
+                refund = await account_crud.credit(
+                    self.uow.session,
+                    telegram_id=sender_id,
+                    account_type=self.ACCOUNT_TYPE_POINTS,
+                    amount=amount,
+                    transaction_type=self.TRANSACTION_TYPE_RED_PACKET_REFUND,
+                    source_id=f"{red_packet_id}:{telegram_id}",
+                    remarks=f"红包过期退回 {amount} 积分"
+                )
+            if not refund:
+                logger.error(f"发送者积分账户不存在，无法退回红包份额 {red_packet_id} 发送者 {sender_id} 金额 {amount}")
+        except IntegrityError:
+            # 已经退回过
+            await self.uow.rollback()
+        except Exception as e:
+            logger.error(f"退回过期红包份额失败 {red_packet_id} 发送者 {sender_id} 金额 {amount}: {e}")
+            await self.uow.rollback()
+    
+    async def get_red_packet_info(self, red_packet_id: str) -> Dict:
         """
         获取红包信息
         
@@ -266,135 +452,128 @@ class RedPacketService:
         Returns:
             红包信息字典
         """
-        if red_packet_id not in self._red_packets:
+        keys = self._keys(red_packet_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hgetall(keys[0])
+            pipe.lrange(keys[3], 0, -1)
+            red_packet, participants = await pipe.execute()
+        
+        if not red_packet:
             return {
                 "success": False,
                 "message": "红包不存在或已过期",
                 "info": None
             }
         
-        red_packet = self._red_packets[red_packet_id]
+        # 抢红包记录按抢到的先后顺序追加，无需再排序
+        participants = [json.loads(p) for p in participants]
         
         # 获取手气最佳
-        best_grabber = None
-        if red_packet["participants"]:
-            # 按照抢到金额排序，获取手气最佳
-            best_grabber = max(red_packet["participants"], key=lambda x: x["amount"])
-            
-            # 按照抢红包时间排序参与者列表
-            sorted_participants = sorted(red_packet["participants"], key=lambda x: x["time"])
-        else:
-            sorted_participants = []
+        best_grabber = max(participants, key=lambda x: x["amount"]) if participants else None
         
         return {
             "success": True,
             "message": "获取红包信息成功",
             "info": {
                 "sender_name": red_packet["sender_name"],
-                "sender_id": red_packet["sender_id"],
-                "amount": red_packet["amount"],
-                "total_num": red_packet["total_num"],
-                "remaining_num": red_packet["remaining_num"],
-                "remaining_amount": red_packet["remaining_amount"],
-                "participants": sorted_participants,
+                "sender_id": int(red_packet["sender_id"]),
+                "amount": int(red_packet["amount"]),
+                "total_num": int(red_packet["total_num"]),
+                "remaining_num": int(red_packet["remaining_num"]),
+                "remaining_amount": int(red_packet["remaining_amount"]),
+                "participants": participants,
                 "best_grabber": best_grabber,
-                "created_at": red_packet["created_at"],
-                "message_id": red_packet["message_id"],
-                "chat_id": red_packet["chat_id"]
+                "created_at": float(red_packet["created_at"]),
+                "message_id": int(red_packet["message_id"]),
+                "chat_id": int(red_packet["chat_id"]),
+                "expired": "expired" in red_packet
             }
         }
     
-    def _calculate_red_packet_amount(self, remaining_amount: int, remaining_num: int) -> int:
-        """计算红包金额（使用微信红包算法）"""
-        if remaining_num == 1:
-            return remaining_amount
-        
-        # 最小金额为1积分
-        min_amount = 1
-        # 最大金额为剩余平均值的2倍
-        max_amount = min(remaining_amount - min_amount * (remaining_num - 1), int(remaining_amount * 2 / remaining_num))
+    async def claim_expired_red_packets(self, now: float = None, limit: int = 500) -> List[str]:
+        """
+        认领已到期的红包：标记过期（之后不能再抢）并转入退款中集合
         
-        # 随机计算
-        amount = random.randint(min_amount, max(min_amount, max_amount))
+        Returns:
+            认领到的红包ID列表
+        """
+        claimed, missing = await self._script("claim_expired")(
+            keys=[self.EXPIRY_KEY, self.REFUNDING_KEY],
+            args=[now or time.time(), limit, self.KEY_PREFIX]
+        )
+        if missing:
+            logger.error(f"到期红包的数据已不存在，无法退款: {missing}")
+        return claimed
+    
+    async def claim_stale_refunding(self, before: float, now: float = None, limit: int = 500) -> List[str]:
+        """
+        重新认领认领后超过一段时间仍未完成退款的红包（进程在退款途中退出）
         
-        return amount
+        认领时间更新为 now，同一个红包在下一次超时前不会被其它进程再次认领
+        """
+        return await self._script("claim_stale")(
+            keys=[self.REFUNDING_KEY],
+            args=[before, now or time.time(), limit]
+        )
     
-    async def _expire_red_packet(self, red_packet_id: str):
-        """红包过期处理"""
-        await asyncio.sleep(self.RED_PACKET_EXPIRE_TIME)
+    async def refund_expired_red_packets(self, red_packet_ids: List[str]) -> List[Dict]:
+        """
+        批量退回过期红包的剩余金额
         
-        if red_packet_id in self._red_packets:
-            red_packet = self._red_packets[red_packet_id]
-            
-            # 如果还有剩余金额，且不是系统发放的红包，退回给发送者
-            if red_packet["remaining_amount"] > 0 and red_packet["sender_id"] != 0:
-                try:
-                    async with SessionFactory() as session:
-                        uow = UoW(session)
-                        
-                        # 获取发送者账户
-                        account = await account_crud.get_by_telegram_id_and_type(
-                            uow.session, 
-                            red_packet["sender_id"], 
-                            self.ACCOUNT_TYPE_POINTS
-                        )
-                        
-                        if account:
-                            # 更新账户
-                            account.available_amount += red_packet["remaining_amount"]
-                            account.total_amount += red_packet["remaining_amount"]
-                            await account_crud.update(
-                                session=uow.session,
-                                db_obj=account,
-                                obj_in={"available_amount": account.available_amount, "total_amount": account.total_amount}
-                            )
-                            
-                            # 记录退回交易
-                            await transaction_crud.create(
-                                session=uow.session,
-                                account_id=account.id,
-                                telegram_id=red_packet["sender_id"],
-                                account_type=self.ACCOUNT_TYPE_POINTS,
-                                transaction_type=self.TRANSACTION_TYPE_RED_PACKET_SEND,
-                                amount=red_packet["remaining_amount"],
-                                balance=account.available_amount,
-                                remarks=f"红包过期退回 {red_packet['remaining_amount']} 积分"
-                            )
-                            
-                            await uow.commit()
-                            
-                except Exception as e:
-                    logger.error(f"红包过期退回失败: {e}")
-            
-            # 更新红包消息，显示过期信息和抢红包记录
-            try:
-                if red_packet["message_id"] > 0 and red_packet["chat_id"] != 0:
-                    from bot.misc import bot
-                    from bot.handlers.red_packet_handler import _build_red_packet_expired_message
-                    
-                    # 获取红包信息
-                    red_packet_info = self.get_red_packet_info(red_packet_id)
-                    if red_packet_info["success"]:
-                        info = red_packet_info["info"]
-                        
-                        # 构建红包过期消息
-                        message = _build_red_packet_expired_message(
-                            sender_name=info["sender_name"],
-                            amount=info["amount"],
-                            total_num=info["total_num"],
-                            remaining_num=info["remaining_num"],
-                            participants=info["participants"],
-                            best_grabber=info["best_grabber"]
-                        )
-                        
-                        # 更新红包消息
-                        await bot.edit_message_text(
-                            chat_id=red_packet["chat_id"],
-                            message_id=red_packet["message_id"],
-                            text=message
-                        )
-            except Exception as e:
-                logger.error(f"更新过期红包消息失败: {e}")
+        所有红包的退款用一条 UPDATE 和一次批量插入完成，已经退过款的红包会被跳过；
+        两个进程同时退款同一个红包时，退款记录的唯一键使后提交的一方整体回滚，不会重复退款。退款提交后红包数据才开始按 RED_PACKET_KEY_TTL 过期
+        
+        Args:
+            red_packet_ids: 已认领的过期红包ID
             
-            # 从缓存中删除红包
-            del self._red_packets[red_packet_id] 
\ No newline at end of file
+        Returns:
+            过期红包信息列表（用于更新红包消息）
+        """
+        if not red_packet_ids:
+            return []
+        
+        infos = []
+        for red_packet_id in red_packet_ids:
+            result = await self.get_red_packet_info(red_packet_id)
+            if result["success"]:
+                infos.append({"red_packet_id": red_packet_id, **result["info"]})
+            else:
+                logger.error(f"退款中的红包数据已不存在，无法退款: {red_packet_id}")
+        
+        # 系统发放的红包不退款
+        refunds = {
+            info["red_packet_id"]: info for info in infos
+            if info["remaining_amount"] > 0 and info["sender_id"] != 0
+        }
+        if refunds:
+            async with self.uow:
+                refunded = await transaction_crud.get_existing_source_ids(
+                    self.uow.session,
+                    transaction_type=self.TRANSACTION_TYPE_RED_PACKET_REFUND,
+                    source_ids=list(refunds)
+                )
+                entries = [
+                    {
+                        "telegram_id": info["sender_id"],
+                        "amount": info["remaining_amount"],
+                        "source_id": red_packet_id,
+                        "remarks": f"红包过期退回 {info['remaining_amount']} 积分"
+                    }
+                    for red_packet_id, info in refunds.items()
+                    if red_packet_id not in refunded
+                ]
+                await account_crud.credit_many(
+                    self.uow.session,
+                    account_type=self.ACCOUNT_TYPE_POINTS,
+                    transaction_type=self.TRANSACTION_TYPE_RED_PACKET_REFUND,
+                    entries=entries
+                )
+        
+        # 退款已提交，红包数据开始过期，移出退款中集合
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for red_packet_id in red_packet_ids:
+                for key in self._keys(red_packet_id):
+                    pipe.expire(key, self.RED_PACKET_KEY_TTL)
+            pipe.zrem(self.REFUNDING_KEY, *red_packet_ids)
+            await pipe.execute()
+        return infos
@@ -0,0 +1,75 @@
+"""
+红包拆分
+创建红包时一次性生成全部份额：先按随机权重把总额切分（等价于在总额上随机取切点，
+每种切分方式概率相同），再把超过上限的部分按剩余空间分给其它份额。
+每份金额的分布与抢红包的先后顺序无关，O(N) 完成
+"""
+
+import math
+import random
+from typing import List, Optional
+
+
+def split_red_packet(
+    amount: int,
+    count: int,
+    min_amount: int = 1,
+    max_amount: Optional[int] = None,
+    seed: Optional[int] = None,
+    rng: Optional[random.Random] = None
+) -> List[int]:
+    """
+    把红包总额随机拆分成 count 份
+
+    Args:
+        amount: 红包总额
+        count: 份数
+        min_amount: 每份最小金额
+        max_amount: 每份最大金额，默认为平均值的 2 倍（与微信红包一致），
+            不足以分完总额时自动提高到平均值（向上取整）
+        seed: 随机种子，给定时结果可复现（用于测试）
+        rng: 随机数生成器，优先于 seed
+
+    Returns:
+        每份金额列表，总和等于 amount
+    """
+    if count < 1:
+        raise ValueError("红包份数必须大于0")
+    if amount < count * min_amount:
+        raise ValueError(f"红包总额 {amount} 不足以分成 {count} 份（每份至少 {min_amount}）")
+
+    rng = rng or random.Random(seed)
+    if max_amount is None:
+        max_amount = 2 * amount // count
+    max_amount = max(max_amount, min_amount, math.ceil(amount / count))
+
+    # 先给每份最小金额，剩余部分按随机权重切分
+    pool = amount - count * min_amount
+    cap = max_amount - min_amount
+    weights = [rng.expovariate(1.0) for _ in range(count)]
+    total_weight = sum(weights)
+    extras = [int(pool * weight / total_weight) for weight in weights]
+    for index in rng.sample(range(count), pool - sum(extras)):
+        extras[index] += 1
+
+    # 超过上限的部分按剩余空间比例分给其它份额
+    excess = sum(extra - cap for extra in extras if extra > cap)
+    if excess:
+        extras = [min(extra, cap) for extra in extras]
+        room = [cap - extra for extra in extras]
+        total_room = sum(room)
+        for index, space in enumerate(room):
+            share = excess * space // total_room
+            extras[index] += share
+            room[index] -= share
+        remainder = pool - sum(extras)
+        candidates = [index for index, space in enumerate(room) if space > 0]
+        while remainder:
+            index = rng.choice(candidates)
+            extras[index] += 1
+            room[index] -= 1
+            remainder -= 1
+            if not room[index]:
+                candidates.remove(index)
+
+    return [min_amount + extra for extra in extras]
@@ -67,6 +67,32 @@ class Config(BaseSettings):
     checkin_allowed_groups: str = ""  # 允许签到的群组ID，逗号分隔
     subscription_link: str = "https://t.me/your_channel"  # 钓鱼通知中的订阅链接
 
+    # 开奖调度配置
+    lottery_max_concurrent_draws: int = 5  # 同时开奖的群组数上限（每个占用一个数据库连接）
+
+    # 挖矿奖励发放配置
+    mining_reward_workers: int = 4  # 并行处理批次的协程数（每个占用一个数据库连接）
+    mining_reward_batch_size: int = 500  # 每批处理的矿工卡数量
+
+    # 统计汇总配置
+    stats_flush_interval_ms: int = 1000  # 本地累加的统计计数写入 Redis 的间隔（毫秒）
+
+    # 签到配置
+    checkin_batch_size: int = 200  # 每批合并写入的签到数
+    checkin_batch_interval_ms: int = 200  # 收集一批签到的最长等待时间（毫秒）
+
+    # 余额缓存配置
+    balance_cache_ttl: int = 60  # 只读展示使用的余额缓存有效期（秒）
+
+    # 消息编辑配置
+    message_edit_interval_ms: int = 1000  # 同一条消息两次编辑的最小间隔（毫秒），期间的更新合并为一次
+
+    # 日志配置
+    log_async: bool = False  # 日志放入队列由后台线程写出，不阻塞事件循环
+    log_json: bool = False  # 日志输出为每行一条 JSON
+    log_queue_size: int = 10000  # 异步日志队列长度，队列满时丢弃新日志
+    log_hot_rate: int = 50  # 异步模式下高频日志来源每秒最多写出的 INFO 条数（0 为不限）
+
     @property
     def MYSQL_DSN(self) -> str:
         """
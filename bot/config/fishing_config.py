@@ -4,9 +4,11 @@
 """
 
 from dataclasses import dataclass
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import random
 
+from bot.utils.alias_table import AliasTable
+
 @dataclass
 class FishingRod:
     """钓鱼竿配置"""
@@ -103,6 +105,9 @@ class FishingConfig:
     # 钓鱼失败概率
     FAILURE_PROBABILITY = 0.05  # 5%
     
+    # 钓鱼失败对应的分类名
+    FAILURE_CATEGORY = "失败"
+    
     # 钓鱼失败提示
     FAILURE_MESSAGES = [
         "鱼竿太脆弱了，没能钓上来鱼并且损坏了，加油，下次一定能钓上来~！~",
@@ -130,37 +135,62 @@ class FishingConfig:
         else:
             return category_fishes[0]  # 默认返回最低积分鱼
     
+    # 编译好的别名表（compile_tables 生成）
+    _category_table: Optional[AliasTable] = None
+    # 鱼竿类型 -> 别名表，结果为 (分类, 鱼)，钓鱼失败时鱼为 None
+    _rod_tables: Dict[str, AliasTable] = {}
+    
+    @classmethod
+    def compile_tables(cls):
+        """把概率配置编译为别名表，每次抽样 O(1)（修改概率或鱼类配置后需重新调用）"""
+        categories = list(cls.FISH_CATEGORIES) + [cls.FAILURE_CATEGORY]
+        weights = [category.probability for category in cls.FISH_CATEGORIES.values()] + [cls.FAILURE_PROBABILITY]
+        cls._category_table = AliasTable(categories, weights)
+        cls._rod_tables = {
+            rod_type: AliasTable(
+                [
+                    (category, None if category == cls.FAILURE_CATEGORY else cls.get_fish_by_rod_and_category(rod_type, category))
+                    for category in categories
+                ],
+                weights
+            )
+            for rod_type in cls.FISHING_RODS
+        }
+    
+    @classmethod
+    def get_rod_table(cls, rod_type: str) -> AliasTable:
+        """获取鱼竿的别名表（结果为 (分类, 鱼)，钓鱼失败时鱼为 None）"""
+        if not cls._rod_tables:
+            cls.compile_tables()
+        return cls._rod_tables[rod_type]
+    
     @classmethod
-    def get_random_fish_category(cls) -> str:
+    def get_random_fish_category(cls, rng: Optional[random.Random] = None) -> str:
         """随机获取鱼类分类"""
-        categories = list(cls.FISH_CATEGORIES.keys())
-        probabilities = [cls.FISH_CATEGORIES[cat].probability for cat in categories]
-        
-        # 添加失败概率
-        categories.append("失败")
-        probabilities.append(cls.FAILURE_PROBABILITY)
-        
-        # 归一化概率
-        total_prob = sum(probabilities)
-        normalized_probs = [p / total_prob for p in probabilities]
-        
-        return random.choices(categories, weights=normalized_probs)[0]
+        if cls._category_table is None:
+            cls.compile_tables()
+        return cls._category_table.sample(rng)
     
     @classmethod
-    def get_fishing_result(cls, rod_type: str) -> Dict:
+    def sample_catches(cls, rod_type: str, casts: int, rng: Optional[random.Random] = None) -> List[Tuple[str, Optional[Fish]]]:
+        """批量模拟钓鱼，返回每次的 (分类, 鱼)，钓鱼失败时鱼为 None"""
+        table = cls.get_rod_table(rod_type)
+        return [table.outcomes[i] for i in table.sample_indices(casts, rng)]
+    
+    @classmethod
+    def get_fishing_result(cls, rod_type: str, rng: Optional[random.Random] = None) -> Dict:
         """获取钓鱼结果"""
-        category = cls.get_random_fish_category()
+        category, fish = cls.get_rod_table(rod_type).sample(rng)
         
-        if category == "失败":
+        if fish is None:
             return {
                 "success": False,
-                "message": random.choice(cls.FAILURE_MESSAGES),
+                "message": (rng or random).choice(cls.FAILURE_MESSAGES),
                 "fish": None,
                 "points": 0,
                 "is_legendary": False
             }
         
-        fish = cls.get_fish_by_rod_and_category(rod_type, category)
         # 测试用：二类鱼、三类鱼和四类鱼都设为传说鱼，触发通知
         is_legendary = category in ["二类鱼", "三类鱼", "四类鱼"]
         
@@ -198,6 +228,9 @@ class FishingConfig:
             subscription_link=subscription_link
         )
 
+# 启动时编译别名表
+FishingConfig.compile_tables()
+
 # 使用示例
 if __name__ == "__main__":
     # 测试钓鱼逻辑
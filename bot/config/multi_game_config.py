@@ -6,12 +6,22 @@
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from decimal import Decimal
 import secrets
 import random
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def next_draw_deadline(after: datetime, interval_minutes: int) -> datetime:
+    """计算 after 之后的下一个开奖时间（分钟数整除开奖间隔的整分钟）"""
+    deadline = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    while deadline.minute % interval_minutes != 0:
+        deadline += timedelta(minutes=1)
+    return deadline
+
+
 @dataclass
 class GameConfig:
     """游戏配置"""
@@ -25,6 +35,8 @@ class GameConfig:
     number_max_bet: int  # 数字投注最大金额
     cashback_rate: float  # 返水比例
     enabled: bool = True  # 是否启用
+    seal_seconds: int = 30  # 开奖前多少秒封盘，封盘后不再接受投注
+    max_exposure: int = 0  # 单期任一开奖结果的赔付合计上限，超过的投注被拒绝（0 为不限）
 
 @dataclass
 class GroupConfig:
@@ -65,6 +77,7 @@ class MultiGameConfig:
                 number_min_bet=1,
                 number_max_bet=10000,
                 cashback_rate=0.008,
+                max_exposure=1000000,
             ),
             "fast_lottery": GameConfig(
                 game_type="fast_lottery",
@@ -81,6 +94,7 @@ class MultiGameConfig:
                 number_min_bet=1,
                 number_max_bet=5000,
                 cashback_rate=0.005,
+                max_exposure=500000,
             ),
             "high_odds": GameConfig(
                 game_type="high_odds",
@@ -102,12 +116,16 @@ class MultiGameConfig:
                 number_min_bet=10,
                 number_max_bet=20000,
                 cashback_rate=0.01,
+                max_exposure=2000000,
             ),
         }
         
         # 群组配置（可以从数据库或配置文件加载）
         self.group_configs: Dict[int, GroupConfig] = {}
         
+        # 游戏类型 -> 投注类型 -> 开出 0-9 时的赔率（按需生成）
+        self._payout_odds: Dict[str, Dict[str, List[Decimal]]] = {}
+        
         # 默认群组配置
         self._init_default_groups()
     
@@ -224,6 +242,59 @@ class MultiGameConfig:
         logger.info(f"组合投注奖金计算: 类型={bet_type}, 金额={bet_amount}, 赔率={bet_config['odds']}, 奖金={win_amount}")
         return win_amount
     
+    def get_winning_odds(self, result: int, game_type: str) -> Dict[str, float]:
+        """
+        获取开奖结果对应的全部中奖投注类型及赔率
+
+        一次性根据投注类型表算出整期的中奖集合（含数字投注），
+        供批量结算使用，避免逐注调用 check_bet_win/calculate_win_amount。
+        """
+        game_config = self.get_game_config(game_type)
+        if not game_config:
+            logger.error(f"游戏配置未找到: {game_type}")
+            return {}
+
+        winning_odds = {
+            bet_type: bet_config["odds"]
+            for bet_type, bet_config in game_config.bet_types.items()
+            if result in bet_config["numbers"]
+        }
+        winning_odds[str(result)] = game_config.number_odds
+        return winning_odds
+
+    def get_payout_vector(self, game_type: str, bet_type: str, bet_amount: int) -> List[int]:
+        """
+        一笔投注在开出 0-9 时分别需要派发的奖金
+
+        与 settle_draw 结算一致：奖金为 floor(投注金额 × 赔率)，未中奖或投注类型不在本游戏中为 0
+        """
+        table = self._payout_odds.get(game_type)
+        if table is None:
+            table = {}
+            for result in range(10):
+                for winning_type, odds in self.get_winning_odds(result, game_type).items():
+                    table.setdefault(winning_type, [Decimal(0)] * 10)[result] = Decimal(str(odds))
+            self._payout_odds[game_type] = table
+        odds_by_result = table.get(bet_type)
+        if odds_by_result is None:
+            return [0] * 10
+        return [int(bet_amount * odds) for odds in odds_by_result]
+
+    def get_seal_time(self, group_id: int, created_at: datetime) -> Optional[datetime]:
+        """
+        在 created_at 创建的期的封盘时间（计划开奖时间前 seal_seconds 秒）
+
+        群组未配置或未开启自动开奖时没有计划开奖时间，返回 None
+        """
+        group_config = self.get_group_config(group_id)
+        if not group_config or not group_config.auto_draw:
+            return None
+        game_config = self.get_game_config(group_config.game_type)
+        if not game_config:
+            return None
+        deadline = next_draw_deadline(created_at, game_config.draw_interval)
+        return deadline - timedelta(seconds=game_config.seal_seconds)
+
     def calculate_cashback(self, bet_amount: int, game_type: str) -> int:
         """计算返水金额"""
         game_config = self.get_game_config(game_type)
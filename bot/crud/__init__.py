@@ -4,6 +4,7 @@ from bot.crud.account_transaction import account_transaction
 from bot.crud.account import account
 from bot.crud.recharge_order import recharge_order
 from bot.crud.sign_in_record import sign_in_record
+from bot.crud.user import user
 from bot.crud.mining import mining_card, mining_reward, mining_statistics
 
 __all__ = [
@@ -17,4 +18,5 @@ __all__ = [
     "account",
     "recharge_order",
     "sign_in_record",
+    "user",
 ] 
\ No newline at end of file
@@ -1,8 +1,16 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, insert, case
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 
 from bot.crud.base import CRUDBase
 from bot.models.account import Account
+from bot.models.account_transaction import AccountTransaction
+from bot.utils.balance_cache import balance_cache
+
+logger = logging.getLogger(__name__)
 
 
 class CRUDAccount(CRUDBase[Account]):
@@ -23,5 +31,369 @@ class CRUDAccount(CRUDBase[Account]):
         result = await session.execute(stmt)
         return list(result.scalars().all())
 
+    async def get_cached_balances(
+        self,
+        session: AsyncSession,
+        telegram_id: int,
+        account_types: Sequence[int]
+    ) -> Dict[int, Optional[int]]:
+        """
+        只读展示用的可用余额：优先读余额缓存，未命中的类型一次查库并回填
+
+        缓存可能比数据库落后几毫秒，扣款前的余额校验等资金路径不要使用
+
+        Returns:
+            账户类型 -> 可用余额，账户不存在时为 None
+        """
+        balances = await balance_cache.get_many(telegram_id, account_types)
+        missing = [t for t in account_types if t not in balances]
+        if missing:
+            result = await session.execute(
+                select(self.model.account_type, self.model.available_amount)
+                .where(self.model.telegram_id == telegram_id, self.model.account_type.in_(missing))
+            )
+            loaded: Dict[int, Optional[int]] = dict.fromkeys(missing)
+            loaded.update(result.tuples().all())
+            await balance_cache.fill(telegram_id, loaded)
+            balances.update(loaded)
+        return balances
+
+    async def _change_balance(
+        self,
+        session: AsyncSession,
+        *,
+        telegram_id: int,
+        account_type: int,
+        amount: int,
+        transaction_type: int,
+        require_active: bool = False,
+        invited_telegram_id: Optional[int] = None,
+        source_id: Optional[str] = None,
+        group_id: Optional[int] = None,
+        remarks: Optional[str] = None
+    ) -> AccountTransaction | None:
+        """
+        在数据库内原子地变更余额并追加交易记录（不提交事务）
+
+        amount 为负数时是扣款，UPDATE 带上 available_amount >= 扣款额 的条件，
+        并发扣款不会丢失更新也不会透支；交易记录随外层 UoW 一起提交。
+        本类中所有变更余额的方法都会登记余额缓存，事务提交后失效。
+        """
+        stmt = update(self.model).where(
+            self.model.telegram_id == telegram_id,
+            self.model.account_type == account_type
+        )
+        if amount < 0:
+            stmt = stmt.where(self.model.available_amount >= -amount)
+        if require_active:
+            stmt = stmt.where(self.model.status == 1)
+        stmt = stmt.values(
+            available_amount=self.model.available_amount + amount,
+            total_amount=self.model.total_amount + amount
+        ).execution_options(synchronize_session=False)
+
+        result = await session.execute(stmt)
+        if result.rowcount == 0:
+            return None
+        balance_cache.mark_dirty(session, [(telegram_id, account_type)])
+
+        row = (await session.execute(
+            select(self.model.id, self.model.user_id, self.model.available_amount)
+            .where(self.model.telegram_id == telegram_id, self.model.account_type == account_type)
+        )).first()
+
+        transaction = AccountTransaction(
+            account_id=row.id,
+            user_id=row.user_id,
+            telegram_id=telegram_id,
+            invited_telegram_id=invited_telegram_id,
+            account_type=account_type,
+            transaction_type=transaction_type,
+            amount=amount,
+            balance=row.available_amount,
+            source_id=source_id,
+            group_id=group_id,
+            remarks=remarks
+        )
+        session.add(transaction)
+        return transaction
+
+    async def debit(self, session: AsyncSession, *, telegram_id: int, account_type: int, amount: int, transaction_type: int, **kwargs) -> AccountTransaction | None:
+        """
+        扣款（条件 UPDATE，不提交事务）
+
+        Returns:
+            扣款交易记录（balance 即扣款后余额）；账户不存在或余额不足时返回 None
+        """
+        return await self._change_balance(
+            session,
+            telegram_id=telegram_id,
+            account_type=account_type,
+            amount=-amount,
+            transaction_type=transaction_type,
+            **kwargs
+        )
+
+    async def credit(self, session: AsyncSession, *, telegram_id: int, account_type: int, amount: int, transaction_type: int, **kwargs) -> AccountTransaction | None:
+        """
+        入账（原子 UPDATE，不提交事务）
+
+        Returns:
+            入账交易记录（balance 即入账后余额）；账户不存在时返回 None
+        """
+        return await self._change_balance(
+            session,
+            telegram_id=telegram_id,
+            account_type=account_type,
+            amount=amount,
+            transaction_type=transaction_type,
+            **kwargs
+        )
+
+    async def upsert_credit(
+        self,
+        session: AsyncSession,
+        *,
+        telegram_id: int,
+        user_id: int,
+        account_type: int,
+        amount: int,
+        transaction_type: int,
+        create_types: Sequence[int] = (),
+        **kwargs
+    ) -> AccountTransaction:
+        """
+        入账，账户不存在时先创建（一条 INSERT ... ON DUPLICATE KEY UPDATE，不提交事务）
+
+        Args:
+            create_types: 同时确保存在的其它账户类型（不入账）
+
+        Returns:
+            入账交易记录（balance 即入账后余额）
+        """
+        rows = [
+            {
+                "user_id": user_id,
+                "telegram_id": telegram_id,
+                "account_type": t,
+                "total_amount": amount if t == account_type else 0,
+                "available_amount": amount if t == account_type else 0,
+                "frozen_amount": 0,
+                "status": 1,
+            }
+            for t in (account_type, *create_types)
+        ]
+        stmt = mysql_insert(self.model).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            available_amount=self.model.available_amount + stmt.inserted.available_amount,
+            total_amount=self.model.total_amount + stmt.inserted.total_amount
+        )
+        await session.execute(stmt)
+        balance_cache.mark_dirty(session, [(telegram_id, t) for t in (account_type, *create_types)])
+
+        row = (await session.execute(
+            select(self.model.id, self.model.user_id, self.model.available_amount)
+            .where(self.model.telegram_id == telegram_id, self.model.account_type == account_type)
+        )).first()
+
+        transaction = AccountTransaction(
+            account_id=row.id,
+            user_id=row.user_id,
+            telegram_id=telegram_id,
+            account_type=account_type,
+            transaction_type=transaction_type,
+            amount=amount,
+            balance=row.available_amount,
+            **kwargs
+        )
+        session.add(transaction)
+        return transaction
+
+    async def ensure_accounts(
+        self,
+        session: AsyncSession,
+        *,
+        users: Dict[int, int],
+        account_types: Sequence[int]
+    ):
+        """
+        批量创建不存在的账户（一条 INSERT ... ON DUPLICATE KEY UPDATE，不提交事务）
+
+        Args:
+            users: telegram_id -> 用户ID
+            account_types: 每个用户需要的账户类型
+        """
+        rows = [
+            {
+                "user_id": user_id,
+                "telegram_id": telegram_id,
+                "account_type": account_type,
+                "total_amount": 0,
+                "available_amount": 0,
+                "frozen_amount": 0,
+                "status": 1,
+            }
+            for telegram_id, user_id in sorted(users.items())
+            for account_type in account_types
+        ]
+        if not rows:
+            return
+        stmt = mysql_insert(self.model).values(rows)
+        stmt = stmt.on_duplicate_key_update(id=self.model.id)
+        await session.execute(stmt)
+        balance_cache.mark_dirty(session, [(row["telegram_id"], row["account_type"]) for row in rows])
+
+    async def debit_many(
+        self,
+        session: AsyncSession,
+        *,
+        telegram_id: int,
+        account_type: int,
+        transaction_type: int,
+        entries: List[Dict[str, Any]]
+    ) -> Optional[int]:
+        """
+        同一用户多笔扣款（不提交事务）
+
+        用一条条件 UPDATE 扣除合计金额，再按条目批量写入交易记录，
+        交易后余额按条目顺序逐笔递减。
+
+        Args:
+            session: 数据库会话
+            telegram_id: 用户 Telegram ID
+            account_type: 账户类型
+            transaction_type: 交易类型
+            entries: 扣款条目列表，每项包含 amount，可选 remarks、group_id、source_id
+
+        Returns:
+            扣款后可用余额；账户不存在或余额不足时返回 None（不扣任何一笔）
+        """
+        total = sum(entry["amount"] for entry in entries)
+        result = await session.execute(
+            update(self.model)
+            .where(
+                self.model.telegram_id == telegram_id,
+                self.model.account_type == account_type,
+                self.model.available_amount >= total
+            )
+            .values(
+                available_amount=self.model.available_amount - total,
+                total_amount=self.model.total_amount - total
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            return None
+        balance_cache.mark_dirty(session, [(telegram_id, account_type)])
+
+        row = (await session.execute(
+            select(self.model.id, self.model.user_id, self.model.available_amount)
+            .where(self.model.telegram_id == telegram_id, self.model.account_type == account_type)
+        )).first()
+
+        running = row.available_amount + total
+        transactions = []
+        for entry in entries:
+            running -= entry["amount"]
+            transactions.append({
+                "account_id": row.id,
+                "user_id": row.user_id,
+                "telegram_id": telegram_id,
+                "invited_telegram_id": None,
+                "account_type": account_type,
+                "transaction_type": transaction_type,
+                "amount": -entry["amount"],
+                "balance": running,
+                "source_id": entry.get("source_id"),
+                "group_id": entry.get("group_id"),
+                "remarks": entry.get("remarks"),
+            })
+        if transactions:
+            await session.execute(insert(AccountTransaction), transactions)
+
+        return row.available_amount
+
+    async def credit_many(
+        self,
+        session: AsyncSession,
+        *,
+        account_type: int,
+        transaction_type: int,
+        entries: List[Dict[str, Any]]
+    ) -> Dict[int, int]:
+        """
+        批量入账（不提交事务）
+
+        按 telegram_id 聚合后用一条 UPDATE 给所有账户加款，
+        再按条目批量写入交易记录，交易后余额按条目顺序逐笔累计。
+
+        Args:
+            session: 数据库会话
+            account_type: 账户类型
+            transaction_type: 交易类型
+            entries: 入账条目列表，每项包含 telegram_id、amount，
+                可选 remarks、group_id、source_id
+
+        Returns:
+            telegram_id -> 入账后可用余额，没有账户的用户不在结果中
+        """
+        totals: Dict[int, int] = {}
+        for entry in entries:
+            totals[entry["telegram_id"]] = totals.get(entry["telegram_id"], 0) + entry["amount"]
+        if not totals:
+            return {}
+
+        delta = case(totals, value=self.model.telegram_id, else_=0)
+        await session.execute(
+            update(self.model)
+            .where(self.model.telegram_id.in_(list(totals)), self.model.account_type == account_type)
+            .values(
+                available_amount=self.model.available_amount + delta,
+                total_amount=self.model.total_amount + delta
+            )
+            .execution_options(synchronize_session=False)
+        )
+        balance_cache.mark_dirty(session, [(telegram_id, account_type) for telegram_id in totals])
+
+        result = await session.execute(
+            select(self.model.id, self.model.user_id, self.model.telegram_id, self.model.available_amount)
+            .where(self.model.telegram_id.in_(list(totals)), self.model.account_type == account_type)
+        )
+        accounts = {row.telegram_id: row for row in result.all()}
+
+        # 从入账前余额开始逐笔累计，保证每条交易记录的余额连续
+        running = {
+            telegram_id: row.available_amount - totals[telegram_id]
+            for telegram_id, row in accounts.items()
+        }
+        transactions = []
+        for entry in entries:
+            row = accounts.get(entry["telegram_id"])
+            if row is None:
+                continue
+            running[row.telegram_id] += entry["amount"]
+            transactions.append({
+                "account_id": row.id,
+                "user_id": row.user_id,
+                "telegram_id": row.telegram_id,
+                "invited_telegram_id": None,
+                "account_type": account_type,
+                "transaction_type": transaction_type,
+                "amount": entry["amount"],
+                "balance": running[row.telegram_id],
+                "source_id": entry.get("source_id"),
+                "group_id": entry.get("group_id"),
+                "remarks": entry.get("remarks"),
+            })
+
+        missing = set(totals) - set(accounts)
+        if missing:
+            logger.error(f"批量入账失败: 未找到用户账户, 用户={sorted(missing)}")
+
+        if transactions:
+            await session.execute(insert(AccountTransaction), transactions)
+
+        return {telegram_id: row.available_amount for telegram_id, row in accounts.items()}
+
 
-account = CRUDAccount(Account) 
\ No newline at end of file
+account = CRUDAccount(Account)
@@ -6,9 +6,8 @@ from bot.crud.base import CRUDBase
 from bot.models.account_transaction import AccountTransaction
 
 class CRUDAccountTransaction(CRUDBase[AccountTransaction]):
-    async def create(
-        self,
-        session: AsyncSession,
+    @staticmethod
+    def _build_transaction_data(
         *,
         account_id: int,
         telegram_id: int,
@@ -21,9 +20,9 @@ class CRUDAccountTransaction(CRUDBase[AccountTransaction]):
         source_id: Optional[str] = None,
         group_id: Optional[int] = None,
         remarks: Optional[str] = None
-    ) -> AccountTransaction:
-        """创建交易记录"""
-        transaction_data = {
+    ) -> Dict[str, Any]:
+        """组装交易记录数据"""
+        return {
             "account_id": account_id,
             "user_id": user_id,
             "telegram_id": telegram_id,
@@ -36,8 +35,17 @@ class CRUDAccountTransaction(CRUDBase[AccountTransaction]):
             "group_id": group_id,
             "remarks": remarks
         }
+
+    async def create(self, session: AsyncSession, **kwargs) -> AccountTransaction:
+        """创建交易记录"""
+        transaction_data = self._build_transaction_data(**kwargs)
         return await super().create(session=session, obj_in=transaction_data)
 
+    async def create_flush(self, session: AsyncSession, *, refresh: bool = False, **kwargs) -> AccountTransaction:
+        """创建交易记录（不提交事务，由外层 UoW 统一提交）"""
+        transaction_data = self._build_transaction_data(**kwargs)
+        return await super().create_flush(session=session, obj_in=transaction_data, refresh=refresh)
+
     async def get_by_account_id(
         self,
         session: AsyncSession,
@@ -92,6 +100,23 @@ class CRUDAccountTransaction(CRUDBase[AccountTransaction]):
         result = await session.execute(stmt)
         return result.scalars().all()
 
+    async def get_existing_source_ids(
+        self,
+        session: AsyncSession,
+        *,
+        transaction_type: int,
+        source_ids: List[str]
+    ) -> set[str]:
+        """返回已经有该类型交易记录的来源ID（用于批量入账前去重）"""
+        if not source_ids:
+            return set()
+        stmt = select(AccountTransaction.source_id).where(
+            AccountTransaction.transaction_type == transaction_type,
+            AccountTransaction.source_id.in_(source_ids)
+        )
+        result = await session.execute(stmt)
+        return set(result.scalars().all())
+
     async def get_fishing_transactions(
         self,
         session: AsyncSession,
@@ -117,6 +117,69 @@ class CRUDBase(Service[ModelType], Generic[ModelType]):
         await session.refresh(db_obj)
         return db_obj
 
+    async def create_flush(
+        self, session: AsyncSession, *, obj_in: Dict[str, Any], refresh: bool = False
+    ) -> ModelType:
+        """
+        创建新对象（不提交事务）
+
+        只执行 add + flush 以获得主键，由外层 UoW 统一提交。
+
+        Args:
+            session: 数据库会话
+            obj_in: 对象数据
+            refresh: 是否在 flush 后刷新对象（需要读取数据库默认值时使用）
+
+        Returns:
+            创建的对象
+        """
+        db_obj = self.model(**obj_in)
+        session.add(db_obj)
+        await session.flush()
+        if refresh:
+            await session.refresh(db_obj)
+        return db_obj
+
+    async def update_flush(
+        self,
+        session: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[Dict[str, Any], ModelType],
+        exclude_fields: List[str] = None,
+        refresh: bool = False
+    ) -> ModelType:
+        """
+        更新对象（不提交事务）
+
+        只修改属性并 flush，由外层 UoW 统一提交。
+
+        Args:
+            session: 数据库会话
+            db_obj: 数据库中的对象
+            obj_in: 更新的数据
+            exclude_fields: 排除不更新的字段列表
+            refresh: 是否在 flush 后刷新对象
+
+        Returns:
+            更新后的对象
+        """
+        exclude_fields = exclude_fields or []
+
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+
+        for field in update_data:
+            if field not in exclude_fields:
+                setattr(db_obj, field, update_data[field])
+
+        await session.flush()
+        if refresh:
+            await session.refresh(db_obj)
+        return db_obj
+
     async def remove(self, session: AsyncSession, *, id: int) -> ModelType:
         """
         删除对象
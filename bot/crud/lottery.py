@@ -6,8 +6,9 @@
 import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
+from decimal import Decimal
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -37,6 +38,45 @@ class lottery_draw(CRUDBase[LotteryDraw]):
         result = await session.execute(stmt)
         return result.scalars().first()
     
+    async def lock_open_draw(self, session: AsyncSession, draw_id: int) -> bool:
+        """
+        对进行中的期加共享锁（不提交事务）
+        
+        投注事务之间的共享锁互不阻塞；开奖的 close_draw 需要排他锁，
+        会等已加锁的投注提交后再封盘，之后的投注读到已开奖状态。
+        返回 False 表示该期已经开奖或不存在
+        """
+        result = await session.execute(
+            select(LotteryDraw.id)
+            .where(LotteryDraw.id == draw_id, LotteryDraw.status == 1)
+            .with_for_update(read=True)
+        )
+        return result.first() is not None
+    
+    async def close_draw(self, session: AsyncSession, draw_id: int, result: int, draw_time: datetime) -> bool:
+        """
+        将进行中的期标记为已开奖（不提交事务）
+        
+        在开奖事务开始时执行，锁住该期之后到达的投注会因状态已变更而被拒绝；
+        返回 False 表示该期已经被其它进程开奖
+        """
+        stmt = (
+            update(LotteryDraw)
+            .where(LotteryDraw.id == draw_id, LotteryDraw.status == 1)
+            .values(result=result, status=2, draw_time=draw_time)
+            .execution_options(synchronize_session=False)
+        )
+        return (await session.execute(stmt)).rowcount > 0
+    
+    async def finish_draw(self, session: AsyncSession, draw_id: int, total_bets: int, total_payout: int) -> None:
+        """开奖时一次写入总投注、总派奖与盈亏（投注期间不更新该行）"""
+        await session.execute(
+            update(LotteryDraw)
+            .where(LotteryDraw.id == draw_id)
+            .values(total_bets=total_bets, total_payout=total_payout, profit=total_bets - total_payout)
+            .execution_options(synchronize_session=False)
+        )
+    
     async def get_recent_draws(self, session: AsyncSession, group_id: int, game_type: str, limit: int = 10) -> List[LotteryDraw]:
         stmt = select(LotteryDraw).where(
             LotteryDraw.group_id == group_id,
@@ -222,6 +262,64 @@ class lottery_bet(CRUDBase[LotteryBet]):
         result = await session.execute(stmt)
         return result.scalars().all()
     
+    async def settle_draw(self, session: AsyncSession, group_id: int, game_type: str, draw_number: str, winning_odds: Dict[str, float]) -> None:
+        """
+        集合化结算整期投注（不提交事务）
+
+        中奖注按投注类型赔率一次性计算奖金，未中奖注统一置零，
+        只处理投注中(status=1)的记录，重复执行不会重复结算。
+
+        Args:
+            session: 数据库会话
+            group_id: 群组ID
+            game_type: 游戏类型
+            draw_number: 期号
+            winning_odds: 中奖投注类型 -> 赔率
+        """
+        draw_filter = (
+            LotteryBet.group_id == group_id,
+            LotteryBet.game_type == game_type,
+            LotteryBet.draw_number == draw_number,
+            LotteryBet.status == 1,
+        )
+
+        if winning_odds:
+            odds_case = case(
+                {bet_type: Decimal(str(odds)) for bet_type, odds in winning_odds.items()},
+                value=LotteryBet.bet_type,
+                else_=0,
+            )
+            await session.execute(
+                update(LotteryBet)
+                .where(*draw_filter, LotteryBet.bet_type.in_(list(winning_odds)))
+                .values(is_win=True, win_amount=func.floor(LotteryBet.bet_amount * odds_case), status=3)
+                .execution_options(synchronize_session=False)
+            )
+
+        await session.execute(
+            update(LotteryBet)
+            .where(*draw_filter, LotteryBet.bet_type.not_in(list(winning_odds)))
+            .values(is_win=False, win_amount=0, status=3)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def get_winning_bets(self, session: AsyncSession, group_id: int, game_type: str, draw_number: str) -> List[Any]:
+        """获取某期全部中奖注（仅返回派奖所需的列）"""
+        stmt = select(
+            LotteryBet.id,
+            LotteryBet.telegram_id,
+            LotteryBet.bet_type,
+            LotteryBet.win_amount
+        ).where(
+            LotteryBet.group_id == group_id,
+            LotteryBet.game_type == game_type,
+            LotteryBet.draw_number == draw_number,
+            LotteryBet.is_win == True,
+            LotteryBet.win_amount > 0
+        ).order_by(LotteryBet.id)
+        result = await session.execute(stmt)
+        return result.all()
+
     async def get_by_user_draw_bet_type(self, session: AsyncSession, group_id: int, draw_number: str, telegram_id: int, bet_type: str) -> Optional[LotteryBet]:
         """检查用户是否已经对特定投注类型下过注"""
         stmt = select(LotteryBet).where(
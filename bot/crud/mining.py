@@ -4,9 +4,9 @@
 """
 
 from typing import Optional, List, Dict, Any
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, time, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func, and_, or_, insert, update, bindparam
 from decimal import Decimal
 import logging
 
@@ -45,7 +45,7 @@ class CRUDMiningCard(CRUDBase[MiningCard]):
             "last_reward_time": None,
             "remarks": remarks
         }
-        return await super().create(session=session, obj_in=mining_card_data)
+        return await super().create_flush(session=session, obj_in=mining_card_data, refresh=True)
 
     async def create_test_card(
         self,
@@ -133,6 +133,26 @@ class CRUDMiningCard(CRUDBase[MiningCard]):
         result = await session.execute(stmt)
         return result.scalar() or 0
 
+    def _needing_reward_filter(self, reward_date: date) -> tuple:
+        """
+        需要发放 reward_date 当天奖励的矿工卡条件
+        
+        日期条件都写成时间范围比较，可以直接使用 start_time/end_time/last_reward_time 上的索引
+        """
+        day_start = datetime.combine(reward_date, time.min)
+        next_day = day_start + timedelta(days=1)
+        return (
+            MiningCard.status == 1,  # 挖矿中
+            MiningCard.remaining_days > 0,  # 还有剩余天数
+            MiningCard.start_time < next_day,  # 已开始
+            MiningCard.end_time >= day_start,  # 未结束
+            or_(
+                MiningCard.last_reward_time.is_(None),  # 从未发放过奖励
+                MiningCard.last_reward_time < day_start  # 上次奖励日期早于当天
+            ),
+            MiningCard.is_deleted == False  # 确保未被删除
+        )
+
     async def get_cards_needing_reward(
         self,
         session: AsyncSession,
@@ -140,60 +160,101 @@ class CRUDMiningCard(CRUDBase[MiningCard]):
         reward_date: date
     ) -> List[MiningCard]:
         """获取需要发放奖励的矿工卡"""
-        stmt = select(MiningCard).where(
-            and_(
-                MiningCard.status == 1,  # 挖矿中
-                MiningCard.remaining_days > 0,  # 还有剩余天数
-                func.date(MiningCard.start_time) <= reward_date,  # 已开始（使用func.date转换为日期）
-                func.date(MiningCard.end_time) >= reward_date,  # 未结束（使用func.date转换为日期）
-                or_(
-                    MiningCard.last_reward_time.is_(None),  # 从未发放过奖励
-                    func.date(MiningCard.last_reward_time) < reward_date  # 上次奖励日期早于今天
-                ),
-                MiningCard.is_deleted == False  # 确保未被删除
-            )
-        )
+        stmt = select(MiningCard).where(*self._needing_reward_filter(reward_date))
         result = await session.execute(stmt)
         return result.scalars().all()
 
-    async def get_cards_needing_reward_batch(self, session: AsyncSession, reward_date: date, offset: int = 0, limit: int = 100) -> List[MiningCard]:
+    async def get_cards_needing_reward_batch(
+        self,
+        session: AsyncSession,
+        reward_date: date,
+        last_id: int = 0,
+        limit: int = 100,
+        for_update: bool = False,
+        max_id: Optional[int] = None
+    ) -> List[MiningCard]:
         """
-        批量获取需要发放奖励的矿工卡
+        按主键游标批量获取需要发放奖励的矿工卡
+        
+        已处理的卡会从条件中消失，用 offset 翻页会跳过后面的卡，
+        因此按 id > last_id 翻页，一次线性扫描即可覆盖全部矿工卡。
         
         Args:
             session: 数据库会话
             reward_date: 奖励日期
-            offset: 偏移量
+            last_id: 上一批最后一张卡的ID
             limit: 限制数量
+            for_update: 是否锁定本批矿工卡（发放奖励时使用，防止并发重复发放）
+            max_id: 只取 ID 不超过该值的卡（按ID区间并行处理时使用）
             
         Returns:
-            需要发放奖励的矿工卡列表
+            需要发放奖励的矿工卡列表（按ID升序）
         """
-        from sqlalchemy import func, or_
+        stmt = (
+            select(MiningCard)
+            .where(MiningCard.id > last_id, *self._needing_reward_filter(reward_date))
+            .order_by(MiningCard.id)
+            .limit(limit)
+        )
+        if max_id is not None:
+            stmt = stmt.where(MiningCard.id <= max_id)
+        if for_update:
+            stmt = stmt.with_for_update()
         
-        try:
-            stmt = (
-                select(MiningCard)
-                .where(
-                    MiningCard.status == 1,  # 挖矿中
-                    MiningCard.remaining_days > 0,  # 还有剩余天数
-                    func.date(MiningCard.start_time) <= reward_date,  # 已开始
-                    func.date(MiningCard.end_time) >= reward_date,  # 未结束
-                    or_(
-                        MiningCard.last_reward_time.is_(None),  # 从未发放过奖励
-                        func.date(MiningCard.last_reward_time) < reward_date  # 上次奖励日期早于今天
-                    )
-                )
-                .order_by(MiningCard.id)
-                .offset(offset)
-                .limit(limit)
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+    async def get_card_ids_needing_reward(
+        self,
+        session: AsyncSession,
+        reward_date: date,
+        last_id: int = 0,
+        limit: int = 100
+    ) -> List[int]:
+        """按主键游标获取需要发放奖励的矿工卡ID（只读索引列，不加锁，用于划分批次）"""
+        stmt = (
+            select(MiningCard.id)
+            .where(MiningCard.id > last_id, *self._needing_reward_filter(reward_date))
+            .order_by(MiningCard.id)
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
+
+    async def apply_daily_rewards(self, session: AsyncSession, updates: List[Dict[str, Any]]) -> None:
+        """
+        批量更新矿工卡的奖励进度（不提交事务）
+        
+        Args:
+            session: 数据库会话
+            updates: 每项包含 card_id、earned_points、remaining_days、end_time、status、last_reward_time
+        """
+        if not updates:
+            return
+        
+        table = MiningCard.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("card_id"))
+            .values(
+                earned_points=bindparam("new_earned_points"),
+                remaining_days=bindparam("new_remaining_days"),
+                end_time=bindparam("new_end_time"),
+                status=bindparam("new_status"),
+                last_reward_time=bindparam("new_last_reward_time")
             )
-            
-            result = await session.execute(stmt)
-            return result.scalars().all()
-        except Exception as e:
-            logger.error(f"批量获取需要发放奖励的矿工卡失败: {e}")
-            return []
+        )
+        await session.execute(stmt, [
+            {
+                "card_id": item["card_id"],
+                "new_earned_points": item["earned_points"],
+                "new_remaining_days": item["remaining_days"],
+                "new_end_time": item["end_time"],
+                "new_status": item["status"],
+                "new_last_reward_time": item["last_reward_time"],
+            }
+            for item in updates
+        ])
 
     async def update_card_reward(
         self,
@@ -215,7 +276,7 @@ class CRUDMiningCard(CRUDBase[MiningCard]):
         if status is not None:
             update_data["status"] = status
             
-        card = await self.update(
+        card = await self.update_flush(
             session=session,
             db_obj=await self.get(session, card_id),
             obj_in=update_data,
@@ -245,7 +306,7 @@ class CRUDMiningCard(CRUDBase[MiningCard]):
         if status is not None:
             update_data["status"] = status
             
-        card = await self.update(
+        card = await self.update_flush(
             session=session,
             db_obj=await self.get(session, card_id),
             obj_in=update_data,
@@ -407,18 +468,7 @@ class CRUDMiningCard(CRUDBase[MiningCard]):
     async def get_pending_cards_count(self, session):
         """获取需要处理的矿工卡数量"""
         try:
-            today = date.today()
-            query = select(func.count(self.model.id)).where(
-                self.model.status == 1,  # 挖矿中
-                self.model.remaining_days > 0,  # 还有剩余天数
-                func.date(self.model.start_time) <= today,  # 已经开始（使用func.date转换为日期）
-                func.date(self.model.end_time) >= today,  # 还未结束（使用func.date转换为日期）
-                or_(
-                    self.model.last_reward_time.is_(None),
-                    func.date(self.model.last_reward_time) < today
-                ),  # 今天还没发奖励
-                self.model.is_deleted == False
-            )
+            query = select(func.count(self.model.id)).where(*self._needing_reward_filter(date.today()))
             
             result = await session.execute(query)
             count = result.scalar()
@@ -430,21 +480,12 @@ class CRUDMiningCard(CRUDBase[MiningCard]):
             return 0
     
     async def get_pending_cards_batch(self, session, offset: int = 0, limit: int = 100):
-        """获取需要处理的矿工卡批次"""
+        """获取需要处理的矿工卡批次（用于查看，发放奖励请使用 get_cards_needing_reward_batch）"""
         try:
-            today = date.today()
             query = select(self.model).where(
-                self.model.status == 1,  # 挖矿中
-                self.model.remaining_days > 0,  # 还有剩余天数
-                func.date(self.model.start_time) <= today,  # 已经开始（使用func.date转换为日期）
-                func.date(self.model.end_time) >= today,  # 还未结束（使用func.date转换为日期）
-                or_(
-                    self.model.last_reward_time.is_(None),
-                    func.date(self.model.last_reward_time) < today
-                ),  # 今天还没发奖励
-                self.model.is_deleted == False
+                *self._needing_reward_filter(date.today())
             ).order_by(
-                self.model.created_at.asc()  # 按创建时间升序，先处理早的
+                self.model.id.asc()  # 按ID升序，先处理早的
             ).limit(limit).offset(offset)
             
             result = await session.execute(query)
@@ -540,7 +581,34 @@ class CRUDMiningReward(CRUDBase[MiningReward]):
             "claimed_time": None,
             "remarks": remarks
         }
-        return await super().create(session=session, obj_in=reward_data)
+        return await super().create_flush(session=session, obj_in=reward_data)
+
+    async def bulk_create_daily_rewards(self, session: AsyncSession, rewards: List[Dict[str, Any]]) -> set[int]:
+        """
+        批量写入每日挖矿奖励（不提交事务）
+        
+        (mining_card_id, reward_date) 上有唯一键，同一张卡同一天重复写入会被忽略，
+        批次重跑不会重复发放。调用方需已锁定这些矿工卡，已有奖励记录的卡在插入前被排除。
+        
+        Args:
+            session: 数据库会话
+            rewards: 奖励数据列表，同一批的 reward_date 相同且需为当天零点
+            
+        Returns:
+            本次新写入奖励记录的矿工卡ID
+        """
+        if not rewards:
+            return set()
+        stmt = select(MiningReward.mining_card_id).where(
+            MiningReward.mining_card_id.in_([reward["mining_card_id"] for reward in rewards]),
+            MiningReward.reward_date == rewards[0]["reward_date"]
+        )
+        existing = set((await session.execute(stmt)).scalars().all())
+        new_rewards = [reward for reward in rewards if reward["mining_card_id"] not in existing]
+        if new_rewards:
+            stmt = insert(MiningReward).prefix_with("IGNORE", dialect="mysql")
+            await session.execute(stmt, new_rewards)
+        return {reward["mining_card_id"] for reward in new_rewards}
 
     async def create_reward(
         self,
@@ -566,7 +634,7 @@ class CRUDMiningReward(CRUDBase[MiningReward]):
             "claimed_time": None,
             "remarks": remarks
         }
-        return await super().create(session=session, obj_in=reward_data)
+        return await super().create_flush(session=session, obj_in=reward_data)
 
     async def get_pending_rewards(
         self,
@@ -633,7 +701,7 @@ class CRUDMiningReward(CRUDBase[MiningReward]):
             reward.status = 2  # 已领取
             reward.claimed_time = datetime.now()
         
-        await session.commit()
+        await session.flush()
         return rewards
 
     async def get_reward_history(
@@ -704,7 +772,7 @@ class CRUDMiningStatistics(CRUDBase[MiningStatistics]):
                 "diamond_cards": 0,
                 "last_mining_time": None
             }
-            stats = await super().create(session=session, obj_in=stats_data)
+            stats = await super().create_flush(session=session, obj_in=stats_data)
         
         return stats
 
@@ -736,7 +804,7 @@ class CRUDMiningStatistics(CRUDBase[MiningStatistics]):
         elif card_type == "钻石":
             stats.diamond_cards += 1
         
-        await session.commit()
+        await session.flush()
         return stats
 
 
@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.crud.base import CRUDBase
+from bot.models.tg_user_group import User
+
+
+class CRUDUser(CRUDBase[User]):
+    async def upsert(self, session: AsyncSession, *, telegram_id: int, **fields: Any) -> int:
+        """
+        用户不存在时创建（一条 INSERT ... ON DUPLICATE KEY UPDATE），已存在时不修改
+
+        Args:
+            telegram_id: Telegram用户ID
+            fields: 新建用户时写入的其它字段
+
+        Returns:
+            用户ID
+        """
+        stmt = mysql_insert(self.model).values(telegram_id=telegram_id, **fields)
+        # 已存在时 id = LAST_INSERT_ID(id)，插入和更新两种情况都能从 lastrowid 取到用户ID
+        stmt = stmt.on_duplicate_key_update(id=func.last_insert_id(self.model.id))
+        result = await session.execute(stmt)
+        return result.lastrowid
+
+    async def advance_sign_streak(self, session: AsyncSession, user_id: int, sign_date: date) -> Optional[int]:
+        """
+        记录一次签到并更新连续签到天数（一条 UPDATE）
+
+        上次签到是前一天则连续天数加 1，否则从 1 重新开始
+
+        Returns:
+            签到后的连续签到天数；当天已经签到过时返回 None
+        """
+        streak = case(
+            (self.model.last_sign_date == sign_date - timedelta(days=1), self.model.sign_streak + 1),
+            else_=1
+        )
+        result = await session.execute(
+            update(self.model)
+            .where(
+                self.model.id == user_id,
+                or_(self.model.last_sign_date.is_(None), self.model.last_sign_date != sign_date)
+            )
+            # SET 按顺序执行，sign_streak 要在 last_sign_date 更新前计算；
+            # 新的天数通过 LAST_INSERT_ID(expr) 随执行结果返回，不需要再查一次
+            .ordered_values(
+                (self.model.sign_streak, func.last_insert_id(streak)),
+                (self.model.last_sign_date, sign_date)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            return None
+        return result.lastrowid
+
+    async def upsert_many(self, session: AsyncSession, rows: List[Dict[str, Any]]):
+        """批量创建不存在的用户（已存在的不修改），rows 每项必须包含 telegram_id"""
+        if not rows:
+            return
+        # 按 telegram_id 排序，多个批次并发时按相同顺序加锁，避免死锁
+        rows = sorted(rows, key=lambda row: row["telegram_id"])
+        stmt = mysql_insert(self.model).values(rows)
+        stmt = stmt.on_duplicate_key_update(id=self.model.id)
+        await session.execute(stmt)
+
+    async def get_sign_states_for_update(self, session: AsyncSession, telegram_ids: List[int]) -> Dict[int, Any]:
+        """
+        锁定用户行并读取签到状态
+
+        Returns:
+            telegram_id -> (id, telegram_id, last_sign_date, sign_streak)
+        """
+        result = await session.execute(
+            select(self.model.id, self.model.telegram_id, self.model.last_sign_date, self.model.sign_streak)
+            .where(self.model.telegram_id.in_(sorted(telegram_ids)))
+            .order_by(self.model.telegram_id)
+            .with_for_update()
+        )
+        return {row.telegram_id: row for row in result.all()}
+
+    async def set_sign_streaks(self, session: AsyncSession, streaks: Dict[int, int], sign_date: date):
+        """批量记录签到（一条 UPDATE），streaks 为 用户ID -> 签到后的连续天数"""
+        if not streaks:
+            return
+        await session.execute(
+            update(self.model)
+            .where(self.model.id.in_(list(streaks)))
+            .values(
+                sign_streak=case(streaks, value=self.model.id),
+                last_sign_date=sign_date
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+user = CRUDUser(User)
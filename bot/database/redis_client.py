@@ -0,0 +1,19 @@
+from redis.asyncio import Redis
+
+from bot.config import get_config
+
+config = get_config()
+
+# 业务共享的 Redis 客户端（FSM 存储使用 bot.misc 中单独的连接）
+redis_client = Redis.from_url(
+    str(config.REDIS_DSN),
+    decode_responses=True,
+    health_check_interval=30,
+)
+
+async def close_redis():
+    """关闭 Redis 连接
+    
+    应在应用程序退出前调用
+    """
+    await redis_client.aclose()
@@ -17,6 +17,7 @@ from bot.config.multi_game_config import MultiGameConfig
 from bot.common.lottery_service import LotteryService
 from bot.common.uow import UoW
 from bot.database.db import SessionFactory
+from bot.utils.stats_sink import stats_sink
 
 logger = logging.getLogger(__name__)
 
@@ -32,8 +33,44 @@ bet_message_stats = {
     "start_time": datetime.now()
 }
 
+# 所有进程汇总到 Redis 的投注统计（与 bet_message_stats 字段相同，错误类型为 error:<类型>）
+BET_STATS_KEY = stats_sink.key("bet")
+
+
+def _count_bet_stat(name: str, error_type: Optional[str] = None):
+    """累加投注统计（本进程 + Redis 汇总）"""
+    bet_message_stats[name] += 1
+    stats_sink.hincrby(BET_STATS_KEY, name)
+    if error_type is not None:
+        bet_message_stats["bet_errors"][error_type] = bet_message_stats["bet_errors"].get(error_type, 0) + 1
+        stats_sink.hincrby(BET_STATS_KEY, f"error:{error_type}")
+
+# 投注片段语法，各分支按优先级排列（与逐个尝试的顺序一致）：
+#   bt_*: 投注类型 + 金额 (如: 大1000, 大单100, 豹子50)
+#   n_*:  数字 + 金额 (如: 数字8押100, 8100)
+#   abt_*: 金额 + 投注类型 (如: 1000大, 100大单, 50豹子)
+#   an_*: 金额 + 数字 (如: 1000押8)
+#   digit: 纯数字投注 (如: 8, 五)，默认金额为1
+# 正则分支按顺序回溯，第一个完整匹配的分支即为结果
+_BET_TOKEN_RE = re.compile(
+    r'(?P<bt_type>[大小单双豹子]+)(?P<bt_amount>\d+)'
+    r'|(?:数字)?(?P<n_number>[0-9零一二三四五六七八九])\s*(?:押|下|注|买)?(?P<n_amount>\d+)'
+    r'|(?P<abt_amount>\d+)(?P<abt_type>[大小单双豹子]+)'
+    r'|(?P<an_amount>\d+)(?:押|下|注|买)?(?P<an_number>[0-9零一二三四五六七八九])'
+    r'|(?P<digit>[0-9零一二三四五六七八九])'
+)
+
+# 预筛选：同时包含投注关键词和数字的消息才进入解析
+_BET_KEYWORD_RE = re.compile(r'大|小|单|双|豹子|数字|押|下|注|买')
+_DIGIT_RE = re.compile(r'\d')
+
+
 class BetMessageParser:
-    """投注消息解析器"""
+    """
+    投注消息解析器
+    整条消息从左到右扫描一遍：每个片段先单独匹配，失败时与下一个片段拼接再匹配一次
+    （例如 "单 1000" -> "单1000"），所有片段共用同一个预编译的正则
+    """
     
     def __init__(self):
         self.multi_config = MultiGameConfig()
@@ -53,148 +90,79 @@ class BetMessageParser:
             "五": "5", "六": "6", "七": "7", "八": "8", "九": "9"
         }
     
+    @staticmethod
+    def is_candidate(content: str) -> bool:
+        """预筛选：消息同时包含投注关键词和数字时才可能是投注"""
+        return _DIGIT_RE.search(content) is not None and _BET_KEYWORD_RE.search(content) is not None
+    
     def parse_bet_message(self, content: str) -> List[Dict[str, Any]]:
         """解析投注消息"""
         bets = []
-        content = content.strip()
-        
-        # 首先尝试按空格分割，处理多个投注
         parts = content.split()
-        processed_indices = set()  # 记录已处理的索引
+        count = len(parts)
+        i = 0
         
-        for i, part in enumerate(parts):
-            if i in processed_indices or not part.strip():
-                continue
-                
-            part = part.strip()
+        while i < count:
+            part = parts[i]
             
             # 尝试解析单个投注片段
             bet_info = self._parse_single_bet(part)
             if bet_info:
                 bets.append(bet_info)
-                processed_indices.add(i)
+                i += 1
                 continue
             
-            # 如果单个片段解析失败，尝试组合相邻片段
-            # 例如: "单 1000" -> "单1000"
-            if len(parts) > 1:
-                # 尝试与下一个片段组合
-                if i + 1 < len(parts) and (i + 1) not in processed_indices:
-                    combined = part + parts[i + 1]
-                    bet_info = self._parse_single_bet(combined)
-                    if bet_info:
-                        bets.append(bet_info)
-                        processed_indices.add(i)
-                        processed_indices.add(i + 1)
-                        continue
-                
-                # 尝试与前一个片段组合
-                if i > 0 and (i - 1) not in processed_indices:
-                    combined = parts[i - 1] + part
-                    bet_info = self._parse_single_bet(combined)
-                    if bet_info:
-                        bets.append(bet_info)
-                        processed_indices.add(i - 1)
-                        processed_indices.add(i)
-                        continue
+            # 单个片段解析失败，尝试与下一个片段组合
+            if i + 1 < count:
+                bet_info = self._parse_single_bet(part + parts[i + 1])
+                if bet_info:
+                    bets.append(bet_info)
+                    i += 2
+                    continue
+            
+            i += 1
         
         return bets
     
     def _parse_single_bet(self, bet_text: str) -> Optional[Dict[str, Any]]:
         """解析单个投注"""
-        try:
-            original_text = bet_text
-            # 不要移除投注相关词汇，保留用于正则匹配
-            bet_text = bet_text.strip()
-            
-            # 匹配模式1: 投注类型 + 金额 (如: 大1000, 大单100, 豹子50)
-            pattern1 = r'^([大小单双豹子]+)(\d+)$'
-            match1 = re.match(pattern1, bet_text)
-            if match1:
-                bet_type = match1.group(1)
-                amount = int(match1.group(2))
-                if bet_type in self.bet_type_mapping and amount > 0:
-                    return {
-                        "type": "bet_type",
-                        "bet_type": self.bet_type_mapping[bet_type],
-                        "amount": amount,
-                        "original_text": original_text
-                    }
-                else:
-                    return None
-            
-            # 匹配模式2: 数字 + 金额 (如: 数字8 押100, 8 100)
-            pattern2 = r'^(?:数字)?([0-9零一二三四五六七八九])\s*(?:押|下|注|买)?(\d+)$'
-            match2 = re.match(pattern2, bet_text)
-            if match2:
-                number_str = match2.group(1)
-                amount = int(match2.group(2))
-                if number_str in self.number_mapping and amount > 0:
-                    number = self.number_mapping[number_str]
-                    return {
-                        "type": "number",
-                        "number": number,
-                        "amount": amount,
-                        "original_text": original_text
-                    }
-                else:
-                    return None
-            
-            # 匹配模式3: 金额 + 投注类型 (如: 1000大, 100大单, 50豹子)
-            pattern3 = r'^(\d+)([大小单双豹子]+)$'
-            match3 = re.match(pattern3, bet_text)
-            if match3:
-                amount = int(match3.group(1))
-                bet_type = match3.group(2)
-                if bet_type in self.bet_type_mapping and amount > 0:
-                    return {
-                        "type": "bet_type",
-                        "bet_type": self.bet_type_mapping[bet_type],
-                        "amount": amount,
-                        "original_text": original_text
-                    }
-                else:
-                    return None
-            
-            # 匹配模式4: 金额 + 数字 (如: 1008, 1000押8)
-            pattern4 = r'^(\d+)(?:押|下|注|买)?([0-9零一二三四五六七八九])$'
-            match4 = re.match(pattern4, bet_text)
-            if match4:
-                amount = int(match4.group(1))
-                number_str = match4.group(2)
-                if number_str in self.number_mapping and amount > 0:
-                    number = self.number_mapping[number_str]
-                    return {
-                        "type": "number",
-                        "number": number,
-                        "amount": amount,
-                        "original_text": original_text
-                    }
-                else:
-                    return None
-            
-            # 匹配模式5: 纯数字投注 (如: 8, 五)，但必须忽略"100"这种金额
-            pattern5 = r'^([0-9零一二三四五六七八九])$'
-            match5 = re.match(pattern5, bet_text)
-            if match5:
-                number_str = match5.group(1)
-                # 只允许1位数字，且不能是金额（如100、200等）
-                if number_str in self.number_mapping:
-                    number = self.number_mapping[number_str]
-                    return {
-                        "type": "number",
-                        "number": number,
-                        "amount": 1,  # 默认金额为1
-                        "original_text": original_text
-                    }
-                else:
-                    return None
-            
+        match = _BET_TOKEN_RE.fullmatch(bet_text)
+        if not match:
             # 其它情况全部视为无效投注
             return None
-        except Exception as e:
-            logger.error(f"解析投注文本失败: {bet_text}, 错误: {e}")
+        
+        groups = match.groupdict()
+        if groups["bt_type"] is not None:
+            return self._bet_type_bet(groups["bt_type"], groups["bt_amount"], bet_text)
+        if groups["n_number"] is not None:
+            return self._number_bet(groups["n_number"], int(groups["n_amount"]), bet_text)
+        if groups["abt_type"] is not None:
+            return self._bet_type_bet(groups["abt_type"], groups["abt_amount"], bet_text)
+        if groups["an_number"] is not None:
+            return self._number_bet(groups["an_number"], int(groups["an_amount"]), bet_text)
+        # 纯数字投注，默认金额为1
+        return self._number_bet(groups["digit"], 1, bet_text)
+    
+    def _bet_type_bet(self, bet_type: str, amount_text: str, original_text: str) -> Optional[Dict[str, Any]]:
+        amount = int(amount_text)
+        if bet_type not in self.bet_type_mapping or amount <= 0:
+            return None
+        return {
+            "type": "bet_type",
+            "bet_type": self.bet_type_mapping[bet_type],
+            "amount": amount,
+            "original_text": original_text
+        }
+    
+    def _number_bet(self, number_str: str, amount: int, original_text: str) -> Optional[Dict[str, Any]]:
+        if amount <= 0:
             return None
+        return {
+            "type": "number",
+            "number": self.number_mapping[number_str],
+            "amount": amount,
+            "original_text": original_text
+        }
 
 class BetMessageMonitor:
     """投注消息监控器"""
@@ -210,7 +178,7 @@ class BetMessageMonitor:
             chat_id = message.chat.id
             
             # 更新统计
-            bet_message_stats["total_bet_messages"] += 1
+            _count_bet_stat("total_bet_messages")
             
             logger.info(f"收到投注消息 | 用户: {message.from_user.full_name} (ID: {user_id}) | 群组: {message.chat.title} (ID: {chat_id}) | 内容: {content}")
             
@@ -219,38 +187,33 @@ class BetMessageMonitor:
             
             if not bets:
                 logger.warning(f"投注消息解析失败: {content}")
-                bet_message_stats["failed_bets"] += 1
-                bet_message_stats["bet_errors"]["parse_failed"] = bet_message_stats["bet_errors"].get("parse_failed", 0) + 1
+                _count_bet_stat("failed_bets", "parse_failed")
                 return
             
             # 获取群组配置
             group_config = self.multi_config.get_group_config(chat_id)
             if not group_config:
                 logger.warning(f"群组 {chat_id} 未配置游戏")
-                bet_message_stats["failed_bets"] += 1
-                bet_message_stats["bet_errors"]["group_not_configured"] = bet_message_stats["bet_errors"].get("group_not_configured", 0) + 1
+                _count_bet_stat("failed_bets", "group_not_configured")
                 return
             
             if not group_config.enabled:
                 logger.warning(f"群组 {chat_id} 游戏已禁用")
-                bet_message_stats["failed_bets"] += 1
-                bet_message_stats["bet_errors"]["game_disabled"] = bet_message_stats["bet_errors"].get("game_disabled", 0) + 1
+                _count_bet_stat("failed_bets", "game_disabled")
                 return
             
-            # 执行投注
+            # 执行投注（整条消息一次提交）
             success_count = 0
             failed_bets = []  # 记录失败的投注和原因
             
-            for bet in bets:
-                result = await self._place_bet(user_id, chat_id, group_config, bet)
+            results = await self._place_bets(user_id, chat_id, group_config, bets)
+            for bet, result in zip(bets, results):
                 if result["success"]:
                     success_count += 1
-                    bet_message_stats["successful_bets"] += 1
+                    _count_bet_stat("successful_bets")
                     logger.info(f"投注成功: 用户={user_id}, 群组={chat_id}, 投注={bet}")
                 else:
-                    bet_message_stats["failed_bets"] += 1
-                    error_type = result.get("error_type", "unknown")
-                    bet_message_stats["bet_errors"][error_type] = bet_message_stats["bet_errors"].get(error_type, 0) + 1
+                    _count_bet_stat("failed_bets", result.get("error_type", "unknown"))
                     logger.error(f"投注失败: 用户={user_id}, 群组={chat_id}, 投注={bet}, 错误={result['message']}")
                     
                     # 记录失败的投注和原因
@@ -265,48 +228,70 @@ class BetMessageMonitor:
             
         except Exception as e:
             logger.error(f"处理投注消息失败: {e}")
-            bet_message_stats["failed_bets"] += 1
-            bet_message_stats["bet_errors"]["system_error"] = bet_message_stats["bet_errors"].get("system_error", 0) + 1
+            _count_bet_stat("failed_bets", "system_error")
     
-    async def _place_bet(self, user_id: int, group_id: int, group_config, bet: Dict[str, Any]) -> Dict[str, Any]:
-        """执行投注"""
-        try:
-            async with SessionFactory() as session:
-                uow = UoW(session)
-                lottery_service = LotteryService(uow)
-                
-                if bet["type"] == "bet_type":
-                    # 投注类型投注
-                    result = await lottery_service.place_bet(
-                        group_id=group_id,
-                        telegram_id=user_id,
-                        bet_type=bet["bet_type"],
-                        bet_amount=bet["amount"]
-                    )
-                elif bet["type"] == "number":
-                    # 数字投注
-                    result = await lottery_service.place_bet(
+    async def _place_bets(self, user_id: int, group_id: int, group_config, bets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        执行一条消息中的全部投注
+        
+        所有有效投注通过 LotteryService.place_bets 在同一会话、同一事务内完成，
+        返回结果与 bets 一一对应。
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(bets)
+        service_bets = []
+        positions = []
+        
+        for index, bet in enumerate(bets):
+            if bet["type"] == "bet_type":
+                # 投注类型投注
+                bet_type = bet["bet_type"]
+            elif bet["type"] == "number":
+                # 数字投注
+                bet_type = bet["number"]
+            else:
+                results[index] = {
+                    "success": False,
+                    "message": "无效的投注类型",
+                    "error_type": "invalid_bet_type"
+                }
+                continue
+            service_bets.append({"bet_type": bet_type, "bet_amount": bet["amount"]})
+            positions.append(index)
+        
+        if service_bets:
+            try:
+                async with SessionFactory() as session:
+                    uow = UoW(session)
+                    lottery_service = LotteryService(uow)
+                    
+                    batch_result = await lottery_service.place_bets(
                         group_id=group_id,
                         telegram_id=user_id,
-                        bet_type=bet["number"],
-                        bet_amount=bet["amount"]
+                        bets=service_bets
                     )
-                else:
-                    return {
+                    
+                bet_results = batch_result.get("results")
+                if bet_results is None:
+                    # 整批失败（如当前没有进行中的开奖期）
+                    bet_results = [
+                        {"success": False, "message": batch_result["message"]}
+                        for _ in service_bets
+                    ]
+            except Exception as e:
+                logger.error(f"执行投注失败: {e}")
+                bet_results = [
+                    {
                         "success": False,
-                        "message": "无效的投注类型",
-                        "error_type": "invalid_bet_type"
+                        "message": f"系统错误: {e}",
+                        "error_type": "system_error"
                     }
-                
-                return result
-                
-        except Exception as e:
-            logger.error(f"执行投注失败: {e}")
-            return {
-                "success": False,
-                "message": f"系统错误: {e}",
-                "error_type": "system_error"
-            }
+                    for _ in service_bets
+                ]
+            
+            for index, result in zip(positions, bet_results):
+                results[index] = result
+        
+        return results
     
     async def _send_bet_feedback(self, message: Message, bets: List[Dict], success_count: int, failed_bets: List[Dict] = None):
         """发送投注反馈"""
@@ -398,22 +383,15 @@ async def monitor_bet_messages(message: Message) -> None:
         if content.casefold() in ["签到", "查询积分"]:
             return
         
-        # 检查是否包含投注相关关键词
-        bet_keywords = ['大', '小', '单', '双', '豹子', '数字', '押', '下', '注', '买']
-        has_bet_keyword = any(keyword in content for keyword in bet_keywords)
-        
-        # 检查是否包含数字
-        has_number = bool(re.search(r'\d+', content))
-        
-        # 如果包含投注关键词和数字，则处理为投注消息
-        if has_bet_keyword and has_number:
+        # 包含投注关键词和数字，则处理为投注消息
+        if BetMessageParser.is_candidate(content):
             await bet_monitor.process_bet_message(message, content)
         
     except Exception as e:
         logger.error(f"监控投注消息时出错: {e}")
 
 def get_bet_message_stats() -> Dict[str, Any]:
-    """获取投注消息统计信息"""
+    """获取投注消息统计信息（本进程）"""
     stats = bet_message_stats.copy()
     
     # 计算成功率
@@ -427,9 +405,30 @@ def get_bet_message_stats() -> Dict[str, Any]:
     
     return stats
 
-def format_bet_message_stats() -> str:
-    """格式化投注消息统计信息"""
+async def load_bet_message_stats() -> Dict[str, Any]:
+    """读取所有进程汇总的投注统计，Redis 不可用时退回本进程统计"""
+    try:
+        counters = await stats_sink.hgetall(BET_STATS_KEY)
+    except Exception as e:
+        logger.error(f"读取汇总投注统计失败，使用本进程统计: {e}")
+        return get_bet_message_stats()
+    
     stats = get_bet_message_stats()
+    stats["total_bet_messages"] = counters.get("total_bet_messages", 0)
+    stats["successful_bets"] = counters.get("successful_bets", 0)
+    stats["failed_bets"] = counters.get("failed_bets", 0)
+    stats["bet_errors"] = {
+        field[6:]: count for field, count in counters.items() if field.startswith("error:")
+    }
+    if stats["total_bet_messages"] > 0:
+        stats["success_rate"] = stats["successful_bets"] / stats["total_bet_messages"]
+    else:
+        stats["success_rate"] = 0
+    return stats
+
+async def format_bet_message_stats() -> str:
+    """格式化投注消息统计信息"""
+    stats = await load_bet_message_stats()
     
     # 格式化运行时间
     uptime_seconds = stats["uptime_seconds"]
@@ -465,7 +464,7 @@ async def show_bet_stats_command(message: Message) -> None:
             await message.reply("❌ 此命令仅限管理员使用")
             return
         
-        stats_message = format_bet_message_stats()
+        stats_message = await format_bet_message_stats()
         await message.reply(stats_message, parse_mode="Markdown")
         
     except Exception as e:
@@ -5,6 +5,7 @@ from aiogram.enums import ChatMemberStatus
 from aiogram.filters.chat_member_updated import ChatMemberUpdatedFilter, JOIN_TRANSITION, LEAVE_TRANSITION
 
 from bot.config import get_config
+from bot.utils.broadcast import broadcaster
 
 # 配置日志记录器
 logger = logging.getLogger(__name__)
@@ -23,7 +24,7 @@ async def handle_bot_join(event: ChatMemberUpdated) -> None:
         f"群组：{chat.title}\n"
         f"群组ID：{chat.id}"
     )
-    await notify_admins(event.bot, notification)
+    await notify_admins(notification)
 
 @bot_router.my_chat_member(ChatMemberUpdatedFilter(member_status_changed=LEAVE_TRANSITION))
 async def handle_bot_leave(event: ChatMemberUpdated) -> None:
@@ -35,7 +36,7 @@ async def handle_bot_leave(event: ChatMemberUpdated) -> None:
         f"群组：{chat.title}\n"
         f"群组ID：{chat.id}"
     )
-    await notify_admins(event.bot, notification)
+    await notify_admins(notification)
 
 @bot_router.my_chat_member(
     F.chat_member.new_chat_member.status == ChatMemberStatus.ADMINISTRATOR,
@@ -50,7 +51,7 @@ async def handle_bot_admin(event: ChatMemberUpdated) -> None:
         f"群组：{chat.title}\n"
         f"群组ID：{chat.id}"
     )
-    await notify_admins(event.bot, notification)
+    await notify_admins(notification)
 
 @bot_router.my_chat_member(
     F.chat_member.old_chat_member.status == ChatMemberStatus.ADMINISTRATOR,
@@ -65,7 +66,7 @@ async def handle_bot_admin_revoke(event: ChatMemberUpdated) -> None:
         f"群组：{chat.title}\n"
         f"群组ID：{chat.id}"
     )
-    await notify_admins(event.bot, notification)
+    await notify_admins(notification)
 
 @bot_router.my_chat_member(
     F.chat.type.in_({"group", "supergroup"}),
@@ -88,7 +89,7 @@ async def handle_bot_promote(event: ChatMemberUpdated) -> None:
             f"操作者：{user.full_name}\n"
             f"操作者ID：{user.id}"
         )
-        await notify_admins(event.bot, notification)
+        await notify_admins(notification)
     except Exception as e:
         logger.error(f"处理机器人提升事件时出错: {e}")
 
@@ -113,14 +114,11 @@ async def handle_bot_demote(event: ChatMemberUpdated) -> None:
             f"操作者：{user.full_name}\n"
             f"操作者ID：{user.id}"
         )
-        await notify_admins(event.bot, notification)
+        await notify_admins(notification)
     except Exception as e:
         logger.error(f"处理机器人降级事件时出错: {e}")
 
-async def notify_admins(bot, notification: str) -> None:
-    """通知所有管理员"""
+async def notify_admins(notification: str) -> None:
+    """通知所有管理员（放入广播队列，不阻塞事件处理）"""
     for admin_id in config.ADMIN_IDS:
-        try:
-            await bot.send_message(admin_id, notification)
-        except Exception as e:
-            logger.error(f"发送通知给管理员 {admin_id} 失败: {e}") 
\ No newline at end of file
+        broadcaster.submit(admin_id, notification) 
\ No newline at end of file
@@ -7,6 +7,7 @@ from telethon import TelegramClient, events
 from bot.common.fishing_service import FishingService
 from bot.common.uow import UoW
 from bot.database.db import SessionFactory
+from bot.utils.broadcast import broadcaster
 import logging
 
 logger = logging.getLogger(__name__)
@@ -164,18 +165,15 @@ async def _send_legendary_notification_aiogram(notification: str, fish_points: i
         # 这里需要配置群组ID，可以从配置文件或环境变量获取
         group_ids = _get_notification_group_ids()
         
-        from bot.misc import bot
-        sent_to_groups = []
+        # 通过广播器并发发送通知
+        results = await broadcaster.broadcast(group_ids, notification)
+        sent_to_groups = [group_id for group_id, sent_message in results.items() if sent_message]
         
-        for group_id in group_ids:
-            try:
-                # 发送通知
-                await bot.send_message(group_id, notification)
-                sent_to_groups.append(group_id)
-                
-                # 如果有积分和玩家名，发放红包
-                if fish_points > 0 and player_name:
-                    from bot.handlers.red_packet_handler import create_red_packet_from_fishing
+        # 如果有积分和玩家名，在通知成功的群组发放红包
+        if fish_points > 0 and player_name:
+            from bot.handlers.red_packet_handler import create_red_packet_from_fishing
+            for group_id in sent_to_groups:
+                try:
                     success, red_packet_id = await create_red_packet_from_fishing(
                         chat_id=group_id,
                         player_name=player_name,
@@ -185,9 +183,8 @@ async def _send_legendary_notification_aiogram(notification: str, fish_points: i
                         logger.error(f"在群组 {group_id} 创建钓鱼红包失败")
                     else:
                         logger.info(f"在群组 {group_id} 成功创建钓鱼红包: {red_packet_id}")
-                
-            except Exception as e:
-                logger.error(f"发送传说鱼通知到群组 {group_id} 失败: {e}")
+                except Exception as e:
+                    logger.error(f"在群组 {group_id} 创建钓鱼红包失败: {e}")
         
         return sent_to_groups
                 
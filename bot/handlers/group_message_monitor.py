@@ -12,21 +12,19 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.enums import ChatType
 from aiogram.filters import Command
 
+from bot.utils.stats_store import MessageStatsStore
+from bot.utils.stats_sink import SharedMessageStats
+from bot.utils.logging import get_dropped_records
+
 logger = logging.getLogger(__name__)
 
 # 创建群组消息监控路由器
 group_message_monitor_router = Router(name="group_message_monitor")
 
-# 消息统计数据
-message_stats = {
-    "total_messages": 0,
-    "group_messages": {},  # 按群组统计消息
-    "user_messages": {},   # 按用户统计消息
-    "message_types": {},   # 按消息类型统计
-    "hourly_stats": {},    # 按小时统计
-    "daily_stats": {},     # 按天统计
-    "start_time": datetime.now()
-}
+# 消息统计数据（固定内存，本进程）
+message_stats = MessageStatsStore()
+# 所有进程汇总到 Redis 的消息统计
+shared_message_stats = SharedMessageStats("msg")
 
 class GroupMessageMonitor:
     """群组消息监控器"""
@@ -38,61 +36,9 @@ class GroupMessageMonitor:
         """记录消息"""
         user_id = message.from_user.id
         chat_id = message.chat.id
-        current_time = datetime.now()
-        
-        # 更新总消息数
-        message_stats["total_messages"] += 1
-        
-        # 按群组统计
-        if chat_id not in message_stats["group_messages"]:
-            message_stats["group_messages"][chat_id] = {
-                "total": 0,
-                "users": set(),
-                "types": {},
-                "last_message": None
-            }
-        message_stats["group_messages"][chat_id]["total"] += 1
-        message_stats["group_messages"][chat_id]["users"].add(user_id)
-        message_stats["group_messages"][chat_id]["last_message"] = current_time
-        
-        # 按消息类型统计
-        if message_type not in message_stats["group_messages"][chat_id]["types"]:
-            message_stats["group_messages"][chat_id]["types"][message_type] = 0
-        message_stats["group_messages"][chat_id]["types"][message_type] += 1
-        
-        # 按用户统计
-        if user_id not in message_stats["user_messages"]:
-            message_stats["user_messages"][user_id] = {
-                "total": 0,
-                "groups": set(),
-                "types": {},
-                "last_message": None
-            }
-        message_stats["user_messages"][user_id]["total"] += 1
-        message_stats["user_messages"][user_id]["groups"].add(chat_id)
-        message_stats["user_messages"][user_id]["last_message"] = current_time
-        
-        # 按消息类型统计
-        if message_type not in message_stats["user_messages"][user_id]["types"]:
-            message_stats["user_messages"][user_id]["types"][message_type] = 0
-        message_stats["user_messages"][user_id]["types"][message_type] += 1
         
-        # 全局消息类型统计
-        if message_type not in message_stats["message_types"]:
-            message_stats["message_types"][message_type] = 0
-        message_stats["message_types"][message_type] += 1
-        
-        # 按小时统计
-        hour_key = current_time.strftime("%Y-%m-%d %H:00")
-        if hour_key not in message_stats["hourly_stats"]:
-            message_stats["hourly_stats"][hour_key] = 0
-        message_stats["hourly_stats"][hour_key] += 1
-        
-        # 按天统计
-        day_key = current_time.strftime("%Y-%m-%d")
-        if day_key not in message_stats["daily_stats"]:
-            message_stats["daily_stats"][day_key] = 0
-        message_stats["daily_stats"][day_key] += 1
+        message_stats.record(chat_id, user_id, message_type=message_type)
+        shared_message_stats.record(chat_id, user_id, message_type=message_type)
         
         # 记录日志
         logger.info(
@@ -159,75 +105,69 @@ async def monitor_group_messages(message: Message) -> None:
 
 def get_message_stats() -> Dict[str, Any]:
     """获取消息统计信息"""
-    stats = message_stats.copy()
-    
-    # 转换set为list以便JSON序列化
-    for chat_id, chat_data in stats["group_messages"].items():
-        chat_data["users"] = list(chat_data["users"])
-        if chat_data["last_message"]:
-            chat_data["last_message"] = chat_data["last_message"].isoformat()
-    
-    for user_id, user_data in stats["user_messages"].items():
-        user_data["groups"] = list(user_data["groups"])
-        if user_data["last_message"]:
-            user_data["last_message"] = user_data["last_message"].isoformat()
-    
-    # 计算运行时间
-    stats["uptime_seconds"] = (datetime.now() - stats["start_time"]).total_seconds()
+    return message_stats.snapshot()
+
+async def load_message_summary(chat_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    读取消息统计摘要，优先读取所有进程的汇总，Redis 不可用时退回本进程统计
     
-    return stats
+    Args:
+        chat_id: 指定群组时返回该群组的摘要
+    """
+    try:
+        if chat_id is None:
+            return await shared_message_stats.summary()
+        return await shared_message_stats.group_summary(chat_id)
+    except Exception as e:
+        logger.error(f"读取汇总消息统计失败，使用本进程统计: {e}")
+        if chat_id is None:
+            return message_stats.summary()
+        return message_stats.group_summary(chat_id)
 
-def format_message_stats() -> str:
+async def format_message_stats() -> str:
     """格式化消息统计信息"""
-    stats = get_message_stats()
+    stats = await load_message_summary()
     
     # 格式化运行时间
-    uptime_seconds = stats["uptime_seconds"]
+    uptime_seconds = (datetime.now() - stats["start_time"]).total_seconds()
     hours = int(uptime_seconds // 3600)
     minutes = int((uptime_seconds % 3600) // 60)
     seconds = int(uptime_seconds % 60)
     uptime_str = f"{hours}小时{minutes}分钟{seconds}秒"
     
-    # 获取最活跃的群组
-    top_groups = sorted(
-        stats["group_messages"].items(), 
-        key=lambda x: x[1]["total"], 
-        reverse=True
-    )[:5]
-    
-    # 获取最活跃的用户
-    top_users = sorted(
-        stats["user_messages"].items(), 
-        key=lambda x: x[1]["total"], 
-        reverse=True
-    )[:5]
-    
     # 获取最常用的消息类型
     top_types = sorted(
-        stats["message_types"].items(), 
+        stats["types"].items(), 
         key=lambda x: x[1], 
         reverse=True
     )[:5]
     
+    total_messages = stats["total"]
     message = f"📊 **群组消息监控统计**\n\n"
     message += f"⏱️ **运行时间:** {uptime_str}\n"
-    message += f"📈 **总消息数:** {stats['total_messages']}\n"
-    message += f"👥 **活跃群组数:** {len(stats['group_messages'])}\n"
-    message += f"👤 **活跃用户数:** {len(stats['user_messages'])}\n\n"
+    message += f"📈 **总消息数:** {total_messages}\n"
+    message += f"👥 **活跃群组数:** {stats['active_groups']}\n"
+    message += f"👤 **活跃用户数:** 约{stats['distinct_users']}\n\n"
     
     message += f"🔥 **最活跃群组:**\n"
-    for chat_id, data in top_groups:
-        message += f"• 群组{chat_id}: {data['total']}条消息 ({len(data['users'])}个用户)\n"
+    for chat_id, total, users in stats["top_groups"]:
+        message += f"• 群组{chat_id}: {total}条消息 (约{users}个用户)\n"
     
     message += f"\n👤 **最活跃用户:**\n"
-    for user_id, data in top_users:
-        message += f"• 用户{user_id}: {data['total']}条消息 ({len(data['groups'])}个群组)\n"
+    user_groups = stats.get("top_user_groups", {})
+    for user_id, count in stats["top_users"]:
+        message += f"• 用户{user_id}: {count}条消息 ({user_groups.get(user_id, 0)}个群组)\n"
     
     message += f"\n📝 **消息类型分布:**\n"
     for msg_type, count in top_types:
-        percentage = (count / stats['total_messages']) * 100 if stats['total_messages'] > 0 else 0
+        percentage = (count / total_messages) * 100 if total_messages > 0 else 0
         message += f"• {msg_type}: {count}条 ({percentage:.1f}%)\n"
     
+    # 异步日志模式下被丢弃的日志（本进程）
+    dropped = get_dropped_records()
+    if any(dropped.values()):
+        message += f"\n🪵 **丢弃日志:** 队列已满 {dropped['queue_full']} 条, 限流 {dropped['rate_limited']} 条\n"
+    
     return message
 
 # 添加统计命令
@@ -243,7 +183,7 @@ async def show_message_stats_command(message: Message) -> None:
             await message.reply("❌ 此命令仅限管理员使用")
             return
         
-        stats_message = format_message_stats()
+        stats_message = await format_message_stats()
         await message.reply(stats_message, parse_mode="Markdown")
         
     except Exception as e:
@@ -263,16 +203,8 @@ async def reset_message_stats_command(message: Message) -> None:
             return
         
         # 重置统计
-        global message_stats
-        message_stats = {
-            "total_messages": 0,
-            "group_messages": {},
-            "user_messages": {},
-            "message_types": {},
-            "hourly_stats": {},
-            "daily_stats": {},
-            "start_time": datetime.now()
-        }
+        message_stats.reset()
+        await shared_message_stats.reset()
         
         await message.reply("✅ 消息统计信息已重置")
         
@@ -285,26 +217,19 @@ async def show_group_activity_command(message: Message) -> None:
     """显示当前群组活动统计"""
     try:
         chat_id = message.chat.id
-        stats = get_message_stats()
+        group_data = await load_message_summary(chat_id)
         
-        if chat_id not in stats["group_messages"]:
+        if group_data is None:
             await message.reply("❌ 该群组暂无消息记录")
             return
         
-        group_data = stats["group_messages"][chat_id]
-        
         # 获取该群组最活跃的用户
-        group_users = []
-        for user_id, user_data in stats["user_messages"].items():
-            if chat_id in user_data["groups"]:
-                group_users.append((user_id, user_data["total"]))
-        
-        top_group_users = sorted(group_users, key=lambda x: x[1], reverse=True)[:5]
+        top_group_users = group_data["top_users"]
         
         message_text = f"📊 **群组活动统计**\n\n"
         message_text += f"📝 **群组:** {message.chat.title}\n"
         message_text += f"📈 **总消息数:** {group_data['total']}\n"
-        message_text += f"👥 **活跃用户数:** {len(group_data['users'])}\n\n"
+        message_text += f"👥 **活跃用户数:** 约{group_data['distinct_users']}\n\n"
         
         message_text += f"📝 **消息类型分布:**\n"
         for msg_type, count in group_data["types"].items():
@@ -19,6 +19,7 @@ from aiogram.enums import ChatMemberStatus
 from aiogram.filters.chat_member_updated import ChatMemberUpdatedFilter, JOIN_TRANSITION, LEAVE_TRANSITION
 from telethon import TelegramClient, events
 from bot.utils.group_info import GroupInfoHelper
+from bot.utils.broadcast import broadcaster
 
 from bot.config import get_config
 
@@ -261,7 +262,7 @@ async def handle_member_join(event: ChatMemberUpdated) -> None:
             f"群组：{chat.title}\n"
             f"群组ID：{chat.id}"
         )
-        await notify_admins(event.bot, notification)
+        await notify_admins(notification)
     except Exception as e:
         logger.error(f"处理成员加入事件时出错: {e}")
 
@@ -291,7 +292,7 @@ async def handle_member_leave(event: ChatMemberUpdated) -> None:
             f"群组：{chat.title}\n"
             f"群组ID：{chat.id}"
         )
-        await notify_admins(event.bot, notification)
+        await notify_admins(notification)
     except Exception as e:
         logger.error(f"处理成员离开事件时出错: {e}")
 
@@ -321,7 +322,7 @@ async def handle_member_promote(event: ChatMemberUpdated) -> None:
             f"群组：{chat.title}\n"
             f"群组ID：{chat.id}"
         )
-        await notify_admins(event.bot, notification)
+        await notify_admins(notification)
     except Exception as e:
         logger.error(f"处理成员提升事件时出错: {e}")
 
@@ -351,14 +352,11 @@ async def handle_member_demote(event: ChatMemberUpdated) -> None:
             f"群组：{chat.title}\n"
             f"群组ID：{chat.id}"
         )
-        await notify_admins(event.bot, notification)
+        await notify_admins(notification)
     except Exception as e:
         logger.error(f"处理成员降级事件时出错: {e}")
 
-async def notify_admins(bot, notification: str) -> None:
-    """通知所有管理员"""
+async def notify_admins(notification: str) -> None:
+    """通知所有管理员（放入广播队列，不阻塞事件处理）"""
     for admin_id in config.ADMIN_IDS:
-        try:
-            await bot.send_message(admin_id, notification)
-        except Exception as e:
-            logger.error(f"发送通知给管理员 {admin_id} 失败: {e}") 
\ No newline at end of file
+        broadcaster.submit(admin_id, notification) 
\ No newline at end of file
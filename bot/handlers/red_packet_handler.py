@@ -8,21 +8,16 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from bot.common.red_packet_service import RedPacketService
 from bot.common.uow import UoW
 from bot.database.db import SessionFactory
+from bot.utils.edit_coalescer import edit_coalescer
 import logging
 
 logger = logging.getLogger(__name__)
 
-# 全局变量用于存储服务实例
-_red_packet_service = None
-
 async def get_red_packet_service():
-    """获取红包服务实例（异步，手动 new UoW）"""
-    global _red_packet_service
-    if _red_packet_service is None:
-        async with SessionFactory() as session:
-            uow = UoW(session)
-            _red_packet_service = RedPacketService(uow)
-    return _red_packet_service
+    """获取红包服务实例（只读写 Redis 的操作使用；涉及数据库的操作在各自的会话中创建服务）"""
+    async with SessionFactory() as session:
+        uow = UoW(session)
+        return RedPacketService(uow)
 
 # 创建路由器
 red_packet_router = Router()
@@ -46,30 +41,16 @@ async def create_red_packet_from_fishing(chat_id: int, player_name: str, fish_po
     try:
         red_packet_service = await get_red_packet_service()
         
-        # 生成红包ID
-        import time
-        red_packet_id = f"rp_system_{int(time.time())}"
-        
         # 计算红包个数：每10000积分1个红包，最少3个，最多20个
         total_num = max(3, min(20, fish_points // 10000))
         
         # 直接创建系统红包，不需要扣除账户积分
-        red_packet_service._red_packets[red_packet_id] = {
-            "amount": fish_points,
-            "total_num": total_num,
-            "remaining_num": total_num,
-            "remaining_amount": fish_points,
-            "participants": [],
-            "created_at": time.time(),
-            "message_id": 0,
-            "chat_id": chat_id,
-            "sender_id": 0,  # 0表示系统
-            "sender_name": f"🤖 系统代 {player_name}"
-        }
-        
-        # 设置红包过期任务
-        import asyncio
-        asyncio.create_task(red_packet_service._expire_red_packet(red_packet_id))
+        red_packet_id = await red_packet_service.create_system_red_packet(
+            chat_id=chat_id,
+            amount=fish_points,
+            total_num=total_num,
+            sender_name=f"🤖 系统代 {player_name}"
+        )
         
         # 构建红包消息
         message = _build_red_packet_message(
@@ -92,7 +73,7 @@ async def create_red_packet_from_fishing(chat_id: int, player_name: str, fish_po
         )
         
         # 更新红包消息ID
-        red_packet_service._red_packets[red_packet_id]["message_id"] = sent_message.message_id
+        await red_packet_service.set_message_id(red_packet_id, sent_message.message_id)
         
         return True, red_packet_id
         
@@ -100,6 +81,33 @@ async def create_red_packet_from_fishing(chat_id: int, player_name: str, fish_po
         logger.error(f"创建钓鱼红包失败: {e}")
         return False, None
 
+async def _render_red_packet_message(red_packet_service: RedPacketService, red_packet_id: str):
+    """按红包当前状态生成消息编辑参数（由消息编辑合并器在编辑时调用）"""
+    info_result = await red_packet_service.get_red_packet_info(red_packet_id)
+    if not info_result["success"] or info_result["info"]["expired"]:
+        return None
+    info = info_result["info"]
+    
+    if info["remaining_num"] == 0:
+        return {
+            "text": _build_red_packet_result_message(
+                sender_name=info["sender_name"],
+                amount=info["amount"],
+                total_num=info["total_num"],
+                participants=info["participants"],
+                best_grabber=info["best_grabber"]
+            )
+        }
+    return {
+        "text": _build_red_packet_progress_message(
+            sender_name=info["sender_name"],
+            amount=info["amount"],
+            total_num=info["total_num"],
+            participants=info["participants"]
+        ),
+        "reply_markup": _build_red_packet_keyboard(red_packet_id)
+    }
+
 @red_packet_router.callback_query(lambda c: c.data.startswith(RED_PACKET_GRAB_PREFIX))
 async def grab_red_packet_callback(callback_query: types.CallbackQuery):
     """
@@ -113,13 +121,14 @@ async def grab_red_packet_callback(callback_query: types.CallbackQuery):
         
         logger.info(f"用户 {user_name} (ID: {telegram_id}) 尝试抢红包: {red_packet_id}")
         
-        # 抢红包
-        red_packet_service = await get_red_packet_service()
-        result = await red_packet_service.grab_red_packet(
-            telegram_id=telegram_id,
-            red_packet_id=red_packet_id,
-            user_name=user_name
-        )
+        # 抢红包（每次回调使用独立的数据库会话，并发抢红包不会共用同一个会话）
+        async with SessionFactory() as session:
+            red_packet_service = RedPacketService(UoW(session))
+            result = await red_packet_service.grab_red_packet(
+                telegram_id=telegram_id,
+                red_packet_id=red_packet_id,
+                user_name=user_name
+            )
         
         if not result["success"]:
             logger.warning(f"用户 {user_name} (ID: {telegram_id}) 抢红包失败: {result['message']}")
@@ -136,29 +145,15 @@ async def grab_red_packet_callback(callback_query: types.CallbackQuery):
         except Exception as e:
             logger.warning(f"无法显示抢红包成功提示: {e}")
         
-        # 如果是最后一个红包，更新红包消息
-        if result["is_last"]:
-            # 获取红包信息
-            info_result = red_packet_service.get_red_packet_info(red_packet_id)
-            if info_result["success"]:
-                info = info_result["info"]
-                
-                # 构建红包结果消息
-                message = _build_red_packet_result_message(
-                    sender_name=info["sender_name"],
-                    amount=info["amount"],
-                    total_num=info["total_num"],
-                    participants=info["participants"],
-                    best_grabber=info["best_grabber"]
-                )
-                
-                # 更新红包消息
-                try:
-                    await callback_query.message.edit_text(
-                        text=message
-                    )
-                except Exception as e:
-                    logger.warning(f"无法更新红包消息: {e}")
+        # 更新红包消息：抢红包过程中显示进度，最后一个红包显示结果
+        # 同一条消息的更新经合并器合并，短时间内多人抢红包只编辑一次
+        if callback_query.message:
+            edit_coalescer.submit(
+                chat_id=callback_query.message.chat.id,
+                message_id=callback_query.message.message_id,
+                render=lambda: _render_red_packet_message(red_packet_service, red_packet_id),
+                final=result["is_last"]
+            )
         
     except Exception as e:
         logger.error(f"处理抢红包回调失败: {e}")
@@ -178,7 +173,7 @@ async def red_packet_info_callback(callback_query: types.CallbackQuery):
         
         # 获取红包信息
         red_packet_service = await get_red_packet_service()
-        result = red_packet_service.get_red_packet_info(red_packet_id)
+        result = await red_packet_service.get_red_packet_info(red_packet_id)
         
         if not result["success"]:
             try:
@@ -240,6 +235,20 @@ def _build_red_packet_keyboard(red_packet_id: str) -> InlineKeyboardMarkup:
         ]
     )
 
+def _build_red_packet_progress_message(sender_name: str, amount: int, total_num: int, participants: list) -> str:
+    """构建抢红包进行中的消息"""
+    message = f"🧧 **{sender_name} 发了一个红包**\n\n"
+    message += f"💰 总金额: **{amount:,}** 积分\n"
+    message += f"👥 已抢: **{len(participants)}/{total_num}** 个\n\n"
+    
+    message += "**抢红包记录**\n"
+    for i, p in enumerate(participants):
+        message += f"{i+1}. {p['name']}: {p['amount']:,} 积分\n"
+    
+    message += f"\n**点击下方按钮抢红包**"
+    
+    return message
+
 def _build_red_packet_result_message(sender_name: str, amount: int, total_num: int, participants: list, best_grabber: dict = None) -> str:
     """构建红包结果消息"""
     message = f"🧧 **红包已抢完**\n\n"
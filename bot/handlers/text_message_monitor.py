@@ -12,103 +12,74 @@ from aiogram.types import Message
 from aiogram.enums import ChatType
 from aiogram.filters import Command
 
+from bot.utils.keyword_matcher import KeywordMatcher
+from bot.utils.stats_store import MessageStatsStore
+from bot.utils.stats_sink import SharedMessageStats
+
 logger = logging.getLogger(__name__)
 
 # 创建文字消息监控路由器
 text_message_monitor_router = Router(name="text_message_monitor")
 
-# 文字消息统计数据
-text_message_stats = {
-    "total_text_messages": 0,
-    "group_text_messages": {},  # 按群组统计文字消息
-    "user_text_messages": {},   # 按用户统计文字消息
-    "keyword_stats": {},        # 关键词统计
-    "message_length_stats": {}, # 消息长度统计
-    "start_time": datetime.now()
-}
+# 文字消息统计数据（固定内存，本进程）
+text_message_stats = MessageStatsStore()
+# 所有进程汇总到 Redis 的文字消息统计
+shared_text_message_stats = SharedMessageStats("text")
 
 class TextMessageMonitor:
     """文字消息监控器"""
     
     def __init__(self):
         self.start_time = datetime.now()
+        # 关键词和敏感词各用一个多模式匹配器，扫描一遍消息即可找出全部命中
         # 定义关键词列表（可以根据需要修改）
-        self.keywords = [
+        self.keyword_matcher = KeywordMatcher([
             "你好", "大家好", "谢谢", "再见", "欢迎",
             "问题", "帮助", "支持", "信息", "通知",
             "重要", "紧急", "注意", "提醒", "更新"
-        ]
+        ])
         
         # 定义敏感词列表（可以根据需要修改）
-        self.sensitive_words = [
+        self.sensitive_matcher = KeywordMatcher([
             "垃圾", "广告", "诈骗", "色情", "暴力",
             "政治", "敏感", "违法", "违规", "不当"
-        ]
+        ])
+    
+    @property
+    def keywords(self) -> List[str]:
+        """关键词列表"""
+        return self.keyword_matcher.words
+    
+    @property
+    def sensitive_words(self) -> List[str]:
+        """敏感词列表"""
+        return self.sensitive_matcher.words
     
     def log_text_message(self, message: Message, content: str):
         """记录文字消息"""
         user_id = message.from_user.id
         chat_id = message.chat.id
-        current_time = datetime.now()
-        
-        # 更新总文字消息数
-        text_message_stats["total_text_messages"] += 1
-        
-        # 按群组统计
-        if chat_id not in text_message_stats["group_text_messages"]:
-            text_message_stats["group_text_messages"][chat_id] = {
-                "total": 0,
-                "users": set(),
-                "keywords": {},
-                "sensitive_count": 0,
-                "last_message": None
-            }
-        text_message_stats["group_text_messages"][chat_id]["total"] += 1
-        text_message_stats["group_text_messages"][chat_id]["users"].add(user_id)
-        text_message_stats["group_text_messages"][chat_id]["last_message"] = current_time
-        
-        # 按用户统计
-        if user_id not in text_message_stats["user_text_messages"]:
-            text_message_stats["user_text_messages"][user_id] = {
-                "total": 0,
-                "groups": set(),
-                "keywords": {},
-                "sensitive_count": 0,
-                "last_message": None
-            }
-        text_message_stats["user_text_messages"][user_id]["total"] += 1
-        text_message_stats["user_text_messages"][user_id]["groups"].add(chat_id)
-        text_message_stats["user_text_messages"][user_id]["last_message"] = current_time
-        
-        # 消息长度统计
         message_length = len(content)
-        if message_length not in text_message_stats["message_length_stats"]:
-            text_message_stats["message_length_stats"][message_length] = 0
-        text_message_stats["message_length_stats"][message_length] += 1
         
         # 关键词检测
         found_keywords = self.detect_keywords(content)
-        for keyword in found_keywords:
-            # 全局关键词统计
-            if keyword not in text_message_stats["keyword_stats"]:
-                text_message_stats["keyword_stats"][keyword] = 0
-            text_message_stats["keyword_stats"][keyword] += 1
-            
-            # 群组关键词统计
-            if keyword not in text_message_stats["group_text_messages"][chat_id]["keywords"]:
-                text_message_stats["group_text_messages"][chat_id]["keywords"][keyword] = 0
-            text_message_stats["group_text_messages"][chat_id]["keywords"][keyword] += 1
-            
-            # 用户关键词统计
-            if keyword not in text_message_stats["user_text_messages"][user_id]["keywords"]:
-                text_message_stats["user_text_messages"][user_id]["keywords"][keyword] = 0
-            text_message_stats["user_text_messages"][user_id]["keywords"][keyword] += 1
         
         # 敏感词检测
         sensitive_words_found = self.detect_sensitive_words(content)
-        if sensitive_words_found:
-            text_message_stats["group_text_messages"][chat_id]["sensitive_count"] += 1
-            text_message_stats["user_text_messages"][user_id]["sensitive_count"] += 1
+        
+        text_message_stats.record(
+            chat_id,
+            user_id,
+            length=message_length,
+            keywords=found_keywords,
+            sensitive=bool(sensitive_words_found)
+        )
+        shared_text_message_stats.record(
+            chat_id,
+            user_id,
+            keywords=found_keywords,
+            sensitive=bool(sensitive_words_found)
+        )
         
         # 记录日志
         log_message = (
@@ -134,42 +105,30 @@ class TextMessageMonitor:
     
     def detect_keywords(self, content: str) -> List[str]:
         """检测关键词"""
-        found_keywords = []
-        for keyword in self.keywords:
-            if keyword in content:
-                found_keywords.append(keyword)
-        return found_keywords
+        return self.keyword_matcher.find_words(content)
     
     def detect_sensitive_words(self, content: str) -> List[str]:
         """检测敏感词"""
-        found_sensitive = []
-        for word in self.sensitive_words:
-            if word in content:
-                found_sensitive.append(word)
-        return found_sensitive
+        return self.sensitive_matcher.find_words(content)
     
     def add_keyword(self, keyword: str):
         """添加关键词"""
-        if keyword not in self.keywords:
-            self.keywords.append(keyword)
+        if self.keyword_matcher.add(keyword):
             logger.info(f"添加关键词: {keyword}")
     
     def add_sensitive_word(self, word: str):
         """添加敏感词"""
-        if word not in self.sensitive_words:
-            self.sensitive_words.append(word)
+        if self.sensitive_matcher.add(word):
             logger.info(f"添加敏感词: {word}")
     
     def remove_keyword(self, keyword: str):
         """移除关键词"""
-        if keyword in self.keywords:
-            self.keywords.remove(keyword)
+        if self.keyword_matcher.remove(keyword):
             logger.info(f"移除关键词: {keyword}")
     
     def remove_sensitive_word(self, word: str):
         """移除敏感词"""
-        if word in self.sensitive_words:
-            self.sensitive_words.remove(word)
+        if self.sensitive_matcher.remove(word):
             logger.info(f"移除敏感词: {word}")
 
 # 全局文字消息监控器实例
@@ -243,74 +202,54 @@ async def process_text_message(message: Message, content: str, analysis_result:
 
 def get_text_message_stats() -> Dict[str, Any]:
     """获取文字消息统计信息"""
-    stats = text_message_stats.copy()
-    
-    # 转换set为list以便JSON序列化
-    for chat_id, chat_data in stats["group_text_messages"].items():
-        chat_data["users"] = list(chat_data["users"])
-        if chat_data["last_message"]:
-            chat_data["last_message"] = chat_data["last_message"].isoformat()
-    
-    for user_id, user_data in stats["user_text_messages"].items():
-        user_data["groups"] = list(user_data["groups"])
-        if user_data["last_message"]:
-            user_data["last_message"] = user_data["last_message"].isoformat()
-    
-    # 计算运行时间
-    stats["uptime_seconds"] = (datetime.now() - stats["start_time"]).total_seconds()
-    
-    return stats
+    return text_message_stats.snapshot()
 
-def format_text_message_stats() -> str:
+async def load_text_message_summary() -> Dict[str, Any]:
+    """读取文字消息统计摘要，优先读取所有进程的汇总，Redis 不可用时退回本进程统计"""
+    try:
+        return await shared_text_message_stats.summary()
+    except Exception as e:
+        logger.error(f"读取汇总文字消息统计失败，使用本进程统计: {e}")
+        return text_message_stats.summary()
+
+async def format_text_message_stats() -> str:
     """格式化文字消息统计信息"""
-    stats = get_text_message_stats()
+    stats = await load_text_message_summary()
     
     # 格式化运行时间
-    uptime_seconds = stats["uptime_seconds"]
+    uptime_seconds = (datetime.now() - stats["start_time"]).total_seconds()
     hours = int(uptime_seconds // 3600)
     minutes = int((uptime_seconds % 3600) // 60)
     seconds = int(uptime_seconds % 60)
     uptime_str = f"{hours}小时{minutes}分钟{seconds}秒"
     
-    # 获取最活跃的群组
-    top_groups = sorted(
-        stats["group_text_messages"].items(), 
-        key=lambda x: x[1]["total"], 
-        reverse=True
-    )[:5]
-    
-    # 获取最活跃的用户
-    top_users = sorted(
-        stats["user_text_messages"].items(), 
-        key=lambda x: x[1]["total"], 
-        reverse=True
-    )[:5]
-    
     # 获取最常用的关键词
     top_keywords = sorted(
-        stats["keyword_stats"].items(), 
+        stats["keywords"].items(), 
         key=lambda x: x[1], 
         reverse=True
     )[:5]
     
+    total_messages = stats["total"]
     message = f"📝 **文字消息监控统计**\n\n"
     message += f"⏱️ **运行时间:** {uptime_str}\n"
-    message += f"📈 **总文字消息数:** {stats['total_text_messages']}\n"
-    message += f"👥 **活跃群组数:** {len(stats['group_text_messages'])}\n"
-    message += f"👤 **活跃用户数:** {len(stats['user_text_messages'])}\n\n"
+    message += f"📈 **总文字消息数:** {total_messages}\n"
+    message += f"👥 **活跃群组数:** {stats['active_groups']}\n"
+    message += f"👤 **活跃用户数:** 约{stats['distinct_users']}\n\n"
     
     message += f"🔥 **最活跃群组:**\n"
-    for chat_id, data in top_groups:
-        message += f"• 群组{chat_id}: {data['total']}条消息 ({len(data['users'])}个用户)\n"
+    for chat_id, total, users in stats["top_groups"]:
+        message += f"• 群组{chat_id}: {total}条消息 (约{users}个用户)\n"
     
     message += f"\n👤 **最活跃用户:**\n"
-    for user_id, data in top_users:
-        message += f"• 用户{user_id}: {data['total']}条消息 ({len(data['groups'])}个群组)\n"
+    user_groups = stats.get("top_user_groups", {})
+    for user_id, count in stats["top_users"]:
+        message += f"• 用户{user_id}: {count}条消息 ({user_groups.get(user_id, 0)}个群组)\n"
     
     if top_keywords:
         message += f"\n🔑 **最常用关键词:**\n"
         for keyword, count in top_keywords:
-            percentage = (count / stats['total_text_messages']) * 100 if stats['total_text_messages'] > 0 else 0
+            percentage = (count / total_messages) * 100 if total_messages > 0 else 0
             message += f"• {keyword}: {count}次 ({percentage:.1f}%)\n"
     
     return message
@@ -328,7 +267,7 @@ async def show_text_stats_command(message: Message) -> None:
             await message.reply("❌ 此命令仅限管理员使用")
             return
         
-        stats_message = format_text_message_stats()
+        stats_message = await format_text_message_stats()
         await message.reply(stats_message, parse_mode="Markdown")
         
     except Exception as e:
@@ -28,7 +28,13 @@ from bot.ioc import DepsProvider
 from bot.misc import bot, dp
 from bot.tasks.lottery_scheduler import start_lottery_scheduler, stop_lottery_scheduler  # 导入开奖调度器
 from bot.tasks.mining_scheduler import start_mining_scheduler, stop_mining_scheduler  # 导入挖矿调度器
+from bot.tasks.red_packet_expiry import start_red_packet_expiry, stop_red_packet_expiry  # 导入红包过期处理任务
 from bot.utils import setup_logging
+from bot.utils.stats_sink import stats_sink
+from bot.utils.edit_coalescer import edit_coalescer
+from bot.common.checkin_queue import checkin_queue
+from bot.utils.balance_cache import balance_cache
+from bot.utils.broadcast import broadcaster
 from bot.states import Menu
 
 # 获取配置并设置日志
@@ -110,7 +116,23 @@ async def start_pooling():
     except Exception as e:
         logger.error(f"Failed to start mining scheduler: {e}")
 
-    await dp.start_polling(bot, skip_updates=True)
+    # 启动红包过期处理任务
+    try:
+        await start_red_packet_expiry()
+        logger.info("Started red packet expiry task")
+    except Exception as e:
+        logger.error(f"Failed to start red packet expiry task: {e}")
+
+    try:
+        await dp.start_polling(bot, skip_updates=True)
+    finally:
+        await stop_red_packet_expiry()
+        await edit_coalescer.close()
+        await checkin_queue.close()
+        await balance_cache.close()
+        await broadcaster.close()
+        # 写入尚未刷新到 Redis 的统计
+        await stats_sink.close()
 
 
 async def setup_webhook(bot: Bot):
@@ -142,4 +164,11 @@ async def setup_webhook(bot: Bot):
     except Exception as e:
         logger.error(f"Failed to start mining scheduler: {e}")
 
+    # 启动红包过期处理任务
+    try:
+        await start_red_packet_expiry()
+        logger.info("Started red packet expiry task")
+    except Exception as e:
+        logger.error(f"Failed to start red packet expiry task: {e}")
+
     await bot.set_webhook(config.WEBHOOK_URL, secret_token=config.BOT_SECRET_TOKEN)
\ No newline at end of file
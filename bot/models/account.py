@@ -1,5 +1,5 @@
 from typing import Annotated
-from sqlalchemy import BigInteger, Text, SmallInteger, ForeignKey
+from sqlalchemy import BigInteger, Text, SmallInteger, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from bot.models.base import Base, timestamp, is_deleted
@@ -42,6 +42,7 @@ class Account(Base):
     user = relationship("User", back_populates="accounts")
     
     __table_args__ = (
-        # 唯一索引：telegram_id + account_type
+        # 唯一索引：telegram_id + account_type（签到时按唯一键 upsert 账户）
+        UniqueConstraint('telegram_id', 'account_type', name='uk_telegram_account_type'),
         {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4', 'mysql_collate': 'utf8mb4_general_ci'}
     ) 
\ No newline at end of file
@@ -1,5 +1,5 @@
 from typing import Annotated
-from sqlalchemy import BigInteger, Text, SmallInteger, String
+from sqlalchemy import BigInteger, Text, SmallInteger, String, Computed, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from bot.models.base import Base, timestamp, is_deleted
@@ -41,6 +41,13 @@ class AccountTransaction(Base):
     # 来源ID
     source_id: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
     
+    # 需要按来源ID去重的交易类型的来源ID，其余类型为 NULL（52:红包过期退回）
+    unique_source_id: Mapped[str | None] = mapped_column(
+        String(64),
+        Computed("CASE WHEN transaction_type = 52 THEN source_id END", persisted=True),
+        nullable=True
+    )
+    
     # 群组ID
     group_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True, index=True)
     
@@ -48,5 +55,6 @@ class AccountTransaction(Base):
     remarks: Mapped[str | None] = mapped_column(Text, nullable=True)
     
     __table_args__ = (
+        UniqueConstraint('transaction_type', 'unique_source_id', name='uk_type_unique_source_id'),
         {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4', 'mysql_collate': 'utf8mb4_general_ci'}
     ) 
\ No newline at end of file
@@ -67,6 +67,7 @@ class MiningReward(Base):
         Index('idx_reward_date', 'reward_date'),
         Index('idx_claimed_time', 'claimed_time'),
         Index('idx_telegram_status', 'telegram_id', 'status'),
+        UniqueConstraint('mining_card_id', 'reward_date', name='uk_card_reward_date'),
     )
 
 
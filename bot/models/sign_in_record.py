@@ -1,6 +1,6 @@
 from typing import Annotated
 from datetime import date, datetime
-from sqlalchemy import String, Text, BigInteger, Integer, Boolean, Date, ForeignKey
+from sqlalchemy import String, Text, BigInteger, Integer, Boolean, Date, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from bot.models.base import Base
@@ -34,6 +34,11 @@ class SignInRecord(Base):
     # 备注
     remarks: Mapped[str | None] = mapped_column(Text, nullable=True)
     
+    __table_args__ = (
+        # 每个用户每天只能签到一次（跨群组）
+        UniqueConstraint('telegram_id', 'sign_date', name='uk_telegram_sign_date'),
+    )
+    
     def __repr__(self):
         return f"<SignInRecord(id={self.id}, telegram_id={self.telegram_id}, sign_date={self.sign_date})>"
     
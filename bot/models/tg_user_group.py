@@ -1,5 +1,6 @@
+from datetime import date
 from typing import Annotated, List, TYPE_CHECKING
-from sqlalchemy import String, Text, BigInteger, Integer, Boolean, ForeignKey, JSON
+from sqlalchemy import String, Text, BigInteger, Integer, Boolean, Date, ForeignKey, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from bot.models.base import Base
@@ -45,6 +46,12 @@ class User(Base):
     # 最后活跃时间
     last_active_time: Mapped[timestamp | None] = mapped_column(nullable=True)
     
+    # 最后签到日期
+    last_sign_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+    
+    # 连续签到天数（截至最后签到日期）
+    sign_streak: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    
     # 备注
     remarks: Mapped[str | None] = mapped_column(Text, nullable=True)
     
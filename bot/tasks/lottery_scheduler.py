@@ -4,24 +4,38 @@
 """
 
 import asyncio
+import heapq
+import itertools
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
+from typing import Optional
 from bot.common.lottery_service import LotteryService
 from bot.common.uow import UoW
 from bot.database.db import SessionFactory
-from bot.config.multi_game_config import MultiGameConfig
+from bot.config import get_config
+from bot.config.multi_game_config import MultiGameConfig, next_draw_deadline
+from bot.crud.lottery import lottery_draw as lottery_draw_crud
+from bot.utils.broadcast import broadcaster
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 logger = logging.getLogger(__name__)
+config = get_config()
 
 class LotteryScheduler:
     """多群组开奖调度器"""
     
     def __init__(self):
         self.is_running = False
-        self.lottery_service = None
+        self.draw_metrics = {}  # 每个群组的开奖耗时统计
         self.multi_config = MultiGameConfig()
         self.group_draw_times = {}  # 记录每个群组的上次开奖时间
+        self._timers = []  # 定时堆：(开奖时间, 序号, 类型, 群组ID)
+        self._timer_seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._draw_semaphore: Optional[asyncio.Semaphore] = None
+        self._running_draws = set()  # 正在开奖的群组
+        self._tasks = set()  # 保持对后台任务的引用
     
     def _get_notification_group_ids(self) -> list:
         """获取需要发送通知的群组ID列表"""
@@ -31,19 +45,39 @@ class LotteryScheduler:
             return [int(gid.strip()) for gid in group_ids_str.split(",") if gid.strip()]
         return []
     
-    async def _get_lottery_service(self):
-        """获取开奖服务实例"""
-        if self.lottery_service is None:
-            async with SessionFactory() as session:
-                uow = UoW(session)
-                self.lottery_service = LotteryService(uow)
-        return self.lottery_service
+    def _record_draw_metrics(self, group_id: int, deadline: datetime, started_at: datetime, duration: float, success: bool):
+        """记录群组开奖耗时统计"""
+        metrics = self.draw_metrics.setdefault(group_id, {
+            "draws": 0,
+            "failures": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+            "last_seconds": 0.0,
+            "last_delay_seconds": 0.0,
+            "last_draw_at": None,
+        })
+        metrics["draws"] += 1
+        if not success:
+            metrics["failures"] += 1
+        metrics["total_seconds"] += duration
+        metrics["max_seconds"] = max(metrics["max_seconds"], duration)
+        metrics["last_seconds"] = duration
+        metrics["last_delay_seconds"] = max((started_at - deadline).total_seconds(), 0.0)
+        metrics["last_draw_at"] = started_at
+    
+    def get_draw_metrics(self) -> dict:
+        """获取各群组开奖耗时统计（含平均耗时）"""
+        return {
+            group_id: {
+                **metrics,
+                "avg_seconds": metrics["total_seconds"] / metrics["draws"] if metrics["draws"] else 0.0,
+            }
+            for group_id, metrics in self.draw_metrics.items()
+        }
     
     async def _send_draw_result(self, group_id: int, draw_result: dict):
         """发送开奖结果到指定群组"""
         try:
-            from bot.misc import bot
-            
             group_config = self.multi_config.get_group_config(group_id)
             if not group_config:
                 logger.error(f"群组 {group_id} 未配置")
@@ -52,14 +86,11 @@ class LotteryScheduler:
             # 格式化开奖消息
             message = self._format_draw_message(group_id, draw_result)
             
-            # 发送到群组及其通知群组
+            # 并发发送到群组及其通知群组（失败原因由广播器记录）
             notification_groups = group_config.notification_groups or [group_id]
-            for target_group_id in notification_groups:
-                try:
-                    await bot.send_message(target_group_id, message, parse_mode="HTML")
-                    logger.info(f"开奖结果已发送到群组 {target_group_id}")
-                except Exception as e:
-                    logger.error(f"发送开奖结果到群组 {target_group_id} 失败: {e}")
+            results = await broadcaster.broadcast(notification_groups, message, parse_mode="HTML")
+            sent = [target_group_id for target_group_id, sent_message in results.items() if sent_message]
+            logger.info(f"开奖结果已发送到 {len(sent)}/{len(results)} 个群组: {sent}")
                     
         except Exception as e:
             logger.error(f"发送开奖结果失败: {e}")
@@ -111,7 +142,6 @@ class LotteryScheduler:
         """发送新一期开始投注消息（不显示按钮）"""
         try:
             logger.info(f"开始发送新一期开始投注消息，群组: {group_id}, 期号: {draw.draw_number}")
-            from bot.misc import bot
             group_config = self.multi_config.get_group_config(group_id)
             if not group_config:
                 logger.error(f"群组 {group_id} 未配置")
@@ -148,14 +178,12 @@ class LotteryScheduler:
             notification_groups = group_config.notification_groups or [group_id]
             logger.info(f"通知群组列表: {notification_groups}")
             
-            for target_group_id in notification_groups:
-                try:
-                    logger.info(f"正在发送消息到群组 {target_group_id}...")
-                    await bot.send_message(target_group_id, message, parse_mode="HTML")
+            results = await broadcaster.broadcast(notification_groups, message, parse_mode="HTML")
+            for target_group_id, sent_message in results.items():
+                if sent_message:
                     logger.info(f"✅ 新一期开始投注消息已成功发送到群组 {target_group_id}")
-                except Exception as e:
-                    logger.error(f"❌ 发送新一期消息到群组 {target_group_id} 失败: {e}")
-                    logger.error(f"错误详情: {type(e).__name__}: {str(e)}")
+                else:
+                    logger.error(f"❌ 发送新一期消息到群组 {target_group_id} 失败")
         except Exception as e:
             logger.error(f"❌ 发送新一期开始投注消息失败: {e}")
             logger.error(f"错误详情: {type(e).__name__}: {str(e)}")
@@ -166,21 +194,24 @@ class LotteryScheduler:
         """为指定群组创建新的开奖期"""
         try:
             logger.info(f"开始为群组 {group_id} 创建新开奖期...")
-            lottery_service = await self._get_lottery_service()
             group_config = self.multi_config.get_group_config(group_id)
             game_type = group_config.game_type if group_config else "lottery"
             logger.info(f"群组配置: {group_config.group_name if group_config else 'None'}, 游戏类型: {game_type}")
             
-            # 新增：检查当前是否已有未开奖的期
-            logger.info(f"检查群组 {group_id} 是否有未开奖期...")
-            from bot.crud.lottery import lottery_draw as lottery_draw_crud
-            current_draw = await lottery_draw_crud.get_current_draw(lottery_service.uow.session, group_id, game_type)
-            if current_draw:
-                logger.info(f"⚠️ 群组 {group_id} 已有未开奖期: {current_draw.draw_number}，状态: {current_draw.status}，不重复创建")
-                return
+            # 每次使用独立的会话
+            async with SessionFactory() as session:
+                lottery_service = LotteryService(UoW(session))
+                
+                # 新增：检查当前是否已有未开奖的期
+                logger.info(f"检查群组 {group_id} 是否有未开奖期...")
+                current_draw = await lottery_service.get_current_draw(group_id, game_type)
+                if current_draw:
+                    logger.info(f"⚠️ 群组 {group_id} 已有未开奖期: {current_draw.draw_number}，不重复创建")
+                    return
+                
+                logger.info(f"群组 {group_id} 没有未开奖期，开始创建新期...")
+                result = await lottery_service.create_new_draw(group_id, game_type)
             
-            logger.info(f"群组 {group_id} 没有未开奖期，开始创建新期...")
-            result = await lottery_service.create_new_draw(group_id, game_type)
             if result["success"]:
                 logger.info(f"✅ 群组 {group_id} 创建新开奖期成功: {result['draw'].draw_number}")
                 # 新增：发送新一期已开启消息和投注按钮
@@ -194,8 +225,8 @@ class LotteryScheduler:
             import traceback
             logger.error(f"堆栈跟踪: {traceback.format_exc()}")
     
-    async def _draw_lottery(self, group_id: int):
-        """为指定群组执行开奖"""
+    async def _draw_lottery(self, group_id: int) -> bool:
+        """为指定群组执行开奖，返回是否开奖成功"""
         try:
             logger.info(f"开始为群组 {group_id} 执行开奖...")
             
@@ -205,10 +236,10 @@ class LotteryScheduler:
             
             while retry_count <= max_retries:
                 try:
-                    # 获取开奖服务
-                    lottery_service = await self._get_lottery_service()
-                    # 执行开奖
-                    result = await lottery_service.draw_lottery(group_id=group_id)
+                    # 每次开奖使用连接池中独立的会话，群组之间互不影响
+                    async with SessionFactory() as session:
+                        lottery_service = LotteryService(UoW(session))
+                        result = await lottery_service.draw_lottery(group_id=group_id)
                     
                     if result["success"]:
                         logger.info(f"✅ 群组 {group_id} 开奖完成: 结果={result['result']}, 总投注={result['total_bets']}, 总派奖={result['total_payout']}")
@@ -224,7 +255,7 @@ class LotteryScheduler:
                         logger.error(f"❌ 群组 {group_id} 开奖失败: {result['message']}")
                     
                     # 成功执行，跳出循环
-                    break
+                    return result["success"]
                     
                 except Exception as e:
                     retry_count += 1
@@ -236,13 +267,14 @@ class LotteryScheduler:
                             logger.error(f"❌ 群组 {group_id} 开奖失败，已达到最大重试次数: {e}")
                         else:
                             logger.error(f"❌ 群组 {group_id} 开奖失败，非连接问题: {e}")
-                        break
+                        return False
                 
         except Exception as e:
             logger.error(f"❌ 群组 {group_id} 开奖异常: {e}")
             logger.error(f"错误详情: {type(e).__name__}: {str(e)}")
             import traceback
             logger.error(f"堆栈跟踪: {traceback.format_exc()}")
+        return False
     
     async def _cleanup_expired_cashback(self):
         """清理过期的返水记录"""
@@ -265,49 +297,88 @@ class LotteryScheduler:
         except Exception as e:
             logger.error(f"清理过期返水失败: {e}")
     
-    def _should_draw_now(self, group_id: int) -> bool:
-        """检查指定群组是否应该现在开奖"""
+    @staticmethod
+    def _next_deadline(after: datetime, interval_minutes: int) -> datetime:
+        """计算 after 之后的下一个开奖时间（分钟数整除开奖间隔的整分钟）"""
+        return next_draw_deadline(after, interval_minutes)
+    
+    def _get_draw_interval(self, group_id: int) -> Optional[int]:
+        """获取群组的开奖间隔（分钟），未配置或未开启自动开奖时返回 None"""
         group_config = self.multi_config.get_group_config(group_id)
         if not group_config or not group_config.auto_draw:
             logger.debug(f"群组 {group_id} 未配置或自动开奖已禁用")
-            return False
+            return None
         
         game_config = self.multi_config.get_game_config(group_config.game_type)
         if not game_config:
             logger.debug(f"群组 {group_id} 游戏类型 {group_config.game_type} 未配置")
-            return False
-        
-        now = datetime.now()
-        interval_minutes = game_config.draw_interval
-        
-        # 检查是否到了开奖时间
-        should_draw = now.minute % interval_minutes == 0 and now.second < 10
+            return None
         
-        # 检查是否已经开过奖（避免重复开奖）
-        last_draw_time = self.group_draw_times.get(group_id)
-        if last_draw_time and (now - last_draw_time).total_seconds() < 60:
-            logger.debug(f"群组 {group_id} 距离上次开奖时间过短，跳过")
-            return False
+        return game_config.draw_interval
+    
+    def _schedule(self, deadline: datetime, kind: str, group_id: int = None):
+        """加入定时堆，并唤醒主循环重新计算等待时间"""
+        heapq.heappush(self._timers, (deadline, next(self._timer_seq), kind, group_id))
+        self._wakeup.set()
+    
+    async def _initial_deadline(self, group_id: int, interval_minutes: int) -> datetime:
+        """
+        计算启动后的第一个开奖时间
         
-        if should_draw:
-            logger.info(f"🎯 群组 {group_id} 应该开奖: 当前时间={now.strftime('%H:%M:%S')}, 间隔={interval_minutes}分钟")
+        当前进行中的期在创建后已经错过了开奖时间（停机期间），立即补开一次。
+        """
+        now = datetime.now()
+        group_config = self.multi_config.get_group_config(group_id)
+        try:
+            async with SessionFactory() as session:
+                current_draw = await lottery_draw_crud.get_current_draw(session, group_id, group_config.game_type)
+        except Exception as e:
+            logger.error(f"❌ 群组 {group_id} 读取未开奖期失败: {e}")
+            current_draw = None
         
-        return should_draw
+        if current_draw and current_draw.created_at and self._next_deadline(current_draw.created_at, interval_minutes) <= now:
+            logger.info(f"⏪ 群组 {group_id} 第 {current_draw.draw_number} 期已错过开奖时间，立即补开")
+            return now
+        return self._next_deadline(now, interval_minutes)
     
-    async def _check_and_draw(self):
-        """检查所有群组并执行开奖"""
-        enabled_groups = self.multi_config.get_enabled_groups()
-        logger.debug(f"检查开奖: 当前启用的群组数量: {len(enabled_groups)}")
-        
-        for group_config in enabled_groups:
-            logger.debug(f"检查群组 {group_config.group_id} ({group_config.group_name}) 是否需要开奖...")
-            if self._should_draw_now(group_config.group_id):
-                logger.info(f"🚀 群组 {group_config.group_id} ({group_config.group_name}) 开始执行定时开奖...")
-                await self._draw_lottery(group_config.group_id)
-                self.group_draw_times[group_config.group_id] = datetime.now()
-                logger.info(f"✅ 群组 {group_config.group_id} 开奖完成，记录开奖时间")
-            else:
-                logger.debug(f"群组 {group_config.group_id} 暂不需要开奖")
+    async def _run_draw(self, group_id: int, deadline: datetime):
+        """在并发限制内执行一次开奖，并安排该群组的下一次开奖"""
+        try:
+            async with self._draw_semaphore:
+                logger.info(f"🚀 群组 {group_id} 开始执行定时开奖（计划时间 {deadline.strftime('%H:%M:%S')}）...")
+                started_at = datetime.now()
+                start = time.perf_counter()
+                success = await self._draw_lottery(group_id)
+                duration = time.perf_counter() - start
+                self.group_draw_times[group_id] = datetime.now()
+                self._record_draw_metrics(group_id, deadline, started_at, duration, success)
+                logger.info(
+                    f"✅ 群组 {group_id} 开奖完成，耗时 {duration:.2f}s，"
+                    f"延迟 {self.draw_metrics[group_id]['last_delay_seconds']:.2f}s"
+                )
+        finally:
+            self._running_draws.discard(group_id)
+            interval_minutes = self._get_draw_interval(group_id)
+            if self.is_running and interval_minutes:
+                next_deadline = self._next_deadline(deadline, interval_minutes)
+                now = datetime.now()
+                if next_deadline <= now:
+                    # 本次开奖耗时超过了一个周期，只补开一次
+                    next_deadline = now
+                self._schedule(next_deadline, "draw", group_id)
+    
+    async def _run_cleanup(self):
+        """清理过期返水，并安排下一个整点"""
+        try:
+            await self._cleanup_expired_cashback()
+        finally:
+            if self.is_running:
+                self._schedule(self._next_deadline(datetime.now(), 60), "cleanup")
+    
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
     
     async def start(self):
         """启动多群组开奖调度器"""
@@ -316,27 +387,50 @@ class LotteryScheduler:
             return
         
         self.is_running = True
+        self._timers = []
+        self._wakeup = asyncio.Event()
+        self._draw_semaphore = asyncio.Semaphore(max(config.lottery_max_concurrent_draws, 1))
         logger.info("🚀 多群组开奖调度器已启动")
         
-        # 启动时为所有启用的群组创建第一个开奖期
+        # 启动时为所有启用的群组安排第一次开奖（补开停机期间错过的期），并创建第一个开奖期
         enabled_groups = self.multi_config.get_enabled_groups()
         logger.info(f"📋 启动时初始化: 找到 {len(enabled_groups)} 个启用的群组")
         for group_config in enabled_groups:
             logger.info(f"初始化群组: {group_config.group_id} ({group_config.group_name})")
+            interval_minutes = self._get_draw_interval(group_config.group_id)
+            if interval_minutes:
+                deadline = await self._initial_deadline(group_config.group_id, interval_minutes)
+                self._schedule(deadline, "draw", group_config.group_id)
             await self._create_new_draw(group_config.group_id)
         
+        # 每小时清理一次过期返水
+        self._schedule(self._next_deadline(datetime.now(), 60), "cleanup")
+        
         try:
             while self.is_running:
                 try:
-                    # 检查是否需要开奖
-                    await self._check_and_draw()
+                    self._wakeup.clear()
+                    if not self._timers:
+                        await self._wakeup.wait()
+                        continue
                     
-                    # 每小时清理一次过期返水
-                    if datetime.now().minute == 0 and datetime.now().second < 10:
-                        await self._cleanup_expired_cashback()
+                    # 睡到最近的开奖时间，期间有新的定时加入会被提前唤醒
+                    delay = (self._timers[0][0] - datetime.now()).total_seconds()
+                    if delay > 0:
+                        try:
+                            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
                     
-                    # 等待1秒
-                    await asyncio.sleep(1)
+                    deadline, _, kind, group_id = heapq.heappop(self._timers)
+                    if kind == "cleanup":
+                        self._spawn(self._run_cleanup())
+                    elif group_id in self._running_draws:
+                        logger.warning(f"⚠️ 群组 {group_id} 上一次开奖尚未完成，跳过本次定时")
+                    else:
+                        self._running_draws.add(group_id)
+                        self._spawn(self._run_draw(group_id, deadline))
                     
                 except Exception as e:
                     logger.error(f"开奖调度器循环异常: {e}")
@@ -353,6 +447,8 @@ class LotteryScheduler:
     async def stop(self):
         """停止开奖调度器"""
         self.is_running = False
+        if self._wakeup:
+            self._wakeup.set()
         logger.info("正在停止开奖调度器...")
 
 # 全局调度器实例
@@ -370,35 +466,30 @@ async def stop_lottery_scheduler():
 async def manual_draw(group_id: int = None):
     """手动开奖"""
     try:
-        lottery_service = None
-        async with SessionFactory() as session:
-            uow = UoW(session)
-            lottery_service = LotteryService(uow)
+        semaphore = asyncio.Semaphore(max(config.lottery_max_concurrent_draws, 1))
         
-        if group_id:
-            # 为指定群组开奖
-            result = await lottery_service.draw_lottery(group_id=group_id)
+        async def draw_group(target_group_id: int) -> dict:
+            # 每个群组使用独立的会话
+            async with semaphore, SessionFactory() as session:
+                lottery_service = LotteryService(UoW(session))
+                result = await lottery_service.draw_lottery(group_id=target_group_id)
             if result["success"]:
-                logger.info(f"群组 {group_id} 手动开奖成功: {result['result']}")
-                await lottery_scheduler._send_draw_result(group_id, result)
-                await lottery_scheduler._create_new_draw(group_id)
+                logger.info(f"群组 {target_group_id} 手动开奖成功: {result['result']}")
+                await lottery_scheduler._send_draw_result(target_group_id, result)
+                await lottery_scheduler._create_new_draw(target_group_id)
             else:
-                logger.error(f"群组 {group_id} 手动开奖失败: {result['message']}")
+                logger.error(f"群组 {target_group_id} 手动开奖失败: {result['message']}")
             return result
+        
+        if group_id:
+            # 为指定群组开奖
+            return await draw_group(group_id)
         else:
-            # 为所有启用的群组开奖
+            # 为所有启用的群组并发开奖
             enabled_groups = lottery_scheduler.multi_config.get_enabled_groups()
-            results = []
-            for group_config in enabled_groups:
-                result = await lottery_service.draw_lottery(group_id=group_config.group_id)
-                if result["success"]:
-                    logger.info(f"群组 {group_config.group_id} 手动开奖成功: {result['result']}")
-                    await lottery_scheduler._send_draw_result(group_config.group_id, result)
-                    await lottery_scheduler._create_new_draw(group_config.group_id)
-                else:
-                    logger.error(f"群组 {group_config.group_id} 手动开奖失败: {result['message']}")
-                results.append(result)
-            return results
+            return list(await asyncio.gather(
+                *(draw_group(group_config.group_id) for group_config in enabled_groups)
+            ))
             
     except Exception as e:
         logger.error(f"手动开奖异常: {e}")
@@ -6,22 +6,69 @@
 
 import asyncio
 import logging
+import time
 from datetime import datetime, date, timedelta
+from typing import Dict, Optional
+from bot.config import get_config
 from bot.database.db import SessionFactory
+from bot.database.redis_client import redis_client
 from bot.common.uow import UoW
 from bot.common.mining_service import MiningService
+from bot.crud.mining import mining_card
 
 logger = logging.getLogger(__name__)
+config = get_config()
+
+
+class _CheckpointTracker:
+    """
+    记录并行批次的完成情况
+    批次按ID区间顺序编号，只有前面的批次全部成功后检查点才向前推进，
+    保证检查点之前的矿工卡都已处理完成
+    """
+
+    def __init__(self, start_id: int):
+        self.checkpoint = start_id
+        self._next_seq = 0
+        self._done: Dict[int, Optional[int]] = {}
+        self.blocked = False
+
+    def mark(self, seq: int, max_id: int, success: bool) -> Optional[int]:
+        """
+        标记批次完成
+
+        Returns:
+            检查点有推进时返回新的检查点，否则返回 None
+        """
+        self._done[seq] = max_id if success else None
+        advanced = False
+        while not self.blocked and self._next_seq in self._done:
+            done_id = self._done.pop(self._next_seq)
+            if done_id is None:
+                # 失败的批次之后不再推进，重启后从这里重新处理
+                self.blocked = True
+                break
+            self.checkpoint = done_id
+            self._next_seq += 1
+            advanced = True
+        return self.checkpoint if advanced else None
+
 
 class MiningScheduler:
     """挖矿调度器"""
     
-    def __init__(self):
+    # 检查点：每个奖励日期记录已连续处理完成的最大矿工卡ID
+    CHECKPOINT_KEY = "mining:reward_checkpoint:{reward_date}"
+    CHECKPOINT_TTL = 2 * 24 * 3600
+    
+    def __init__(self, workers: int = None, batch_size: int = None):
         self.is_running = False
         self.task = None
-        self.batch_size = 100  # 每批处理的矿工卡数量
+        self.workers = workers or config.mining_reward_workers  # 并行处理批次的协程数
+        self.batch_size = batch_size or config.mining_reward_batch_size  # 每批处理的矿工卡数量
         self.max_retries = 3   # 最大重试次数
         self.retry_delay = 60  # 重试延迟（秒）
+        self.last_run_summary: Optional[Dict] = None
     
     async def start(self):
         """启动挖矿调度器"""
@@ -69,103 +116,188 @@ class MiningScheduler:
                 # 等待5分钟后重试
                 await asyncio.sleep(300)
     
-    async def _process_daily_rewards_batch(self):
-        """批量处理每日挖矿奖励"""
-        start_time = datetime.now()
-        logger.info("开始批量处理每日挖矿奖励...")
+    def _checkpoint_key(self, reward_date: date) -> str:
+        return self.CHECKPOINT_KEY.format(reward_date=reward_date.isoformat())
+    
+    async def _load_checkpoint(self, reward_date: date) -> int:
+        """读取检查点，不存在或 Redis 不可用时从头开始"""
+        try:
+            value = await redis_client.get(self._checkpoint_key(reward_date))
+            return int(value) if value else 0
+        except Exception as e:
+            logger.error(f"读取挖矿奖励检查点失败: {e}")
+            return 0
+    
+    async def _save_checkpoint(self, reward_date: date, last_id: int):
+        try:
+            await redis_client.set(self._checkpoint_key(reward_date), last_id, ex=self.CHECKPOINT_TTL)
+        except Exception as e:
+            logger.error(f"保存挖矿奖励检查点失败: {e}")
+    
+    async def _clear_checkpoint(self, reward_date: date):
+        try:
+            await redis_client.delete(self._checkpoint_key(reward_date))
+        except Exception as e:
+            logger.error(f"清除挖矿奖励检查点失败: {e}")
+    
+    async def _process_daily_rewards_batch(self, reward_date: date = None) -> Dict:
+        """
+        并行批量处理每日挖矿奖励
+        
+        生产者按主键游标只读取待发放矿工卡的ID，把每批的ID区间放入队列；
+        多个处理协程各自从连接池取会话，锁定并处理区间内的矿工卡。
+        已连续完成的最大ID写入 Redis 检查点，重启后从检查点继续；
+        全部批次成功后清除检查点，下一次整点运行从头扫描新出现的待发放矿工卡。
+        
+        Returns:
+            本次运行的统计信息
+        """
+        reward_date = reward_date or date.today()
+        start_time = time.monotonic()
+        start_id = await self._load_checkpoint(reward_date)
+        if start_id:
+            logger.info(f"从检查点继续处理每日挖矿奖励: 日期={reward_date}, 起始ID={start_id}")
+        else:
+            logger.info(f"开始批量处理每日挖矿奖励: 日期={reward_date}")
+        
+        stats = {
+            "reward_date": reward_date.isoformat(),
+            "start_id": start_id,
+            "batches": 0,
+            "failed_batches": 0,
+            "retries": 0,
+            "processed_cards": 0,
+            "total_rewards": 0,
+            "rows_written": 0,
+        }
+        tracker = _CheckpointTracker(start_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        workers = [
+            asyncio.create_task(self._batch_worker(queue, reward_date, tracker, stats))
+            for _ in range(self.workers)
+        ]
         
         try:
-            async with SessionFactory() as session:
-                uow = UoW(session)
-                mining_service = MiningService(uow)
-                
-                # 获取需要处理的矿工卡总数
-                total_cards = await mining_service.get_pending_cards_count()
-                logger.info(f"需要处理的矿工卡总数: {total_cards}张")
-                
-                if total_cards == 0:
-                    logger.info("没有需要处理的矿工卡")
-                    return
-                
-                # 分批处理
-                processed_total = 0
-                total_rewards = 0
-                batch_count = 0
-                
-                for offset in range(0, total_cards, self.batch_size):
-                    batch_count += 1
-                    batch_start = datetime.now()
-                    
-                    logger.info(f"处理第 {batch_count} 批 (偏移量: {offset}, 大小: {self.batch_size})")
-                    
-                    # 处理当前批次
-                    batch_result = await self._process_batch(
-                        mining_service, 
-                        offset, 
-                        self.batch_size
-                    )
-                    
-                    if batch_result["success"]:
-                        processed_total += batch_result["processed_cards"]
-                        total_rewards += batch_result["total_rewards"]
-                        
-                        batch_time = (datetime.now() - batch_start).total_seconds()
-                        logger.info(f"第 {batch_count} 批处理完成: "
-                                  f"处理 {batch_result['processed_cards']} 张卡, "
-                                  f"发放 {batch_result['total_rewards']:,} 积分, "
-                                  f"耗时 {batch_time:.2f} 秒")
-                    else:
-                        logger.error(f"第 {batch_count} 批处理失败: {batch_result['message']}")
-                    
-                    # 批次间短暂休息，避免数据库压力过大
-                    await asyncio.sleep(1)
+            await self._produce_batches(queue, reward_date, start_id, stats)
+        except Exception as e:
+            logger.error(f"读取待发放矿工卡失败: {e}")
+            stats["failed_batches"] += 1
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        
+        if stats["failed_batches"] == 0:
+            await self._clear_checkpoint(reward_date)
+        
+        total_time = time.monotonic() - start_time
+        stats["checkpoint"] = tracker.checkpoint
+        stats["total_time"] = round(total_time, 3)
+        stats["cards_per_second"] = round(stats["processed_cards"] / total_time, 2) if total_time > 0 else 0
+        self.last_run_summary = stats
+        
+        if stats["batches"] == 0:
+            logger.info("没有需要处理的矿工卡")
+        else:
+            logger.info(f"批量处理完成: "
+                      f"{stats['batches']} 批 ({self.workers} 个并行协程), "
+                      f"处理 {stats['processed_cards']} 张矿工卡, "
+                      f"发放 {stats['total_rewards']:,} 积分, "
+                      f"写入 {stats['rows_written']} 行, "
+                      f"重试 {stats['retries']} 次, "
+                      f"失败 {stats['failed_batches']} 批, "
+                      f"总耗时 {total_time:.2f} 秒, "
+                      f"{stats['cards_per_second']} 张/秒")
+        return stats
+    
+    async def _produce_batches(self, queue: asyncio.Queue, reward_date: date, start_id: int, stats: Dict):
+        """按主键游标读取待发放矿工卡ID，划分为 (起始ID, 结束ID] 区间放入队列"""
+        last_id = start_id
+        seq = 0
+        async with SessionFactory() as session:
+            while True:
+                card_ids = await mining_card.get_card_ids_needing_reward(
+                    session,
+                    reward_date=reward_date,
+                    last_id=last_id,
+                    limit=self.batch_size
+                )
+                # 结束只读事务，不长时间持有快照
+                await session.commit()
+                if not card_ids:
+                    break
                 
-                # 处理完成统计
-                total_time = (datetime.now() - start_time).total_seconds()
-                logger.info(f"批量处理完成: "
-                          f"总共处理 {processed_total} 张矿工卡, "
-                          f"发放 {total_rewards:,} 积分, "
-                          f"总耗时 {total_time:.2f} 秒, "
-                          f"平均每张卡 {total_time/processed_total:.3f} 秒")
+                await queue.put((seq, last_id, card_ids[-1]))
+                stats["batches"] += 1
+                seq += 1
+                last_id = card_ids[-1]
                 
-        except Exception as e:
-            logger.error(f"批量处理每日挖矿奖励失败: {e}")
+                if len(card_ids) < self.batch_size:
+                    break
     
-    async def _process_batch(self, mining_service, offset: int, limit: int):
-        """处理一批矿工卡"""
+    async def _batch_worker(self, queue: asyncio.Queue, reward_date: date, tracker: _CheckpointTracker, stats: Dict):
+        """处理协程：逐个处理队列中的ID区间并推进检查点"""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            seq, last_id, max_id = item
+            batch_start = time.monotonic()
+            
+            result = await self._process_batch(last_id, max_id, reward_date, stats)
+            
+            if result["success"]:
+                stats["processed_cards"] += result["processed_cards"]
+                stats["total_rewards"] += result["total_rewards"]
+                # 每张卡写入一条奖励记录并更新一行矿工卡
+                stats["rows_written"] += result["processed_cards"] * 2
+                logger.info(f"第 {seq + 1} 批处理完成 (ID {last_id + 1}-{max_id}): "
+                          f"处理 {result['processed_cards']} 张卡, "
+                          f"发放 {result['total_rewards']:,} 积分, "
+                          f"耗时 {time.monotonic() - batch_start:.2f} 秒")
+            else:
+                stats["failed_batches"] += 1
+                logger.error(f"第 {seq + 1} 批处理失败 (ID {last_id + 1}-{max_id}): {result['message']}")
+            
+            checkpoint = tracker.mark(seq, max_id, result["success"])
+            if checkpoint is not None:
+                await self._save_checkpoint(reward_date, checkpoint)
+    
+    async def _process_batch(self, last_id: int, max_id: int, reward_date: date, stats: Dict):
+        """处理一个ID区间的矿工卡（每次尝试使用独立会话，失败时重试，批次本身是幂等的）"""
         retry_count = 0
         
-        while retry_count < self.max_retries:
+        while True:
             try:
-                # 处理指定批次的矿工卡
-                result = await mining_service.process_daily_mining_rewards_batch(
-                    offset=offset,
-                    limit=limit
-                )
-                
-                return result
-                
+                async with SessionFactory() as session:
+                    mining_service = MiningService(UoW(session))
+                    result = await mining_service.process_daily_mining_rewards_batch(
+                        last_id=last_id,
+                        limit=self.batch_size,
+                        reward_date=reward_date,
+                        max_id=max_id
+                    )
             except Exception as e:
-                retry_count += 1
-                logger.warning(f"批次处理失败 (重试 {retry_count}/{self.max_retries}): {e}")
-                
-                if retry_count < self.max_retries:
-                    await asyncio.sleep(self.retry_delay)
-                else:
-                    logger.error(f"批次处理最终失败: {e}")
-                    return {
-                        "success": False,
-                        "message": f"批次处理失败: {e}",
-                        "processed_cards": 0,
-                        "total_rewards": 0
-                    }
+                result = {"success": False, "message": str(e)}
+            if result["success"]:
+                return result
+            
+            retry_count += 1
+            if retry_count >= self.max_retries:
+                break
+            stats["retries"] += 1
+            logger.warning(f"批次处理失败 (重试 {retry_count}/{self.max_retries}): {result['message']}")
+            await asyncio.sleep(self.retry_delay)
+        
+        logger.error(f"批次处理最终失败: {result['message']}")
+        return result
     
     async def _wait_until_next_hour(self):
         """等待到下一个整点"""
         now = datetime.now()
         next_hour = now.replace(minute=0, second=0, microsecond=0)
         if next_hour <= now:
-            next_hour = next_hour.replace(hour=next_hour.hour + 1)
+            next_hour += timedelta(hours=1)
         
         wait_seconds = (next_hour - now).total_seconds()
         logger.info(f"等待到下一个整点: {next_hour.strftime('%Y-%m-%d %H:%M:%S')} (等待{wait_seconds:.0f}秒)")
@@ -190,77 +322,19 @@ async def stop_mining_scheduler():
         await _mining_scheduler.stop()
         _mining_scheduler = None
 
-async def process_mining_rewards_manual(reward_date: date = None, batch_size: int = 100):
+async def process_mining_rewards_manual(reward_date: date = None, batch_size: int = 100, workers: int = None):
     """手动处理挖矿奖励（用于测试或手动触发）"""
-    start_time = datetime.now()
     logger.info("开始手动处理挖矿奖励...")
     
     try:
-        async with SessionFactory() as session:
-            uow = UoW(session)
-            mining_service = MiningService(uow)
-            
-            # 获取需要处理的矿工卡总数
-            total_cards = await mining_service.get_pending_cards_count()
-            logger.info(f"需要处理的矿工卡总数: {total_cards}张")
-            
-            if total_cards == 0:
-                logger.info("没有需要处理的矿工卡")
-                return {
-                    "success": True,
-                    "message": "没有需要处理的矿工卡",
-                    "processed_cards": 0,
-                    "total_rewards": 0
-                }
-            
-            # 分批处理
-            processed_total = 0
-            total_rewards = 0
-            batch_count = 0
-            
-            for offset in range(0, total_cards, batch_size):
-                batch_count += 1
-                batch_start = datetime.now()
-                
-                logger.info(f"处理第 {batch_count} 批 (偏移量: {offset}, 大小: {batch_size})")
-                
-                # 处理当前批次
-                batch_result = await mining_service.process_daily_mining_rewards_batch(
-                    offset=offset,
-                    limit=batch_size
-                )
-                
-                if batch_result["success"]:
-                    processed_total += batch_result["processed_cards"]
-                    total_rewards += batch_result["total_rewards"]
-                    
-                    batch_time = (datetime.now() - batch_start).total_seconds()
-                    logger.info(f"第 {batch_count} 批处理完成: "
-                              f"处理 {batch_result['processed_cards']} 张卡, "
-                              f"发放 {batch_result['total_rewards']:,} 积分, "
-                              f"耗时 {batch_time:.2f} 秒")
-                else:
-                    logger.error(f"第 {batch_count} 批处理失败: {batch_result['message']}")
-                
-                # 批次间短暂休息
-                await asyncio.sleep(1)
-            
-            # 处理完成统计
-            total_time = (datetime.now() - start_time).total_seconds()
-            result = {
-                "success": True,
-                "message": f"手动处理完成，总共处理 {processed_total} 张矿工卡，发放 {total_rewards:,} 积分",
-                "processed_cards": processed_total,
-                "total_rewards": total_rewards,
-                "total_time": total_time
-            }
-            
-            logger.info(f"手动处理完成: "
-                      f"总共处理 {processed_total} 张矿工卡, "
-                      f"发放 {total_rewards:,} 积分, "
-                      f"总耗时 {total_time:.2f} 秒")
-            
-            return result
+        scheduler = MiningScheduler(workers=workers, batch_size=batch_size)
+        summary = await scheduler._process_daily_rewards_batch(reward_date)
+        
+        return {
+            "success": summary["failed_batches"] == 0,
+            "message": f"手动处理完成，总共处理 {summary['processed_cards']} 张矿工卡，发放 {summary['total_rewards']:,} 积分",
+            **summary
+        }
                 
     except Exception as e:
         logger.error(f"手动处理挖矿奖励失败: {e}")
@@ -0,0 +1,139 @@
+"""
+红包过期处理任务
+所有红包的到期时间保存在 Redis 有序集合中，由一个后台任务统一处理：
+每次轮询认领所有已到期的红包，一次批量退款，再更新红包消息。
+进程重启后未处理的红包仍在有序集合中，启动后会被继续处理
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from bot.common.red_packet_service import RedPacketService
+from bot.common.uow import UoW
+from bot.database.db import SessionFactory
+from bot.utils.edit_coalescer import edit_coalescer
+
+logger = logging.getLogger(__name__)
+
+
+class RedPacketExpiryWorker:
+    """红包过期处理任务"""
+
+    # 轮询间隔（秒）
+    POLL_INTERVAL = 1
+    # 每批最多处理的红包个数
+    BATCH_SIZE = 500
+    # 认领后超过该时间（秒）仍在退款中的红包视为中断，重新退款
+    REFUND_RETRY_AFTER = 60
+
+    def __init__(self, redis=None):
+        self._redis = redis
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _service(self, session) -> RedPacketService:
+        return RedPacketService(UoW(session), redis=self._redis)
+
+    async def tick(self, now: float = None) -> int:
+        """
+        处理一次到期的红包
+
+        Returns:
+            处理的红包个数
+        """
+        now = now or time.time()
+        processed = 0
+
+        # 上次退款中断的红包（进程在退款途中退出），原子重新认领，退款记录有唯一键，重复执行不会多退
+        async with SessionFactory() as session:
+            service = self._service(session)
+            stale = await service.claim_stale_refunding(now - self.REFUND_RETRY_AFTER, now, self.BATCH_SIZE)
+        if stale:
+            logger.warning(f"重新处理 {len(stale)} 个中断退款的过期红包")
+            processed += await self._process(stale)
+
+        while True:
+            async with SessionFactory() as session:
+                claimed = await self._service(session).claim_expired_red_packets(now, self.BATCH_SIZE)
+            if claimed:
+                processed += await self._process(claimed)
+            if len(claimed) < self.BATCH_SIZE:
+                break
+
+        return processed
+
+    async def _process(self, red_packet_ids: List[str]) -> int:
+        """批量退款并更新红包消息"""
+        try:
+            async with SessionFactory() as session:
+                infos = await self._service(session).refund_expired_red_packets(red_packet_ids)
+        except Exception as e:
+            # 留在退款中集合，稍后重试
+            logger.error(f"过期红包退款失败: {e}")
+            return 0
+
+        for info in infos:
+            self._update_message(info)
+        logger.info(f"处理过期红包 {len(infos)} 个")
+        return len(infos)
+
+    def _update_message(self, info: Dict):
+        """更新红包消息，显示过期信息和抢红包记录"""
+        if info["message_id"] <= 0 or info["chat_id"] == 0:
+            return
+        from bot.handlers.red_packet_handler import _build_red_packet_expired_message
+
+        message = _build_red_packet_expired_message(
+            sender_name=info["sender_name"],
+            amount=info["amount"],
+            total_num=info["total_num"],
+            remaining_num=info["remaining_num"],
+            participants=info["participants"],
+            best_grabber=info["best_grabber"]
+        )
+        # 作为最终状态提交，之后不会再被抢红包进度的编辑覆盖
+        edit_coalescer.update(info["chat_id"], info["message_id"], message, final=True)
+
+    async def _run(self):
+        while self.is_running:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"红包过期处理异常: {e}")
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    async def start(self):
+        """启动红包过期处理任务"""
+        if self.is_running:
+            logger.warning("红包过期处理任务已在运行")
+            return
+        self.is_running = True
+        self._task = asyncio.create_task(self._run(), name="red-packet-expiry")
+        logger.info("红包过期处理任务已启动")
+
+    async def stop(self):
+        """停止红包过期处理任务"""
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logger.info("红包过期处理任务已停止")
+
+
+# 全局红包过期处理任务实例
+red_packet_expiry_worker = RedPacketExpiryWorker()
+
+
+async def start_red_packet_expiry():
+    """启动红包过期处理任务"""
+    await red_packet_expiry_worker.start()
+
+
+async def stop_red_packet_expiry():
+    """停止红包过期处理任务"""
+    await red_packet_expiry_worker.stop()
@@ -1,4 +1,4 @@
 from bot.utils.telegram import get_chat_info, sanitize_text
-from bot.utils.logging import setup_logging
+from bot.utils.logging import setup_logging, get_dropped_records
 
-__all__ = ['get_chat_info', 'sanitize_text', 'setup_logging'] 
\ No newline at end of file
+__all__ = ['get_chat_info', 'sanitize_text', 'setup_logging', 'get_dropped_records'] 
\ No newline at end of file
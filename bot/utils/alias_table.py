@@ -0,0 +1,69 @@
+"""
+别名表（Vose 别名方法）离散分布抽样
+建表 O(N)，之后每次抽样只需一个随机下标和一个随机小数，O(1) 完成，与结果个数无关
+"""
+
+import random
+from typing import Generic, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+class AliasTable(Generic[T]):
+    """按权重抽样的别名表"""
+
+    def __init__(self, outcomes: Sequence[T], weights: Sequence[float]):
+        """
+        Args:
+            outcomes: 可能的结果
+            weights: 对应的权重（无需归一化）
+        """
+        if len(outcomes) != len(weights) or not outcomes:
+            raise ValueError("结果与权重的个数必须相同且不为空")
+        total = float(sum(weights))
+        if total <= 0 or any(weight < 0 for weight in weights):
+            raise ValueError("权重必须非负且总和大于0")
+
+        n = len(outcomes)
+        self.outcomes: List[T] = list(outcomes)
+        self.probabilities: List[float] = [weight / total for weight in weights]
+        # prob[i]: 抽到第 i 格时保留 i 的概率，否则取 alias[i]
+        self.prob: List[float] = [0.0] * n
+        self.alias: List[int] = list(range(n))
+
+        scaled = [p * n for p in self.probabilities]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # 剩余的格子由于浮点误差可能略偏离 1，直接视为 1
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def __len__(self) -> int:
+        return len(self.outcomes)
+
+    def sample_index(self, rng: Optional[random.Random] = None) -> int:
+        """抽取一个结果的下标"""
+        r = (rng or random).random() * len(self.prob)
+        i = int(r)
+        return i if r - i < self.prob[i] else self.alias[i]
+
+    def sample(self, rng: Optional[random.Random] = None) -> T:
+        """抽取一个结果"""
+        return self.outcomes[self.sample_index(rng)]
+
+    def sample_indices(self, k: int, rng: Optional[random.Random] = None) -> List[int]:
+        """批量抽取 k 个结果的下标（用于模拟）"""
+        rnd = (rng or random).random
+        n, prob, alias = len(self.prob), self.prob, self.alias
+        indices = []
+        for _ in range(k):
+            r = rnd() * n
+            i = int(r)
+            indices.append(i if r - i < prob[i] else alias[i])
+        return indices
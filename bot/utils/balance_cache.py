@@ -0,0 +1,125 @@
+"""
+账户余额缓存
+查询积分、挖矿/钓鱼菜单等只读展示从 Redis 读取余额，未命中时查库并回填；
+扣款、入账前的校验等资金路径仍然直接读数据库。
+所有余额变更都经过 CRUDAccount，变更时把受影响的账户记在会话上，
+事务提交后统一失效。失效不是删除 key，而是写入一个短时有效的墓碑，
+回填只用 SET NX，提交前查到旧余额的读者不会把旧值写回缓存
+"""
+
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from bot.config import get_config
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+# 会话 info 中记录待失效账户的键
+_SESSION_KEY = "balance_cache_dirty"
+
+
+class BalanceCache:
+    """Redis 余额缓存，key 为 balance:{telegram_id}:{account_type}"""
+
+    KEY_PREFIX = "balance"
+    # 账户不存在时缓存的占位值
+    MISSING = ""
+    # 失效后的墓碑及其有效期（秒），期间的读取都回源数据库且不回填
+    TOMBSTONE = "!"
+    TOMBSTONE_TTL = 5
+
+    def __init__(self, redis=None, ttl: int = None):
+        """
+        Args:
+            redis: Redis 客户端，默认使用 bot.database.redis_client 中的共享实例
+            ttl: 缓存有效期（秒）
+        """
+        self._redis = redis
+        self.ttl = ttl or config.balance_cache_ttl
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from bot.database.redis_client import redis_client
+            self._redis = redis_client
+        return self._redis
+
+    def key(self, telegram_id: int, account_type: int) -> str:
+        return f"{self.KEY_PREFIX}:{telegram_id}:{account_type}"
+
+    async def get_many(self, telegram_id: int, account_types: Sequence[int]) -> Dict[int, Optional[int]]:
+        """
+        读取缓存的可用余额
+
+        Returns:
+            账户类型 -> 可用余额（账户不存在为 None），未命中的类型不在结果中；
+            Redis 不可用时返回空字典
+        """
+        try:
+            values = await self.redis.mget([self.key(telegram_id, t) for t in account_types])
+        except Exception as e:
+            logger.error(f"读取余额缓存失败: {e}")
+            return {}
+        return {
+            account_type: None if value == self.MISSING else int(value)
+            for account_type, value in zip(account_types, values)
+            if value is not None and value != self.TOMBSTONE
+        }
+
+    async def fill(self, telegram_id: int, balances: Dict[int, Optional[int]]):
+        """回填查库得到的余额（已有值或墓碑时不覆盖）"""
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for account_type, balance in balances.items():
+                    value = self.MISSING if balance is None else balance
+                    pipe.set(self.key(telegram_id, account_type), value, ex=self.ttl, nx=True)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"写入余额缓存失败: {e}")
+
+    def mark_dirty(self, session, accounts: Iterable[Tuple[int, int]]):
+        """记录本事务中余额有变更的账户 (telegram_id, account_type)，提交后失效"""
+        session.info.setdefault(_SESSION_KEY, set()).update(accounts)
+
+    async def invalidate(self, accounts: Iterable[Tuple[int, int]]):
+        """立即失效指定账户的缓存"""
+        keys = [self.key(telegram_id, account_type) for telegram_id, account_type in accounts]
+        if not keys:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(key, self.TOMBSTONE, ex=self.TOMBSTONE_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"失效余额缓存失败: {e}")
+
+    def _after_commit(self, session: Session):
+        accounts = session.info.pop(_SESSION_KEY, None)
+        if not accounts:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中（同步脚本），缓存按有效期自然过期
+            return
+        task = loop.create_task(self.invalidate(accounts))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """等待尚未完成的失效操作"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# 全局余额缓存实例
+balance_cache = BalanceCache()
+
+event.listen(Session, "after_commit", balance_cache._after_commit)
@@ -0,0 +1,264 @@
+"""
+消息广播发送器
+出站消息按聊天排队，由多个发送协程并发投递：
+每个聊天一个令牌桶（私聊约 1 条/秒，群组约 20 条/分钟），同一聊天内按提交顺序发送，
+外加全局约 30 条/秒的限速，遇到 RetryAfter 时按 Telegram 要求的时间暂停该聊天后重试。
+被限速的聊天延后重新入队，不会占住发送协程
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发数量）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """
+        尝试取一个令牌，不等待
+
+        Returns:
+            0 表示已取得令牌，否则为需要等待的秒数
+        """
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """取一个令牌，不足时等待（按到达顺序排队）"""
+        async with self._lock:
+            while True:
+                wait = self.try_acquire()
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """暂停发放令牌（收到 RetryAfter 时使用）"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def is_idle(self) -> bool:
+        """令牌已补满且没有暂停，可以回收"""
+        now = time.monotonic()
+        return now >= self.paused_until and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+@dataclass
+class OutgoingMessage:
+    """待发送的消息"""
+    chat_id: int
+    text: str
+    kwargs: Dict[str, Any]
+    future: asyncio.Future = field(repr=False)
+    attempts: int = 0
+
+
+class Broadcaster:
+    """消息广播发送器"""
+
+    # 全局限速（Telegram 建议不超过 30 条/秒）
+    GLOBAL_RATE = 30
+    # 私聊每个聊天约 1 条/秒
+    PRIVATE_CHAT_RATE = 1
+    # 群组每个聊天约 20 条/分钟
+    GROUP_CHAT_RATE = 20 / 60
+    GROUP_CHAT_BURST = 3
+    # 聊天令牌桶数量超过该值时回收空闲的桶
+    MAX_CHAT_BUCKETS = 1000
+
+    def __init__(self, bot=None, workers: int = 8, max_retries: int = 3):
+        """
+        Args:
+            bot: aiogram Bot 实例，默认使用 bot.misc 中的全局实例
+            workers: 并发发送协程数量
+            max_retries: 收到 RetryAfter 后的最大重试次数
+        """
+        self._bot = bot
+        self.workers = workers
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._global_bucket = TokenBucket(self.GLOBAL_RATE, self.GLOBAL_RATE)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        # 每个聊天的待发消息；就绪队列中每个聊天最多出现一次
+        self._pending: Dict[int, Deque[OutgoingMessage]] = {}
+
+    @property
+    def bot(self):
+        if self._bot is None:
+            from bot.misc import bot
+            self._bot = bot
+        return self._bot
+
+    def _ensure_started(self):
+        """首次发送时在当前事件循环中启动发送协程"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if not self._worker_tasks:
+            self._worker_tasks = [
+                asyncio.create_task(self._worker(), name=f"broadcast-worker-{index}")
+                for index in range(self.workers)
+            ]
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_idle()
+                }
+            if chat_id < 0:
+                bucket = TokenBucket(self.GROUP_CHAT_RATE, self.GROUP_CHAT_BURST)
+            else:
+                bucket = TokenBucket(self.PRIVATE_CHAT_RATE, 1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def submit(self, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """
+        把消息放入发送队列，不等待发送完成
+
+        Returns:
+            发送完成后结果为 Message，失败时结果为 None
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.get(chat_id)
+        if pending is None:
+            pending = self._pending[chat_id] = deque()
+            self._queue.put_nowait(chat_id)
+        pending.append(OutgoingMessage(chat_id, text, kwargs, future))
+        return future
+
+    async def send(self, chat_id: int, text: str, **kwargs) -> Optional[Message]:
+        """发送一条消息并等待结果，失败返回 None"""
+        return await self.submit(chat_id, text, **kwargs)
+
+    async def broadcast(self, chat_ids: Iterable[int], text: str, **kwargs) -> Dict[int, Optional[Message]]:
+        """
+        向多个聊天并发发送同一条消息
+
+        Returns:
+            chat_id -> 发送成功的 Message，失败为 None
+        """
+        futures = {chat_id: self.submit(chat_id, text, **kwargs) for chat_id in dict.fromkeys(chat_ids)}
+        results = await asyncio.gather(*futures.values())
+        return dict(zip(futures.keys(), results))
+
+    def _requeue(self, chat_id: int, delay: float = 0):
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, chat_id)
+        else:
+            self._queue.put_nowait(chat_id)
+
+    def _finish(self, chat_id: int, result: Optional[Message]):
+        """当前消息处理完毕，聊天还有待发消息时重新入队"""
+        pending = self._pending[chat_id]
+        item = pending.popleft()
+        if not item.future.done():
+            item.future.set_result(result)
+        if pending:
+            self._requeue(chat_id)
+        else:
+            del self._pending[chat_id]
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._queue.get()
+            try:
+                await self._deliver(chat_id)
+            except Exception as e:
+                logger.error(f"发送消息到 {chat_id} 异常: {e}")
+                self._finish(chat_id, None)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, chat_id: int):
+        item = self._pending[chat_id][0]
+        bucket = self._chat_bucket(chat_id)
+
+        # 该聊天暂时没有令牌：延后重新入队，发送协程去处理其它聊天
+        wait = bucket.try_acquire()
+        if wait:
+            self._requeue(chat_id, wait)
+            return
+
+        await self._global_bucket.acquire()
+        try:
+            message = await self.bot.send_message(chat_id, item.text, **item.kwargs)
+        except TelegramRetryAfter as e:
+            item.attempts += 1
+            if item.attempts > self.max_retries:
+                logger.error(f"发送消息到 {chat_id} 失败: 超过最大重试次数 {self.max_retries}")
+                self._finish(chat_id, None)
+                return
+            logger.warning(f"发送消息到 {chat_id} 被限流，{e.retry_after} 秒后重试（第 {item.attempts} 次）")
+            bucket.pause(e.retry_after)
+            self._requeue(chat_id, e.retry_after)
+            return
+        except Exception as e:
+            logger.error(f"发送消息到 {chat_id} 失败: {e}")
+            self._finish(chat_id, None)
+            return
+
+        self._finish(chat_id, message)
+
+    async def close(self, timeout: float = 10):
+        """
+        等待待发消息发送完毕后停止发送协程
+
+        Args:
+            timeout: 最长等待秒数（被 RetryAfter 暂停的聊天可能要等很久），超时后放弃剩余消息
+        """
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._pending:
+            dropped = sum(len(pending) for pending in self._pending.values())
+            logger.warning(f"停止广播发送器: 放弃 {dropped} 条未发送的消息")
+            for pending in self._pending.values():
+                for item in pending:
+                    if not item.future.done():
+                        item.future.set_result(None)
+            self._pending.clear()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        # 延迟重新入队的定时回调仍指向旧队列，重新启动时使用新队列
+        self._queue = None
+
+
+# 全局广播发送器实例
+broadcaster = Broadcaster()
@@ -0,0 +1,141 @@
+"""
+消息编辑合并器
+同一条消息的多次更新只保留最新状态，每条消息每隔 message_edit_interval_ms 毫秒最多编辑一次，
+避免短时间内连续编辑被 Telegram 限流（429）。标记为最终状态的更新一定会被发出，
+之后该消息的其它更新会被忽略
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.config import get_config
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+# 生成编辑参数（text、reply_markup 等）的协程函数，返回 None 表示不需要编辑
+RenderFunc = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class _PendingEdit:
+    """单条消息待发出的编辑"""
+
+    __slots__ = ("render", "final", "last_text", "task")
+
+    def __init__(self):
+        self.render: Optional[RenderFunc] = None
+        self.final = False
+        self.last_text: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class EditCoalescer:
+    """按消息合并编辑请求"""
+
+    # 被限流时最多重试次数
+    MAX_RETRIES = 3
+    # 已发出最终状态的消息记录保留时间（秒）
+    FINAL_KEEP = 600
+
+    def __init__(self, bot=None, interval_ms: int = None):
+        """
+        Args:
+            bot: Bot 实例，默认使用 bot.misc 中的全局实例
+            interval_ms: 同一条消息两次编辑的最小间隔（毫秒）
+        """
+        self._bot = bot
+        self.interval = (interval_ms or config.message_edit_interval_ms) / 1000
+        self._edits: Dict[Tuple[int, int], _PendingEdit] = {}
+        # 已提交最终状态的消息 -> 提交时间
+        self._finalized: Dict[Tuple[int, int], float] = {}
+
+    @property
+    def bot(self):
+        if self._bot is None:
+            from bot.misc import bot
+            self._bot = bot
+        return self._bot
+
+    def submit(self, chat_id: int, message_id: int, render: RenderFunc, final: bool = False) -> bool:
+        """
+        提交一次更新，render 在真正编辑时才调用，因此总是按最新状态生成消息
+
+        Args:
+            chat_id: 聊天ID
+            message_id: 消息ID
+            render: 生成编辑参数的协程函数
+            final: 是否为最终状态
+
+        Returns:
+            消息已提交过最终状态时返回 False
+        """
+        key = (chat_id, message_id)
+        if key in self._finalized:
+            return False
+
+        edit = self._edits.get(key)
+        if edit is None:
+            edit = self._edits[key] = _PendingEdit()
+        edit.render = render
+        if final:
+            edit.final = True
+            self._mark_final(key)
+        if edit.task is None:
+            edit.task = asyncio.get_running_loop().create_task(self._deliver(key, edit))
+        return True
+
+    def update(self, chat_id: int, message_id: int, text: str, final: bool = False, **kwargs) -> bool:
+        """提交一次更新（直接给出消息文本和其它编辑参数）"""
+        async def render():
+            return {"text": text, **kwargs}
+        return self.submit(chat_id, message_id, render, final=final)
+
+    def _mark_final(self, key: Tuple[int, int]):
+        now = time.monotonic()
+        if len(self._finalized) >= 10000:
+            self._finalized = {k: t for k, t in self._finalized.items() if now - t < self.FINAL_KEEP}
+        self._finalized[key] = now
+
+    async def _deliver(self, key: Tuple[int, int], edit: _PendingEdit):
+        """发出最新状态，然后等待一个间隔，期间又有更新则继续"""
+        chat_id, message_id = key
+        retries = 0
+        try:
+            while edit.render is not None:
+                render, edit.render = edit.render, None
+                wait = self.interval
+                try:
+                    params = await render()
+                    if params and params.get("text") != edit.last_text:
+                        await self.bot.edit_message_text(chat_id=chat_id, message_id=message_id, **params)
+                        edit.last_text = params.get("text")
+                    retries = 0
+                except TelegramRetryAfter as e:
+                    retries += 1
+                    if retries <= self.MAX_RETRIES:
+                        logger.warning(f"编辑消息 {chat_id}/{message_id} 被限流，{e.retry_after} 秒后重试")
+                        if edit.render is None:
+                            edit.render = render
+                        wait = max(wait, e.retry_after)
+                    else:
+                        logger.error(f"编辑消息 {chat_id}/{message_id} 失败: 超过最大重试次数 {self.MAX_RETRIES}")
+                except Exception as e:
+                    logger.warning(f"编辑消息 {chat_id}/{message_id} 失败: {e}")
+                await asyncio.sleep(wait)
+        finally:
+            edit.task = None
+            if self._edits.get(key) is edit:
+                del self._edits[key]
+
+    async def close(self):
+        """等待所有待发的编辑发出"""
+        tasks = [edit.task for edit in self._edits.values() if edit.task]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# 全局消息编辑合并器实例
+edit_coalescer = EditCoalescer()
@@ -0,0 +1,154 @@
+"""
+多模式关键词匹配器（Aho–Corasick 自动机）
+对文本扫描一遍即可找出词典中所有出现的词及其位置，耗时与文本长度和命中数成正比，
+与词典大小基本无关。增删词只修改字典树，失败指针在下一次匹配前按需重建
+"""
+
+import logging
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """多模式关键词匹配器"""
+
+    def __init__(self, words: Iterable[str] = ()):
+        # 节点 0 为根节点
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 在该节点结束的词，没有则为 None
+        self._output: List[Optional[str]] = [None]
+        # 沿失败指针能到达的最近一个有词结束的节点，用于枚举所有命中
+        self._dict_link: List[int] = [0]
+        # 词 -> 加入顺序，匹配结果按加入顺序返回
+        self._words: Dict[str, int] = {}
+        self._next_order = 0
+        self._dirty = False
+        self._dead_nodes = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._words
+
+    @property
+    def words(self) -> List[str]:
+        """词典中的词（按加入顺序）"""
+        return list(self._words)
+
+    def add(self, word: str) -> bool:
+        """
+        添加词
+
+        Returns:
+            词已存在或为空时返回 False
+        """
+        if not word or word in self._words:
+            return False
+
+        node = 0
+        for char in word:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._dict_link.append(0)
+            node = next_node
+        self._output[node] = word
+
+        self._words[word] = self._next_order
+        self._next_order += 1
+        self._dirty = True
+        return True
+
+    def remove(self, word: str) -> bool:
+        """
+        移除词
+
+        Returns:
+            词不存在时返回 False
+        """
+        if word not in self._words:
+            return False
+
+        node = 0
+        for char in word:
+            node = self._goto[node][char]
+        self._output[node] = None
+        del self._words[word]
+        self._dead_nodes += len(word)
+        self._dirty = True
+        return True
+
+    def _rebuild(self):
+        """重建失败指针；删除的词积累过多时整棵字典树重建，回收无用节点"""
+        if self._dead_nodes > len(self._goto) // 2:
+            words = sorted(self._words, key=self._words.get)
+            self._goto, self._fail, self._output, self._dict_link = [{}], [0], [None], [0]
+            self._words, self._next_order, self._dead_nodes = {}, 0, 0
+            for word in words:
+                self.add(word)
+
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._dict_link[child] = 0
+            queue.append(child)
+
+        # 按层广度优先，子节点的失败指针由父节点的失败指针推出
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._dict_link[child] = fail if self._output[fail] is not None else self._dict_link[fail]
+                queue.append(child)
+
+        self._dirty = False
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """
+        扫描文本，依次产出所有命中
+
+        Yields:
+            (起始位置, 结束位置, 词)，text[起始位置:结束位置] == 词，同一个词可能多次命中
+        """
+        if self._dirty:
+            self._rebuild()
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        dict_link = self._dict_link
+
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            hit = node if output[node] is not None else dict_link[node]
+            while hit:
+                word = output[hit]
+                yield index + 1 - len(word), index + 1, word
+                hit = dict_link[hit]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """返回所有命中 (起始位置, 结束位置, 词)，按结束位置排序"""
+        return list(self.iter_matches(text))
+
+    def find_words(self, text: str) -> List[str]:
+        """返回文本中出现过的词（去重，按加入词典的顺序）"""
+        found = {word for _, _, word in self.iter_matches(text)}
+        return sorted(found, key=self._words.get)
@@ -1,20 +1,147 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, Optional
+
+# 高频日志来源：每条消息、每笔投注都会写 INFO 日志，异步模式下按每秒条数限流
+HOT_LOGGERS = (
+    "bot.handlers.bet_message_monitor",
+    "bot.handlers.text_message_monitor",
+    "bot.handlers.group_message_monitor",
+    "bot.common.lottery_service",
+)
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 被丢弃的日志条数：queue_full 为队列已满，rate_limited 为限流丢弃
+_dropped_records: Dict[str, int] = {"queue_full": 0, "rate_limited": 0}
+_dropped_lock = threading.Lock()
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _count_dropped(reason: str):
+    with _dropped_lock:
+        _dropped_records[reason] += 1
+
+
+def get_dropped_records() -> Dict[str, int]:
+    """获取被丢弃的日志条数（异步模式下队列已满或被限流时丢弃）"""
+    with _dropped_lock:
+        return dict(_dropped_records)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    按日志来源限流：每个 logger 每秒最多放行 rate 条 INFO 及以下的日志，
+    WARNING 及以上始终放行
+    """
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = rate
+        self._windows: Dict[str, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        second = int(record.created)
+        window = self._windows.get(record.name)
+        if window is None or window[0] != second:
+            window = self._windows[record.name] = [second, 0]
+        window[1] += 1
+        if window[1] > self.rate:
+            _count_dropped("rate_limited")
+            return False
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列已满时直接丢弃日志并计数，不阻塞事件循环"""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _count_dropped("queue_full")
+
+
+class _BlockingStopQueueListener(logging.handlers.QueueListener):
+    """停止时等待队列腾出位置再放入结束标记，保证已入队的日志全部写出"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 
 def setup_logging(config: Any = None):
-    """设置日志配置"""
+    """
+    设置日志配置
+
+    config.log_async 为 True 时日志先放入有界队列，由后台线程写文件和标准输出，
+    高频日志按 config.log_hot_rate 限流；config.log_json 为 True 时输出 JSON
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        # 已经配置过（多个入口都会调用）
+        return
+
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
-    
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_dir / "bot.log"),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+
+    formatter = JsonFormatter() if getattr(config, "log_json", False) else logging.Formatter(LOG_FORMAT)
+    handlers = [
+        logging.FileHandler(log_dir / "bot.log"),
+        logging.StreamHandler(sys.stdout)
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root.setLevel(logging.INFO)
+    if getattr(config, "log_async", False):
+        global _listener
+        queue_handler = DroppingQueueHandler(queue.Queue(getattr(config, "log_queue_size", 10000)))
+        hot_rate = getattr(config, "log_hot_rate", 0)
+        if hot_rate > 0:
+            rate_filter = RateLimitFilter(hot_rate)
+            for name in HOT_LOGGERS:
+                logging.getLogger(name).addFilter(rate_filter)
+        root.addHandler(queue_handler)
+        _listener = _BlockingStopQueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+    else:
+        for handler in handlers:
+            root.addHandler(handler)
+
     # Set specific level for wallet module to capture detailed logs
-    logging.getLogger("bot.utils.wallet").setLevel(logging.DEBUG) 
\ No newline at end of file
+    logging.getLogger("bot.utils.wallet").setLevel(logging.DEBUG)
@@ -0,0 +1,278 @@
+"""
+Redis 统计汇总
+消息处理时只在本地累加计数，后台协程每隔 stats_flush_interval_ms 毫秒
+用一个 pipeline 把 HINCRBY / PFADD / ZINCRBY 批量写入 Redis，
+多个 webhook 进程的统计汇总到同一组 key，管理命令读取汇总结果，重启也不会丢失
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from bot.config import get_config
+
+logger = logging.getLogger(__name__)
+config = get_config()
+
+
+class RedisStatsSink:
+    """批量写入 Redis 的统计计数器"""
+
+    # 有序集合只保留前 N 名（近似的高频元素）
+    ZSET_KEEP = 1000
+
+    def __init__(self, redis=None, prefix: str = "stats", flush_interval_ms: int = None):
+        """
+        Args:
+            redis: Redis 客户端，默认使用 bot.database.redis_client 中的共享实例
+            prefix: key 前缀
+            flush_interval_ms: 刷新间隔（毫秒）
+        """
+        self._redis = redis
+        self.prefix = prefix
+        self.flush_interval = (flush_interval_ms or config.stats_flush_interval_ms) / 1000
+        self._task: Optional[asyncio.Task] = None
+        self._reset_buffers()
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from bot.database.redis_client import redis_client
+            self._redis = redis_client
+        return self._redis
+
+    def _reset_buffers(self):
+        self._hincr: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._pfadd: Dict[str, Set[str]] = defaultdict(set)
+        self._zincr: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._zkeep: Dict[str, int] = {}
+        self._expire: Dict[str, int] = {}
+
+    def key(self, *parts: Any) -> str:
+        return ":".join([self.prefix, *map(str, parts)])
+
+    def _ensure_started(self):
+        """首次写入时在当前事件循环中启动刷新协程"""
+        if self._task is None or self._task.done():
+            try:
+                self._task = asyncio.get_running_loop().create_task(self._run(), name="stats-sink-flush")
+            except RuntimeError:
+                # 不在事件循环中（如脚本直接调用），等待下一次在事件循环中写入时再启动
+                pass
+
+    def hincrby(self, key: str, field: Any, amount: int = 1, ttl: int = None):
+        self._hincr[key][str(field)] += amount
+        if ttl:
+            self._expire[key] = ttl
+        self._ensure_started()
+
+    def pfadd(self, key: str, *values: Any, ttl: int = None):
+        self._pfadd[key].update(map(str, values))
+        if ttl:
+            self._expire[key] = ttl
+        self._ensure_started()
+
+    def zincrby(self, key: str, member: Any, amount: int = 1, keep: int = None, ttl: int = None):
+        self._zincr[key][str(member)] += amount
+        self._zkeep[key] = keep or self.ZSET_KEEP
+        if ttl:
+            self._expire[key] = ttl
+        self._ensure_started()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """把本地累加的计数一次性写入 Redis"""
+        if not (self._hincr or self._pfadd or self._zincr):
+            return
+
+        hincr, pfadd, zincr, zkeep, expire = self._hincr, self._pfadd, self._zincr, self._zkeep, self._expire
+        self._reset_buffers()
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, fields in hincr.items():
+                    for field, amount in fields.items():
+                        pipe.hincrby(key, field, amount)
+                for key, values in pfadd.items():
+                    pipe.pfadd(key, *values)
+                for key, members in zincr.items():
+                    for member, amount in members.items():
+                        pipe.zincrby(key, amount, member)
+                    pipe.zremrangebyrank(key, 0, -zkeep[key] - 1)
+                for key, ttl in expire.items():
+                    pipe.expire(key, ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"写入统计到 Redis 失败: {e}")
+            # 放回缓冲区，下次刷新时重试
+            for key, fields in hincr.items():
+                for field, amount in fields.items():
+                    self._hincr[key][field] += amount
+            for key, values in pfadd.items():
+                self._pfadd[key].update(values)
+            for key, members in zincr.items():
+                for member, amount in members.items():
+                    self._zincr[key][member] += amount
+            self._zkeep.update(zkeep)
+            self._expire.update(expire)
+
+    async def close(self):
+        """停止刷新协程并写入剩余计数"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def hgetall(self, key: str) -> Dict[str, int]:
+        values = await self.redis.hgetall(key)
+        return {field: int(value) for field, value in values.items()}
+
+    async def delete_prefix(self, *parts: Any):
+        """删除某一类统计的全部 key（先写入缓冲区中的计数）"""
+        await self.flush()
+        keys = [key async for key in self.redis.scan_iter(match=self.key(*parts, "*"))]
+        keys.append(self.key(*parts))
+        await self.redis.delete(*keys)
+
+
+# 全局统计汇总实例
+stats_sink = RedisStatsSink()
+
+
+class SharedMessageStats:
+    """
+    多进程共享的消息统计
+    与 MessageStatsStore 记录相同的维度，summary / group_summary 返回与其相同结构的结果
+
+    Redis 占用不随见过的群组和用户数无限增长：群组排行只保留前 TOP_GROUPS 个，
+    活跃群组数用 HyperLogLog 估算；每个群组、每个用户的 key 在最后一次写入后
+    保留 ENTITY_TTL，长期没有消息的群组和用户自动过期；按小时 / 按天的计数按天 / 按月拆分并设置有效期
+    """
+
+    # 每个群组的有序集合只保留前 N 名用户
+    GROUP_TOP_USERS = 100
+    # 群组排行只保留前 N 个群组
+    TOP_GROUPS = 1000
+    # 单个群组、单个用户的 key 在最后一次写入后保留 30 天
+    ENTITY_TTL = 30 * 24 * 3600
+    # 按小时统计的 key 按天拆分，保留 3 天
+    HOURLY_TTL = 3 * 24 * 3600
+    # 按天统计的 key 按月拆分，保留约 13 个月
+    DAILY_TTL = 400 * 24 * 3600
+
+    def __init__(self, namespace: str, sink: RedisStatsSink = None):
+        self.namespace = namespace
+        self.sink = sink or stats_sink
+        self._started = False
+
+    def _key(self, *parts: Any) -> str:
+        return self.sink.key(self.namespace, *parts)
+
+    def record(
+        self,
+        chat_id: int,
+        user_id: int,
+        message_type: Optional[str] = None,
+        keywords: Iterable[str] = (),
+        sensitive: bool = False,
+        now: Optional[datetime] = None
+    ):
+        """记录一条消息（只写本地缓冲区）"""
+        now = now or datetime.now()
+        sink = self.sink
+        if not self._started:
+            # 统计开始时间，多个进程以最早写入的为准
+            self._started = True
+            asyncio.get_running_loop().create_task(self._set_start_time(now))
+
+        sink.hincrby(self._key(), "total")
+        sink.zincrby(self._key("top_groups"), chat_id, keep=self.TOP_GROUPS)
+        sink.pfadd(self._key("group_ids"), chat_id)
+        sink.hincrby(self._key("group", chat_id), "total", ttl=self.ENTITY_TTL)
+        sink.pfadd(self._key("users"), user_id)
+        sink.pfadd(self._key("group_users", chat_id), user_id, ttl=self.ENTITY_TTL)
+        sink.pfadd(self._key("user_groups", user_id), chat_id, ttl=self.ENTITY_TTL)
+        sink.zincrby(self._key("top_users"), user_id)
+        sink.zincrby(self._key("group_top", chat_id), user_id, keep=self.GROUP_TOP_USERS, ttl=self.ENTITY_TTL)
+        if message_type is not None:
+            sink.hincrby(self._key(), f"type:{message_type}")
+            sink.hincrby(self._key("group", chat_id), f"type:{message_type}")
+        for keyword in keywords:
+            sink.hincrby(self._key("keywords"), keyword)
+        if sensitive:
+            sink.hincrby(self._key("group", chat_id), "sensitive")
+            sink.zincrby(self._key("sensitive_users"), user_id)
+        sink.hincrby(self._key("hourly", now.strftime("%Y-%m-%d")), now.strftime("%H:00"), ttl=self.HOURLY_TTL)
+        sink.hincrby(self._key("daily", now.strftime("%Y-%m")), now.strftime("%Y-%m-%d"), ttl=self.DAILY_TTL)
+
+    async def _set_start_time(self, now: datetime):
+        try:
+            await self.sink.redis.set(self._key("start_time"), now.isoformat(), nx=True)
+        except Exception as e:
+            self._started = False
+            logger.error(f"写入统计开始时间失败: {e}")
+
+    @staticmethod
+    def _split_types(counters: Dict[str, int]) -> Dict[str, int]:
+        return {field[5:]: count for field, count in counters.items() if field.startswith("type:")}
+
+    async def summary(self, top: int = 5) -> Dict[str, Any]:
+        """读取所有进程汇总的统计"""
+        redis = self.sink.redis
+        counters = await self.sink.hgetall(self._key())
+        top_groups: List[Tuple[int, int]] = [
+            (int(chat_id), int(score))
+            for chat_id, score in await redis.zrevrange(self._key("top_groups"), 0, top - 1, withscores=True)
+        ]
+        top_users: List[Tuple[int, int]] = [
+            (int(user_id), int(score))
+            for user_id, score in await redis.zrevrange(self._key("top_users"), 0, top - 1, withscores=True)
+        ]
+        start_time = await redis.get(self._key("start_time"))
+
+        return {
+            "start_time": datetime.fromisoformat(start_time) if start_time else datetime.now(),
+            "total": counters.get("total", 0),
+            "types": self._split_types(counters),
+            "keywords": await self.sink.hgetall(self._key("keywords")),
+            "active_groups": await redis.pfcount(self._key("group_ids")),
+            "distinct_users": await redis.pfcount(self._key("users")),
+            "top_groups": [
+                (chat_id, count, await redis.pfcount(self._key("group_users", chat_id)))
+                for chat_id, count in top_groups
+            ],
+            "top_users": top_users,
+            "top_user_groups": {
+                user_id: await redis.pfcount(self._key("user_groups", user_id))
+                for user_id, _ in top_users
+            },
+        }
+
+    async def group_summary(self, chat_id: int, top: int = 5) -> Optional[Dict[str, Any]]:
+        """读取单个群组汇总的统计，没有记录时返回 None"""
+        redis = self.sink.redis
+        counters = await self.sink.hgetall(self._key("group", chat_id))
+        if not counters.get("total"):
+            return None
+        return {
+            "total": counters["total"],
+            "distinct_users": await redis.pfcount(self._key("group_users", chat_id)),
+            "types": self._split_types(counters),
+            "sensitive_count": counters.get("sensitive", 0),
+            "top_users": [
+                (int(user_id), int(score))
+                for user_id, score in await redis.zrevrange(self._key("group_top", chat_id), 0, top - 1, withscores=True)
+            ],
+        }
+
+    async def reset(self):
+        """清空汇总统计"""
+        await self.sink.delete_prefix(self.namespace)
+        self._started = False
@@ -0,0 +1,336 @@
+"""
+消息统计存储
+用固定大小的结构代替随用户数增长的字典和集合，长时间运行内存不会持续上涨：
+去重用户数用 HyperLogLog 估算，活跃用户用 Space-Saving 算法只跟踪前 K 名，
+消息长度按区间分桶，按小时/按天的计数只保留最近的若干个时间窗口
+"""
+
+import hashlib
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash64(item: Hashable) -> int:
+    """64 位哈希：整数用 splitmix64 混淆，其它类型用 blake2b"""
+    if isinstance(item, int):
+        x = (item + 0x9E3779B97F4A7C15) & _MASK64
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+        return x ^ (x >> 31)
+    digest = hashlib.blake2b(str(item).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HyperLogLog:
+    """HyperLogLog 基数估算（2^p 个寄存器，标准误差约 1.04/sqrt(2^p)）"""
+
+    def __init__(self, p: int = 10):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+        self._rest_bits = 64 - p
+        self._rest_mask = (1 << self._rest_bits) - 1
+        if self.m >= 128:
+            self._alpha = 0.7213 / (1 + 1.079 / self.m)
+        else:
+            self._alpha = {16: 0.673, 32: 0.697, 64: 0.709}[self.m]
+
+    def add(self, item: Hashable):
+        x = _hash64(item)
+        index = x >> self._rest_bits
+        rank = self._rest_bits - (x & self._rest_mask).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        """估算不同元素的个数"""
+        estimate = self._alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        if estimate <= 2.5 * self.m:
+            zeros = self.registers.count(0)
+            if zeros:
+                # 小基数时用线性计数修正
+                estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+
+class SpaceSaving:
+    """Space-Saving 高频元素统计：最多跟踪 capacity 个元素，计数可能高估，高估量不超过 error"""
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self._counts: Dict[Hashable, int] = {}
+        self._errors: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._counts
+
+    def offer(self, key: Hashable, count: int = 1) -> Optional[Hashable]:
+        """
+        记录一次出现
+
+        Returns:
+            被挤出跟踪的元素，没有则返回 None
+        """
+        if key in self._counts:
+            self._counts[key] += count
+            return None
+        if len(self._counts) < self.capacity:
+            self._counts[key] = count
+            self._errors[key] = 0
+            return None
+
+        # 替换计数最小的元素，新元素继承其计数作为误差上界
+        evicted = min(self._counts, key=self._counts.__getitem__)
+        floor = self._counts.pop(evicted)
+        del self._errors[evicted]
+        self._counts[key] = floor + count
+        self._errors[key] = floor
+        return evicted
+
+    def get(self, key: Hashable) -> int:
+        return self._counts.get(key, 0)
+
+    def top(self, n: int = 10) -> List[Tuple[Hashable, int]]:
+        """计数最高的 n 个元素 [(元素, 计数)]"""
+        return sorted(self._counts.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+class Histogram:
+    """按区间分桶的直方图"""
+
+    def __init__(self, bounds: Sequence[int]):
+        """
+        Args:
+            bounds: 各桶的上界（含），最后一个桶统计超过最大上界的值
+        """
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+
+    def add(self, value: int):
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def buckets(self) -> List[Tuple[str, int]]:
+        """[(区间标签, 计数)]，如 ("1-10", 5)、(">2000", 1)"""
+        labels = []
+        lower = 0
+        for bound in self.bounds:
+            labels.append(f"{lower}-{bound}")
+            lower = bound + 1
+        labels.append(f">{self.bounds[-1]}")
+        return list(zip(labels, self.counts))
+
+
+class RollingCounter:
+    """滚动时间窗口计数器：只保留最近 size 个长度为 period 秒的窗口（按本地时间对齐）"""
+
+    _EPOCH = datetime(1970, 1, 1)
+
+    def __init__(self, period: int, size: int):
+        self.period = period
+        self.size = size
+        self._slots = [-1] * size
+        self._counts = [0] * size
+
+    def _slot(self, when: datetime) -> int:
+        return int((when.replace(tzinfo=None) - self._EPOCH).total_seconds() // self.period)
+
+    def add(self, when: datetime, count: int = 1):
+        slot = self._slot(when)
+        index = slot % self.size
+        if self._slots[index] != slot:
+            self._slots[index] = slot
+            self._counts[index] = 0
+        self._counts[index] += count
+
+    def series(self, now: Optional[datetime] = None) -> List[Tuple[datetime, int]]:
+        """最近窗口的计数 [(窗口开始时间, 计数)]，按时间升序"""
+        current = self._slot(now or datetime.now())
+        return [
+            (self._EPOCH + timedelta(seconds=slot * self.period), count)
+            for slot, count in sorted(zip(self._slots, self._counts))
+            if slot >= 0 and current - slot < self.size
+        ]
+
+
+class ChatStats:
+    """单个群组的统计"""
+
+    def __init__(self, top_users: int):
+        self.total = 0
+        self.users = HyperLogLog(p=10)
+        self.top_users = SpaceSaving(top_users)
+        self.types: Dict[str, int] = {}
+        self.keywords: Dict[str, int] = {}
+        self.sensitive_count = 0
+        self.last_message: Optional[datetime] = None
+
+
+class MessageStatsStore:
+    """
+    消息统计存储
+    群组数量超过 max_chats 时淘汰最久没有消息的群组，
+    活跃用户只跟踪前 top_users 名（每人最多记录 max_user_groups 个群组）
+    """
+
+    # 消息长度分桶上界
+    LENGTH_BOUNDS = (10, 20, 50, 100, 200, 500, 1000, 2000)
+
+    def __init__(
+        self,
+        max_chats: int = 5000,
+        top_users: int = 100,
+        chat_top_users: int = 20,
+        max_user_groups: int = 20,
+        hourly_windows: int = 48,
+        daily_windows: int = 30
+    ):
+        self.max_chats = max_chats
+        self.top_users_capacity = top_users
+        self.chat_top_users = chat_top_users
+        self.max_user_groups = max_user_groups
+        self.hourly_windows = hourly_windows
+        self.daily_windows = daily_windows
+        self.reset()
+
+    def reset(self):
+        """清空统计"""
+        self.start_time = datetime.now()
+        self.total = 0
+        self.types: Dict[str, int] = {}
+        self.keywords: Dict[str, int] = {}
+        self.users = HyperLogLog(p=12)
+        self.top_users = SpaceSaving(self.top_users_capacity)
+        self.sensitive_users = SpaceSaving(self.top_users_capacity)
+        # 只为被跟踪的活跃用户记录所在群组
+        self._user_groups: Dict[int, set] = {}
+        self.chats: "OrderedDict[int, ChatStats]" = OrderedDict()
+        self.lengths = Histogram(self.LENGTH_BOUNDS)
+        self.hourly = RollingCounter(3600, self.hourly_windows)
+        self.daily = RollingCounter(86400, self.daily_windows)
+
+    def record(
+        self,
+        chat_id: int,
+        user_id: int,
+        message_type: Optional[str] = None,
+        length: Optional[int] = None,
+        keywords: Iterable[str] = (),
+        sensitive: bool = False,
+        now: Optional[datetime] = None
+    ):
+        """记录一条消息"""
+        now = now or datetime.now()
+        self.total += 1
+
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            if len(self.chats) >= self.max_chats:
+                self.chats.popitem(last=False)
+            chat = self.chats[chat_id] = ChatStats(self.chat_top_users)
+        else:
+            self.chats.move_to_end(chat_id)
+        chat.total += 1
+        chat.users.add(user_id)
+        chat.top_users.offer(user_id)
+        chat.last_message = now
+
+        self.users.add(user_id)
+        evicted = self.top_users.offer(user_id)
+        if evicted is not None:
+            self._user_groups.pop(evicted, None)
+        groups = self._user_groups.setdefault(user_id, set())
+        if len(groups) < self.max_user_groups:
+            groups.add(chat_id)
+
+        if message_type is not None:
+            self.types[message_type] = self.types.get(message_type, 0) + 1
+            chat.types[message_type] = chat.types.get(message_type, 0) + 1
+        if length is not None:
+            self.lengths.add(length)
+        for keyword in keywords:
+            self.keywords[keyword] = self.keywords.get(keyword, 0) + 1
+            chat.keywords[keyword] = chat.keywords.get(keyword, 0) + 1
+        if sensitive:
+            chat.sensitive_count += 1
+            self.sensitive_users.offer(user_id)
+
+        self.hourly.add(now)
+        self.daily.add(now)
+
+    def user_group_count(self, user_id: int) -> int:
+        """被跟踪的活跃用户出现过的群组数"""
+        return len(self._user_groups.get(user_id, ()))
+
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        """统计摘要（与 SharedMessageStats.summary 结构相同）"""
+        top_groups = sorted(self.chats.items(), key=lambda item: item[1].total, reverse=True)[:top]
+        return {
+            "start_time": self.start_time,
+            "total": self.total,
+            "types": dict(self.types),
+            "keywords": dict(self.keywords),
+            "active_groups": len(self.chats),
+            "distinct_users": self.users.count(),
+            "top_groups": [(chat_id, chat.total, chat.users.count()) for chat_id, chat in top_groups],
+            "top_users": self.top_users.top(top),
+            "top_user_groups": {user_id: self.user_group_count(user_id) for user_id, _ in self.top_users.top(top)},
+        }
+
+    def group_summary(self, chat_id: int, top: int = 5) -> Optional[Dict[str, Any]]:
+        """单个群组的统计摘要，没有记录时返回 None"""
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            return None
+        return {
+            "total": chat.total,
+            "distinct_users": chat.users.count(),
+            "types": dict(chat.types),
+            "sensitive_count": chat.sensitive_count,
+            "top_users": chat.top_users.top(top),
+        }
+
+    def snapshot(self, top: int = 10) -> Dict[str, Any]:
+        """导出可 JSON 序列化的统计信息"""
+        return {
+            "total_messages": self.total,
+            "distinct_users": self.users.count(),
+            "active_groups": len(self.chats),
+            "message_types": dict(self.types),
+            "keyword_stats": dict(self.keywords),
+            "top_users": [
+                {"user_id": user_id, "total": count, "groups": self.user_group_count(user_id)}
+                for user_id, count in self.top_users.top(top)
+            ],
+            "top_sensitive_users": [
+                {"user_id": user_id, "count": count}
+                for user_id, count in self.sensitive_users.top(top)
+            ],
+            "groups": {
+                chat_id: {
+                    "total": chat.total,
+                    "distinct_users": chat.users.count(),
+                    "types": dict(chat.types),
+                    "keywords": dict(chat.keywords),
+                    "sensitive_count": chat.sensitive_count,
+                    "top_users": chat.top_users.top(top),
+                    "last_message": chat.last_message.isoformat() if chat.last_message else None,
+                }
+                for chat_id, chat in self.chats.items()
+            },
+            "message_length_stats": dict(self.lengths.buckets()),
+            "hourly_stats": {start.strftime("%Y-%m-%d %H:00"): count for start, count in self.hourly.series()},
+            "daily_stats": {start.strftime("%Y-%m-%d"): count for start, count in self.daily.series()},
+            "start_time": self.start_time.isoformat(),
+            "uptime_seconds": (datetime.now() - self.start_time).total_seconds(),
+        }
@@ -38,7 +38,7 @@ async def check_mining_status():
         
         # 尝试手动处理一下奖励
         print("\n尝试手动处理奖励...")
-        result = await mining_service.process_daily_mining_rewards_batch(offset=0, limit=10)
+        result = await mining_service.process_daily_mining_rewards_batch(last_id=0, limit=10)
         print(f"处理结果: {result}")
 
 if __name__ == "__main__":
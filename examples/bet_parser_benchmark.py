@@ -0,0 +1,116 @@
+"""
+投注消息解析基准测试脚本
+用 bet_messages_corpus.txt 中的语料对比旧的逐片段正则解析和预编译单遍解析：
+先校验两者解析结果一致，再分别统计预筛选和解析的耗时
+"""
+
+import re
+import sys
+import os
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.handlers.bet_message_monitor import BetMessageParser
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bet_messages_corpus.txt")
+
+
+def load_corpus():
+    """读取语料，忽略空行和注释"""
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+class LegacyBetMessageParser(BetMessageParser):
+    """旧实现：逐片段依次尝试 5 个正则，失败时与前后片段拼接重试"""
+
+    def parse_bet_message(self, content):
+        bets = []
+        parts = content.strip().split()
+        processed_indices = set()
+        for i, part in enumerate(parts):
+            if i in processed_indices:
+                continue
+            bet_info = self._parse_single_bet(part)
+            if bet_info:
+                bets.append(bet_info)
+                processed_indices.add(i)
+                continue
+            if len(parts) > 1:
+                if i + 1 < len(parts) and (i + 1) not in processed_indices:
+                    bet_info = self._parse_single_bet(part + parts[i + 1])
+                    if bet_info:
+                        bets.append(bet_info)
+                        processed_indices.update((i, i + 1))
+                        continue
+                if i > 0 and (i - 1) not in processed_indices:
+                    bet_info = self._parse_single_bet(parts[i - 1] + part)
+                    if bet_info:
+                        bets.append(bet_info)
+                        processed_indices.update((i - 1, i))
+                        continue
+        return bets
+
+    def _parse_single_bet(self, bet_text):
+        match = re.match(r'^([大小单双豹子]+)(\d+)$', bet_text)
+        if match:
+            return self._bet_type_bet(match.group(1), match.group(2), bet_text)
+        match = re.match(r'^(?:数字)?([0-9零一二三四五六七八九])\s*(?:押|下|注|买)?(\d+)$', bet_text)
+        if match:
+            return self._number_bet(match.group(1), int(match.group(2)), bet_text)
+        match = re.match(r'^(\d+)([大小单双豹子]+)$', bet_text)
+        if match:
+            return self._bet_type_bet(match.group(2), match.group(1), bet_text)
+        match = re.match(r'^(\d+)(?:押|下|注|买)?([0-9零一二三四五六七八九])$', bet_text)
+        if match:
+            return self._number_bet(match.group(2), int(match.group(1)), bet_text)
+        match = re.match(r'^([0-9零一二三四五六七八九])$', bet_text)
+        if match:
+            return self._number_bet(match.group(1), 1, bet_text)
+        return None
+
+
+def legacy_is_candidate(content):
+    """旧的预筛选：逐个关键词查找子串，再用正则查找数字"""
+    bet_keywords = ['大', '小', '单', '双', '豹子', '数字', '押', '下', '注', '买']
+    return any(keyword in content for keyword in bet_keywords) and bool(re.search(r'\d+', content))
+
+
+def main():
+    corpus = load_corpus()
+    parser = BetMessageParser()
+    legacy = LegacyBetMessageParser()
+
+    # 1. 校验结果一致
+    mismatches = 0
+    for content in corpus:
+        if legacy_is_candidate(content) != parser.is_candidate(content):
+            mismatches += 1
+            print(f"预筛选不一致: {content}")
+        if legacy.parse_bet_message(content) != parser.parse_bet_message(content):
+            mismatches += 1
+            print(f"解析不一致: {content}")
+            print(f"  旧: {legacy.parse_bet_message(content)}")
+            print(f"  新: {parser.parse_bet_message(content)}")
+    print(f"语料 {len(corpus)} 条，不一致 {mismatches} 条")
+
+    candidates = [content for content in corpus if parser.is_candidate(content)]
+    print(f"通过预筛选 {len(candidates)} 条")
+
+    # 2. 性能对比（每轮处理整份语料）
+    rounds = 2000
+    cases = [
+        ("预筛选", lambda: [legacy_is_candidate(c) for c in corpus], lambda: [parser.is_candidate(c) for c in corpus]),
+        ("解析", lambda: [legacy.parse_bet_message(c) for c in candidates], lambda: [parser.parse_bet_message(c) for c in candidates]),
+    ]
+    for name, old_func, new_func in cases:
+        old_time = timeit.timeit(old_func, number=rounds)
+        new_time = timeit.timeit(new_func, number=rounds)
+        print(f"{name}: 旧 {old_time * 1e6 / rounds:.1f} 微秒/轮, "
+              f"新 {new_time * 1e6 / rounds:.1f} 微秒/轮, "
+              f"提升 {old_time / new_time:.2f} 倍")
+
+
+if __name__ == "__main__":
+    main()
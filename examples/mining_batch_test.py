@@ -142,38 +142,41 @@ async def test_scheduler_performance():
             logger.info("没有待处理的矿工卡")
             return
         
-        # 模拟调度器处理
+        # 模拟调度器处理（按主键游标分批）
         start_time = datetime.now()
         batch_size = 100
         
         processed_total = 0
         total_rewards = 0
         batch_count = 0
+        last_id = 0
         
-        for offset in range(0, total_cards, batch_size):
+        while True:
             batch_count += 1
             batch_start = datetime.now()
             
             # 处理当前批次
             batch_result = await mining_service.process_daily_mining_rewards_batch(
-                offset=offset,
+                last_id=last_id,
                 limit=batch_size
             )
             
-            if batch_result["success"]:
-                processed_total += batch_result["processed_cards"]
-                total_rewards += batch_result["total_rewards"]
-                
-                batch_time = (datetime.now() - batch_start).total_seconds()
-                logger.info(f"批次 {batch_count}: "
-                          f"处理 {batch_result['processed_cards']} 张卡, "
-                          f"发放 {batch_result['total_rewards']:,} 积分, "
-                          f"耗时 {batch_time:.2f} 秒")
-            else:
+            if not batch_result["success"]:
                 logger.error(f"批次 {batch_count} 失败: {batch_result['message']}")
+                break
+            
+            processed_total += batch_result["processed_cards"]
+            total_rewards += batch_result["total_rewards"]
+            
+            batch_time = (datetime.now() - batch_start).total_seconds()
+            logger.info(f"批次 {batch_count}: "
+                      f"处理 {batch_result['processed_cards']} 张卡, "
+                      f"发放 {batch_result['total_rewards']:,} 积分, "
+                      f"耗时 {batch_time:.2f} 秒")
             
-            # 批次间休息
-            await asyncio.sleep(1)
+            if not batch_result["has_more"]:
+                break
+            last_id = batch_result["last_id"]
         
         # 总统计
         total_time = (datetime.now() - start_time).total_seconds()
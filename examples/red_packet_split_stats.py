@@ -0,0 +1,102 @@
+"""
+红包拆分统计检验
+模拟大量红包，检验 split_red_packet 的分布：
+1. 每个红包总额正确，每份都在上下限之内
+2. 同样的种子得到同样的结果
+3. 每个位置（抢红包的先后顺序）的平均金额都接近总额/份数，先抢后抢没有差别
+4. 每个位置金额分布的卡方检验（按全体份额的分位数分桶）
+
+用法: python examples/red_packet_split_stats.py [红包个数] [总额] [份数]
+"""
+
+import math
+import random
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.common.red_packet_split import split_red_packet
+
+BUCKETS = 10
+
+
+def check_invariants(packets: int, amount: int, count: int, rng: random.Random):
+    max_amount = max(2 * amount // count, math.ceil(amount / count))
+    for _ in range(packets):
+        shares = split_red_packet(amount, count, rng=rng)
+        assert len(shares) == count, shares
+        assert sum(shares) == amount, shares
+        assert all(1 <= share <= max_amount for share in shares), shares
+
+
+def check_seed():
+    assert split_red_packet(100000, 10, seed=42) == split_red_packet(100000, 10, seed=42)
+    assert split_red_packet(100000, 10, seed=1) != split_red_packet(100000, 10, seed=2)
+
+
+def check_positions(packets: int, amount: int, count: int, rng: random.Random) -> bool:
+    """每个位置的均值与期望的偏差不超过 4 个标准误差，且各位置分布一致（卡方检验）"""
+    samples = [[] for _ in range(count)]
+    for _ in range(packets):
+        for position, share in enumerate(split_red_packet(amount, count, rng=rng)):
+            samples[position].append(share)
+
+    expected_mean = amount / count
+    ok = True
+    print(f"{'位置':>4} {'均值':>12} {'标准差':>10} {'偏差/标准误差':>14}")
+    for position, values in enumerate(samples):
+        mean = sum(values) / len(values)
+        std = math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+        z = (mean - expected_mean) / (std / math.sqrt(len(values)))
+        flag = "" if abs(z) < 4 else "  ✗"
+        ok &= abs(z) < 4
+        print(f"{position + 1:>4} {mean:>12.2f} {std:>10.2f} {z:>14.2f}{flag}")
+
+    # 用全体份额的分位数作为分桶边界，各位置落入每个桶的比例应相同
+    pooled = sorted(v for values in samples for v in values)
+    bounds = [pooled[len(pooled) * k // BUCKETS] for k in range(1, BUCKETS)]
+    table = []
+    for values in samples:
+        counts = [0] * BUCKETS
+        for v in values:
+            counts[sum(v >= bound for bound in bounds)] += 1
+        table.append(counts)
+    column_totals = [sum(row[k] for row in table) for k in range(BUCKETS)]
+    chi2 = 0.0
+    for row in table:
+        for k in range(BUCKETS):
+            expected = column_totals[k] / count
+            if expected:
+                chi2 += (row[k] - expected) ** 2 / expected
+    dof = (count - 1) * (BUCKETS - 1)
+    # 卡方分布的正态近似，取 4 个标准差为阈值
+    threshold = dof + 4 * math.sqrt(2 * dof)
+    print(f"\n卡方 = {chi2:.1f}，自由度 = {dof}，阈值 = {threshold:.1f}")
+    ok &= chi2 < threshold
+    return ok
+
+
+def main():
+    packets = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    amount = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    rng = random.Random(20240101)
+
+    started = time.perf_counter()
+    check_seed()
+    check_invariants(packets, amount, count, rng)
+    # 边界情况：总额刚好每份 1、份数为 1、上限很紧
+    check_invariants(1000, count, count, rng)
+    check_invariants(1000, amount, 1, rng)
+    check_invariants(1000, 2 * count - 1, count, rng)
+    print(f"不变量检查通过: {packets:,} 个红包，用时 {time.perf_counter() - started:.1f} 秒\n")
+
+    ok = check_positions(packets, amount, count, rng)
+    print("\n分布检验通过" if ok else "\n分布检验未通过")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
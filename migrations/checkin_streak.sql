@@ -0,0 +1,42 @@
+-- 签到单语句化迁移文件
+-- 用户表记录最后签到日期和连续签到天数，账户和签到记录按唯一键去重
+
+-- 1. 用户表增加签到字段
+ALTER TABLE users
+    ADD COLUMN last_sign_date DATE NULL COMMENT '最后签到日期',
+    ADD COLUMN sign_streak INT NOT NULL DEFAULT 0 COMMENT '连续签到天数（截至最后签到日期）';
+
+-- 2. 按最近一次签到记录回填
+UPDATE users u
+JOIN (
+    SELECT s.telegram_id, s.sign_date, MAX(s.continuous_days) AS continuous_days
+    FROM sign_in_records s
+    JOIN (
+        SELECT telegram_id, MAX(sign_date) AS sign_date
+        FROM sign_in_records
+        GROUP BY telegram_id
+    ) latest ON latest.telegram_id = s.telegram_id AND latest.sign_date = s.sign_date
+    GROUP BY s.telegram_id, s.sign_date
+) r ON r.telegram_id = u.telegram_id
+SET u.last_sign_date = r.sign_date,
+    u.sign_streak = r.continuous_days;
+
+-- 3. 删除同一用户同一天的重复签到记录，保留最早的一条
+--    重复签到的积分已经入账，请先核对再执行：
+--    SELECT telegram_id, sign_date, COUNT(*) FROM sign_in_records
+--    GROUP BY telegram_id, sign_date HAVING COUNT(*) > 1;
+DELETE r1 FROM sign_in_records r1
+JOIN sign_in_records r2
+  ON r1.telegram_id = r2.telegram_id
+ AND r1.sign_date = r2.sign_date
+ AND r1.id > r2.id;
+
+ALTER TABLE sign_in_records
+    ADD UNIQUE KEY uk_telegram_sign_date (telegram_id, sign_date);
+
+-- 4. 账户唯一键
+--    重复账户有余额和交易记录，不能直接删除，如有重复请先手工合并：
+--    SELECT telegram_id, account_type, COUNT(*) FROM accounts
+--    GROUP BY telegram_id, account_type HAVING COUNT(*) > 1;
+ALTER TABLE accounts
+    ADD UNIQUE KEY uk_telegram_account_type (telegram_id, account_type);
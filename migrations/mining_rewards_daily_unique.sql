@@ -0,0 +1,21 @@
+-- 挖矿奖励每日唯一键迁移文件
+-- 每张矿工卡每天只能有一条奖励记录，批量发放重跑时由唯一键去重
+
+-- 1. 奖励日期统一为当天零点（旧的批量发放写入的是发放时刻）
+UPDATE mining_rewards
+SET reward_date = DATE(reward_date)
+WHERE reward_date <> DATE(reward_date);
+
+-- 2. 删除同一张卡同一天的重复奖励，保留最早的一条
+--    已领取的重复奖励已经入账，请先核对再执行：
+--    SELECT mining_card_id, reward_date, COUNT(*) FROM mining_rewards
+--    GROUP BY mining_card_id, reward_date HAVING COUNT(*) > 1;
+DELETE r1 FROM mining_rewards r1
+JOIN mining_rewards r2
+  ON r1.mining_card_id = r2.mining_card_id
+ AND r1.reward_date = r2.reward_date
+ AND r1.id > r2.id;
+
+-- 3. 添加唯一键
+ALTER TABLE mining_rewards
+    ADD UNIQUE KEY uk_card_reward_date (mining_card_id, reward_date);
@@ -57,7 +57,8 @@ CREATE TABLE IF NOT EXISTS mining_rewards (
     INDEX idx_claimed_time (claimed_time),
     INDEX idx_telegram_status (telegram_id, status),
     INDEX idx_created_at (created_at),
-    INDEX idx_updated_at (updated_at)
+    INDEX idx_updated_at (updated_at),
+    UNIQUE KEY uk_card_reward_date (mining_card_id, reward_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci COMMENT='挖矿奖励记录表';
 
 -- 创建挖矿统计表
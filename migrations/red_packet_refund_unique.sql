@@ -0,0 +1,19 @@
+-- 红包过期退款唯一键迁移文件
+-- 过期退款使用独立的交易类型 52，每个红包只能有一条退款记录，多个进程同时退款时由唯一键拦截
+
+-- 1. 之前的退款记为发送红包类型（50）并带有红包ID，改为退款类型
+UPDATE account_transactions
+SET transaction_type = 52
+WHERE transaction_type = 50
+  AND source_id IS NOT NULL;
+
+-- 2. 检查同一红包的重复退款，多退的积分需要先人工处理再执行第 3 步：
+--    SELECT source_id, COUNT(*) FROM account_transactions
+--    WHERE transaction_type = 52 GROUP BY source_id HAVING COUNT(*) > 1;
+
+-- 3. 添加去重列和唯一键（其余交易类型该列为 NULL，不受唯一键限制）
+ALTER TABLE account_transactions
+    ADD COLUMN unique_source_id VARCHAR(64)
+        GENERATED ALWAYS AS (CASE WHEN transaction_type = 52 THEN source_id END) STORED
+        COMMENT '需要按来源ID去重的交易类型的来源ID',
+    ADD UNIQUE KEY uk_type_unique_source_id (transaction_type, unique_source_id);